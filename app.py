@@ -5,62 +5,74 @@ Streamlit app for Matic Studio Chat Agent with Flask API support
 
 import streamlit as st
 import os
+import threading
 from dotenv import load_dotenv
 from src.agents.scheduling_agent import SchedulingAgent
 from flask import Flask, request, jsonify, send_from_directory
-import threading
-import time
+from werkzeug.serving import make_server
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app for API
-flask_app = Flask(__name__)
-
-# Initialize the scheduling agent
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-5")
-scheduling_agent = SchedulingAgent(model=DEFAULT_MODEL, temperature=0.7)
+API_PORT = int(os.getenv("API_PORT", 5000))
 
-@flask_app.route('/')
-def serve_chat():
-    """Serve the chat HTML file"""
-    return send_from_directory('.', 'chatMATICStudio.html')
+# Streamlit re-executes this script on every interaction; anything expensive or
+# process-wide lives in a st.cache_resource singleton so it is built only once.
 
-@flask_app.route('/api/chat', methods=['POST'])
-def chat_api():
-    """API endpoint for chat functionality"""
-    try:
-        data = request.get_json()
-        user_message = data.get('message', '')
-        conversation_history = data.get('conversation_history', [])
-        
-        if not user_message:
-            return jsonify({'error': 'No message provided'}), 400
-        
-        # Process the message using the scheduling agent
-        response = scheduling_agent.process(user_message)
-        
-        return jsonify({
-            'response': response,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'error': str(e),
-            'status': 'error'
-        }), 500
 
-def run_flask():
-    """Run Flask app in a separate thread"""
-    flask_app.run(host='0.0.0.0', port=5000, debug=False)
+def create_api_app() -> Flask:
+    """Flask API serving the HTML chat widget"""
+    flask_app = Flask(__name__)
+    scheduling_agent = SchedulingAgent(model=DEFAULT_MODEL, temperature=0.7)
+    
+    @flask_app.route('/')
+    def serve_chat():
+        """Serve the chat HTML file"""
+        return send_from_directory('.', 'chatMATICStudio.html')
+    
+    @flask_app.route('/api/chat', methods=['POST'])
+    def chat_api():
+        """API endpoint for chat functionality"""
+        try:
+            data = request.get_json()
+            user_message = data.get('message', '')
+            
+            if not user_message:
+                return jsonify({'error': 'No message provided'}), 400
+            
+            # Process the message using the scheduling agent
+            response = scheduling_agent.process(user_message)
+            
+            return jsonify({
+                'response': response,
+                'status': 'success'
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error'
+            }), 500
+    
+    return flask_app
+
 
-# Start Flask server in background thread
-flask_thread = threading.Thread(target=run_flask, daemon=True)
-flask_thread.start()
+@st.cache_resource(show_spinner=False)
+def start_api_server():
+    """Start the Flask API once per process, in a background thread.
+    
+    Binding happens here, synchronously, so the server accepts connections as
+    soon as this returns and no startup sleep is needed.
+    """
+    try:
+        server = make_server('0.0.0.0', API_PORT, create_api_app(), threaded=True)
+    except OSError as e:
+        print(f"❌ Chat API not started on port {API_PORT}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="chat-api", daemon=True).start()
+    return server
 
-# Give Flask time to start
-time.sleep(2)
 
 # Page configuration
 st.set_page_config(
@@ -303,17 +315,41 @@ def initialize_session_state():
         st.session_state.messages = []
     
     if "agent" not in st.session_state:
+        # Per-session memory; the OpenAI client is shared process-wide (src/core/openai_clients.py)
         st.session_state.agent = SchedulingAgent(model=DEFAULT_MODEL, temperature=0.7)
     
     if "selected_model" not in st.session_state:
         st.session_state.selected_model = DEFAULT_MODEL
 
+def message_html(role: str, content: str) -> str:
+    """Chat bubble markup for one message"""
+    if role == "user":
+        return f"""
+        <div class="message user-message">
+            <div class="message-bubble user-bubble">
+                {content}
+            </div>
+            <div class="avatar user-avatar">U</div>
+        </div>
+        """
+    return f"""
+    <div class="message bot-message">
+        <div class="avatar bot-avatar">🤖</div>
+        <div class="message-bubble bot-bubble">
+            {content}
+        </div>
+    </div>
+    """
+
 def main():
     # Check for API key
     if not os.getenv("OPENAI_API_KEY"):
         st.error("❌ OpenAI API key not found. Please add your API key to the .env file.")
         st.stop()
     
+    # Started on the first run only; later reruns get the cached server back
+    start_api_server()
+    
     # Initialize session state
     initialize_session_state()
     
@@ -349,26 +385,13 @@ def main():
     # Messages area
     st.markdown('<div class="messages-area">', unsafe_allow_html=True)
     
+    # Read the chat input first so a new message renders in this run, without a rerun
+    if prompt := st.chat_input("Type your message..."):
+        st.session_state.messages.append({"role": "user", "content": prompt})
+    
     # Display messages
     for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="message user-message">
-                <div class="message-bubble user-bubble">
-                    {message["content"]}
-                </div>
-                <div class="avatar user-avatar">U</div>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="message bot-message">
-                <div class="avatar bot-avatar">🤖</div>
-                <div class="message-bubble bot-bubble">
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown(message_html(message["role"], message["content"]), unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -394,21 +417,22 @@ def main():
             })
             st.rerun()
     
-    # Chat input
-    if prompt := st.chat_input("Type your message..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        st.rerun()
-    
-    # Process messages and get responses
+    # Stream the response into its bubble as it is generated; status lines appear as the tools run
     if len(st.session_state.messages) > 0 and st.session_state.messages[-1]["role"] == "user":
+        bubble = st.empty()
+        bubble.markdown(message_html("assistant", "🤖 Thinking..."), unsafe_allow_html=True)
         try:
-            with st.spinner("🤖 Thinking..."):
-                response = st.session_state.agent.process(st.session_state.messages[-1]["content"])
+            parts = []
+            for chunk in st.session_state.agent.process_stream(st.session_state.messages[-1]["content"]):
+                parts.append(chunk)
+                bubble.markdown(message_html("assistant", "".join(parts) + "▌"), unsafe_allow_html=True)
             
+            response = "".join(parts)
+            bubble.markdown(message_html("assistant", response), unsafe_allow_html=True)
             st.session_state.messages.append({"role": "assistant", "content": response})
-            st.rerun()
             
         except Exception as e:
+            bubble.empty()
             st.error(f"❌ Error: {str(e)}")
     
     # Close chat container
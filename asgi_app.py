@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+ASGI app for Matic Studio Chat Agent
+Async serving mode exposing the same routes as flask_app.py on AsyncOpenAI,
+so a single worker can hold many in-flight LLM calls.
+
+Run with: uvicorn asgi_app:app --host 0.0.0.0 --port $PORT
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import uuid
+from datetime import datetime
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Route
+from src.core.prompt_cache import prompt_cache_stats, track_prompt_usage
+from src.core.calendly import calendly_client
+from src.core.intent_router import intent_router
+from src.core.tool_cache import cache_stats
+from src.core.tools import calendly_link_pool_stats
+from src.core.tool_executor import tool_stats
+from src.core.session_store import SessionStore
+from database import LEADS_MAX_PAGE_SIZE, db_manager
+# Importing flask_app also starts the shared warm-up (see APP_WARMUP)
+from flask_app import SSE_HEARTBEAT_SECONDS, context_stats, get_scheduling_agent, leads_page_json, persist_turn, sse_event
+
+# Load environment variables
+load_dotenv()
+
+# Per-session conversation history (bounded by LRU, idle TTL and per-session turn caps)
+session_store = SessionStore.from_env()
+
+
+class APIJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        # MongoDB documents carry datetimes, which the stock encoder rejects
+        return json.dumps(content, default=str).encode("utf-8")
+
+
+def request_metadata(request: Request) -> dict:
+    """Collect request metadata stored alongside the conversation"""
+    return {
+        "user_agent": request.headers.get('User-Agent'),
+        "ip_address": request.client.host if request.client else None,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def is_authorized(request: Request) -> bool:
+    return request.headers.get('X-API-Key') == os.getenv("ADMIN_API_KEY")
+
+
+async def serve_chat(request: Request):
+    """Serve the chat HTML file"""
+    return FileResponse('chatMATICStudio.html')
+
+
+async def chat_api(request: Request):
+    """API endpoint for chat functionality with session management and database storage"""
+    try:
+        data = await request.json()
+        user_message = data.get('message', '')
+        conversation_history = data.get('conversation_history', [])
+        session_id = data.get('session_id') or str(uuid.uuid4())
+
+        if not user_message:
+            return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+        session_history = session_store.get_history(session_id)
+        usage = track_prompt_usage()
+        response = await get_scheduling_agent().aprocess(user_message, conversation_history=session_history)
+        session_store.save_history(session_id, session_history)
+
+        # pymongo is blocking, so persistence runs in the thread pool
+        await asyncio.to_thread(
+            persist_turn, session_id, user_message, response, conversation_history, request_metadata(request)
+        )
+
+        return JSONResponse({
+            'response': response,
+            'status': 'success',
+            'session_id': session_id,
+            'usage': usage
+        })
+
+    except Exception as e:
+        print(f"Error in chat API: {str(e)}")
+        return JSONResponse({'error': str(e), 'status': 'error'}, status_code=500)
+
+
+async def chat_stream_api(request: Request):
+    """Server-Sent Events variant of /api/chat that forwards response chunks as they are generated"""
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({'error': 'Request body must be JSON'}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({'error': 'Request body must be a JSON object'}, status_code=400)
+    user_message = data.get('message', '')
+    conversation_history = data.get('conversation_history', [])
+    session_id = data.get('session_id') or str(uuid.uuid4())
+
+    if not user_message:
+        return JSONResponse({'error': 'No message provided'}, status_code=400)
+
+    metadata = request_metadata(request)
+    session_history = session_store.get_history(session_id)
+    chunks: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in get_scheduling_agent().aprocess_stream(user_message, conversation_history=session_history):
+                await chunks.put(("chunk", chunk))
+            await chunks.put(("done", None))
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            await chunks.put(("error", str(e)))
+
+    async def generate():
+        producer = asyncio.create_task(produce())
+        parts = []
+        try:
+            yield sse_event("session", {"session_id": session_id})
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(chunks.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield sse_event("heartbeat", {})
+                    continue
+
+                if kind == "chunk":
+                    parts.append(value)
+                    yield sse_event("token", {"content": value})
+                elif kind == "error":
+                    yield sse_event("error", {"error": value, "status": "error"})
+                    return
+                else:
+                    break
+
+            session_store.save_history(session_id, session_history)
+            await asyncio.to_thread(
+                persist_turn, session_id, user_message, "".join(parts), conversation_history, metadata
+            )
+            yield sse_event("done", {"status": "success", "session_id": session_id})
+        finally:
+            # Starlette cancels the response on client disconnect; cancelling the
+            # producer closes the upstream OpenAI stream
+            producer.cancel()
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+async def health_check(request: Request):
+    """Health check endpoint"""
+    from src.core.openai_clients import openai_client_stats
+    return JSONResponse({
+        'status': 'healthy',
+        'service': 'MATIC Studio Chat Agent',
+        'database': db_manager.state(),
+        'database_writes': db_manager.writer_stats(),
+        'sessions': session_store.stats(),
+        'openai': openai_client_stats(),
+        'prompt_cache': prompt_cache_stats.stats(),
+        'context': context_stats(),
+        'intents': intent_router.stats(),
+        'tools': tool_stats.stats(),
+        'tool_cache': cache_stats(),
+        'calendly': calendly_client.stats(),
+        'calendly_link_pool': calendly_link_pool_stats()
+    })
+
+
+async def get_leads(request: Request):
+    """Admin endpoint to retrieve leads (protected)"""
+    if not is_authorized(request):
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+    try:
+        # 'limit' is accepted as an alias for page_size
+        page_size = int(request.query_params.get('page_size', request.query_params.get('limit', 50)))
+        page_size = max(1, min(page_size, LEADS_MAX_PAGE_SIZE))
+        fields = [field for field in request.query_params.get('fields', '').split(',') if field]
+        leads = iter(await asyncio.to_thread(
+            db_manager.find_leads,
+            page_size=page_size,
+            cursor=request.query_params.get('cursor'),
+            status=request.query_params.get('status'),
+            company=request.query_params.get('company'),
+            fields=fields
+        ))
+        # The query runs on the first fetch; do it here so a database error is still a 500, not a broken stream
+        first = await asyncio.to_thread(next, leads, None)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+    if first is not None:
+        leads = itertools.chain([first], leads)
+    # Starlette iterates sync generators in the thread pool, so the blocking cursor stays off the loop
+    dumps = lambda value: json.dumps(value, default=str)
+    return StreamingResponse(leads_page_json(leads, page_size, fields, dumps), media_type='application/json')
+
+
+async def get_analytics(request: Request):
+    """Admin endpoint to retrieve analytics (protected)"""
+    if not is_authorized(request):
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+    try:
+        analytics = await asyncio.to_thread(db_manager.get_analytics)
+        return APIJSONResponse(analytics)
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def update_lead_status(request: Request):
+    """Admin endpoint to update lead status (protected)"""
+    if not is_authorized(request):
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+    try:
+        data = await request.json()
+        status = data.get('status')
+
+        if not status:
+            return JSONResponse({'error': 'Status is required'}, status_code=400)
+
+        email = request.path_params['email']
+        success = await asyncio.to_thread(db_manager.update_lead_status, email, status)
+
+        if success:
+            return JSONResponse({'message': 'Lead status updated successfully'})
+        return JSONResponse({'error': 'Lead not found'}, status_code=404)
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route('/', serve_chat),
+        Route('/api/chat', chat_api, methods=['POST']),
+        Route('/api/chat/stream', chat_stream_api, methods=['POST']),
+        Route('/health', health_check),
+        Route('/api/admin/leads', get_leads, methods=['GET']),
+        Route('/api/admin/analytics', get_analytics, methods=['GET']),
+        Route('/api/admin/lead/{email}/status', update_lead_status, methods=['PUT']),
+    ],
+    middleware=[
+        # Enable CORS for website integration
+        Middleware(CORSMiddleware, allow_origins=[
+            "https://maticstudio.net",
+            "https://www.maticstudio.net",
+            "http://localhost:3000",
+            "http://localhost:5000"
+        ], allow_methods=["*"], allow_headers=["*"])
+    ]
+)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Throughput comparison: sync Flask app vs. async ASGI app
+
+Both apps are driven in-process with a fake OpenAI client that sleeps for a
+fixed latency per completion, so the numbers reflect how many LLM calls each
+serving mode can keep in flight rather than model speed.
+
+Usage:
+    python benchmarks/bench_async_throughput.py --requests 200 --latency 0.5 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import httpx
+
+import asgi_app
+import flask_app
+
+
+ANSWER = "Happy to help with your automation project."
+
+
+def _stream(text: str):
+    """The answer as a single streamed chunk, as the agents request completions with stream=True"""
+    delta = SimpleNamespace(content=text, tool_calls=None)
+    return [SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason="stop")], usage=None)]
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncStream(FakeStream):
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+class FakeSyncClient:
+    def __init__(self, latency: float):
+        self.chat = SimpleNamespace(completions=self)
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return FakeStream(_stream(ANSWER))
+
+
+class FakeAsyncClient:
+    def __init__(self, latency: float):
+        self.chat = SimpleNamespace(completions=self)
+        self.latency = latency
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return FakeAsyncStream(_stream(ANSWER))
+
+
+def bench_flask(requests: int, workers: int) -> float:
+    """Each thread stands in for one gunicorn sync worker"""
+    client = flask_app.app.test_client()
+
+    def call(i: int):
+        resp = client.post('/api/chat', json={'message': 'What can you automate?', 'session_id': f"flask-{i}"})
+        assert resp.status_code == 200, resp.data
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(call, range(requests)))
+    return time.perf_counter() - start
+
+
+async def bench_asgi(requests: int) -> float:
+    transport = httpx.ASGITransport(app=asgi_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def call(i: int):
+            resp = await client.post('/api/chat', json={'message': 'What can you automate?', 'session_id': f"asgi-{i}"})
+            assert resp.status_code == 200, resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call(i) for i in range(requests)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per OpenAI completion")
+    parser.add_argument("--workers", type=int, default=4, help="Sync workers for the Flask path")
+    args = parser.parse_args()
+
+    flask_app.get_scheduling_agent().client = FakeSyncClient(args.latency)
+    asgi_app.get_scheduling_agent().async_client = FakeAsyncClient(args.latency)
+
+    flask_seconds = bench_flask(args.requests, args.workers)
+    asgi_seconds = asyncio.run(bench_asgi(args.requests))
+
+    print(f"{args.requests} requests, {args.latency:.2f}s simulated LLM latency")
+    print(f"{'mode':<28}{'seconds':>10}{'req/s':>10}")
+    print(f"{f'flask ({args.workers} sync workers)':<28}{flask_seconds:>10.2f}{args.requests / flask_seconds:>10.1f}")
+    print(f"{'asgi (1 process)':<28}{asgi_seconds:>10.2f}{args.requests / asgi_seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
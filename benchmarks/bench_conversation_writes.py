@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Write bytes per turn: full-transcript $set vs. append-only $push
+
+Encodes the update document each storage model sends to MongoDB for every
+turn of a simulated conversation (BSON, as on the wire) and reports the
+per-turn and cumulative sizes. Runs offline; no database connection needed.
+
+Usage:
+    python benchmarks/bench_conversation_writes.py --turns 50
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+
+from database import DatabaseManager
+from src.core.prompts import MATIC_STUDIO_FEW_SHOT_EXAMPLES
+
+
+def full_rewrite_update(session_id, messages, metadata):
+    """The update save_conversation used to send on every turn"""
+    return {"$set": {
+        "session_id": session_id,
+        "messages": messages,
+        "metadata": metadata,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    # Build the append payload without connecting to MongoDB
+    db = DatabaseManager.__new__(DatabaseManager)
+    metadata = {"user_agent": "Mozilla/5.0", "ip_address": "203.0.113.7", "timestamp": datetime.utcnow().isoformat()}
+    session_id = "benchmark-session"
+
+    transcript = []
+    before_total = after_total = 0
+    print(f"{'turn':>6}{'full $set bytes':>18}{'$push bytes':>14}")
+    for turn in range(1, args.turns + 1):
+        example = MATIC_STUDIO_FEW_SHOT_EXAMPLES[turn % len(MATIC_STUDIO_FEW_SHOT_EXAMPLES)]
+        new_messages = [
+            {"role": "user", "content": example["user"]},
+            {"role": "assistant", "content": example["assistant"]}
+        ]
+        transcript.extend(new_messages)
+
+        before = len(bson.encode(full_rewrite_update(session_id, transcript, metadata)))
+        _, update = db._conversation_append(session_id, new_messages, metadata)
+        after = len(bson.encode(update))
+        before_total += before
+        after_total += after
+
+        if turn in (1, 10, 25) or turn == args.turns or turn % 100 == 0:
+            print(f"{turn:>6}{before:>18,}{after:>14,}")
+
+    print(f"{'total':>6}{before_total:>18,}{after_total:>14,}")
+    print(f"append-only writes {before_total / after_total:.1f}x fewer bytes over {args.turns} turns")
+
+
+if __name__ == "__main__":
+    main()
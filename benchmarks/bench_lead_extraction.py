@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Lead extraction cost per message: legacy regex scan vs. LeadExtractor
+
+Replays simulated conversations built from the few-shot examples, with
+contact details sprinkled into some visitor turns, through the extraction
+that used to run in persist_turn (patterns compiled on every call, behind a
+keyword gate), the same extraction re-run over the whole conversation each
+turn, and the incremental LeadExtractor. Reports microseconds per message
+for each. Runs offline.
+
+Usage:
+    python benchmarks/bench_lead_extraction.py --sessions 200 --turns 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lead_extraction import LeadExtractor
+from src.core.prompts import MATIC_STUDIO_FEW_SHOT_EXAMPLES
+
+CONTACT_LINES = [
+    "My name is Maria Santos and my email is maria.santos@blueocean.ph",
+    "You can reach me at +63 917 123 4567.",
+    "I work at Northwind Traders, we have about 40 staff.",
+    "I'm Ben Cruz from Acme Corp. ben@acme.io is best.",
+    "Can we meet Monday 10:00 AM on 2025-03-14?",
+    "Our budget is around 50000 for the first phase.",
+]
+
+
+def legacy_extract_lead_info(message: str, conversation_history: list) -> dict:
+    """The extraction persist_turn used before LeadExtractor"""
+    lead_data = {}
+    message_lower = message.lower()
+
+    import re
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    emails = re.findall(email_pattern, message)
+    if emails:
+        lead_data['email'] = emails[0]
+
+    phone_pattern = r'[\+]?[1-9][\d]{0,15}'
+    phones = re.findall(phone_pattern, message)
+    if phones and len(phones[0]) >= 10:
+        lead_data['phone'] = phones[0]
+
+    company_keywords = ['company', 'corp', 'inc', 'ltd', 'llc', 'enterprises']
+    words = message.split()
+    for i, word in enumerate(words):
+        if any(keyword in word.lower() for keyword in company_keywords):
+            if i > 0:
+                lead_data['company'] = words[i-1] + ' ' + word
+            break
+
+    name_keywords = ['name', 'i am', 'my name is', 'call me']
+    for keyword in name_keywords:
+        if keyword in message_lower:
+            start_idx = message_lower.find(keyword) + len(keyword)
+            name_part = message[start_idx:].strip().split()[0:2]
+            if name_part:
+                lead_data['name'] = ' '.join(name_part)
+            break
+
+    return lead_data if lead_data else None
+
+
+def build_corpus(sessions: int, turns: int, seed: int):
+    rng = random.Random(seed)
+    corpus = []
+    for s in range(sessions):
+        conversation = []
+        for _ in range(turns):
+            example = rng.choice(MATIC_STUDIO_FEW_SHOT_EXAMPLES)
+            user = example["user"]
+            if rng.random() < 0.25:
+                user = f"{user} {rng.choice(CONTACT_LINES)}"
+            conversation.append((user, example["assistant"]))
+        corpus.append((f"bench-{s}", conversation))
+    return corpus
+
+
+def run_legacy(corpus) -> float:
+    start = time.perf_counter()
+    for _, conversation in corpus:
+        history = []
+        for user, assistant in conversation:
+            new_messages = [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+            if any(keyword in user.lower() for keyword in ['email', 'phone', 'company', 'name']):
+                legacy_extract_lead_info(user, history + new_messages)
+            history.extend(new_messages)
+    return time.perf_counter() - start
+
+
+def run_legacy_rescan(corpus) -> float:
+    """Legacy patterns re-run over every visitor turn so far, so earlier details are not lost"""
+    start = time.perf_counter()
+    for _, conversation in corpus:
+        history = []
+        for user, assistant in conversation:
+            history.extend([{"role": "user", "content": user}, {"role": "assistant", "content": assistant}])
+            lead = {}
+            for message in history:
+                if message["role"] == "user":
+                    lead.update(legacy_extract_lead_info(message["content"], history) or {})
+    return time.perf_counter() - start
+
+
+def run_incremental(corpus) -> float:
+    extractor = LeadExtractor()
+    start = time.perf_counter()
+    for session_id, conversation in corpus:
+        for user, assistant in conversation:
+            new_messages = [{"role": "user", "content": user}, {"role": "assistant", "content": assistant}]
+            extractor.update(session_id, new_messages)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs is reported")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.sessions, args.turns, args.seed)
+    messages = args.sessions * args.turns
+
+    results = [
+        ("legacy, keyword gate", run_legacy),
+        ("legacy, full rescan", run_legacy_rescan),
+        ("LeadExtractor", run_incremental),
+    ]
+
+    print(f"{messages:,} visitor messages across {args.sessions} sessions of {args.turns} turns")
+    print(f"{'extractor':<24}{'seconds':>10}{'us/message':>12}")
+    for label, run in results:
+        seconds = min(run(corpus) for _ in range(args.repeat))
+        print(f"{label:<24}{seconds:>10.3f}{seconds / messages * 1e6:>12.1f}")
+    print("the keyword gate skips most turns and drops details given before the latest message; "
+          "a full rescan keeps them at O(turns^2) cost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Sequential vs. speculative tool execution for a tool-using turn
+
+A fake OpenAI client streams a message with several tool calls, one argument
+fragment per simulated token. The sequential mode waits for the whole message
+and then runs each tool in turn (the previous behaviour); the speculative mode
+is SchedulingAgent.process, which starts each tool as soon as its arguments are
+complete. Tools sleep for a fixed latency, standing in for Calendly calls.
+
+Usage:
+    python benchmarks/bench_speculative_tools.py --tools 3 --tool-latency 0.3 --token-delay 0.02
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from src.agents.scheduling_agent import SchedulingAgent
+from src.core.streaming import StreamedMessage, tool_call_arguments
+from src.core.tools import Tool
+
+
+def _chunk(content=None, tool_call=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=[tool_call] if tool_call else None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+class FakeStream:
+    def __init__(self, chunks, token_delay: float):
+        self.chunks = chunks
+        self.token_delay = token_delay
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            time.sleep(self.token_delay)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class FakeStreamingClient:
+    """First completion streams ``tools`` tool calls; the follow-up returns a short answer"""
+
+    def __init__(self, tools: int, token_delay: float):
+        self.chat = SimpleNamespace(completions=self)
+        self.tools = tools
+        self.token_delay = token_delay
+
+    def create(self, messages, **kwargs):
+        if messages[-1]["role"] == "tool":
+            time.sleep(self.token_delay * 5)
+            if kwargs.get("stream"):
+                return FakeStream([_chunk(content="Your meetings are booked."), _chunk(finish_reason="stop")], 0)
+            message = SimpleNamespace(role="assistant", content="Your meetings are booked.", tool_calls=None)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+        chunks = []
+        for index in range(self.tools):
+            arguments = json.dumps({"client_name": f"Client {index}", "company_name": "Acme Corp", "email": f"c{index}@acme.com"})
+            function = SimpleNamespace(name="book_meeting", arguments=None)
+            chunks.append(_chunk(tool_call=SimpleNamespace(index=index, id=f"call_{index}", function=function)))
+            # Roughly four characters per streamed token
+            for start in range(0, len(arguments), 4):
+                function = SimpleNamespace(name=None, arguments=arguments[start:start + 4])
+                chunks.append(_chunk(tool_call=SimpleNamespace(index=index, id=None, function=function)))
+        chunks.append(_chunk(finish_reason="tool_calls"))
+        return FakeStream(chunks, self.token_delay)
+
+
+def make_agent(args) -> SchedulingAgent:
+    def book_meeting(client_name: str, company_name: str, email: str) -> str:
+        time.sleep(args.tool_latency)
+        return f"✅ Booked {client_name} ({email})"
+
+    tool = Tool(
+        name="book_meeting",
+        description="Book a consultation",
+        parameters={
+            "type": "object",
+            "properties": {
+                "client_name": {"type": "string"},
+                "company_name": {"type": "string"},
+                "email": {"type": "string"}
+            },
+            "required": ["client_name", "company_name", "email"]
+        },
+        function=book_meeting
+    )
+    agent = SchedulingAgent(tools=[tool])
+    agent.client = FakeStreamingClient(args.tools, args.token_delay)
+    agent.enable_memory = False
+    return agent
+
+
+def run_sequential(agent: SchedulingAgent) -> float:
+    """Wait for the full message, then run each tool in turn"""
+    start = time.perf_counter()
+    messages = agent._build_messages("Book meetings for my team", [])
+    streamed = StreamedMessage()
+    for _ in agent._stream_completion(messages, streamed, tools=agent.tools_payload, tool_choice="auto"):
+        pass
+    messages.append(streamed.to_message())
+    for tool_call in streamed.tool_calls:
+        result = agent.tool_map[tool_call["function"]["name"]].execute(**tool_call_arguments(tool_call))
+        messages.append({"role": "tool", "content": result, "tool_call_id": tool_call["id"]})
+    agent._call_llm(messages)
+    return time.perf_counter() - start
+
+
+def run_speculative(agent: SchedulingAgent) -> float:
+    start = time.perf_counter()
+    agent.process("Book meetings for my team")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", type=int, default=3, help="Tool calls in the streamed message")
+    parser.add_argument("--tool-latency", type=float, default=0.3, help="Seconds each tool call takes")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    agent = make_agent(args)
+    sequential = min(run_sequential(agent) for _ in range(args.repeat))
+    speculative = min(run_speculative(agent) for _ in range(args.repeat))
+
+    print(f"{args.tools} tool calls, {args.tool_latency:.2f}s per tool, {args.token_delay * 1000:.0f}ms per chunk")
+    print(f"{'mode':<14}{'seconds':>10}")
+    print(f"{'sequential':<14}{sequential:>10.2f}")
+    print(f"{'speculative':<14}{speculative:>10.2f}")
+    print(f"saved {sequential - speculative:.2f}s ({(1 - speculative / sequential) * 100:.0f}%)")
+    print("\nlast speculative turn:")
+    print(f"{'tool':<14}{'started_ms':>12}{'stream_ms':>12}{'tool_ms':>10}{'overlap_ms':>12}")
+    for timing in agent.last_tool_timings:
+        print(f"{timing['tool']:<14}{timing['started_ms']:>12.1f}{timing['stream_ms']:>12.1f}"
+              f"{timing['tool_ms']:>10.1f}{timing['overlap_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
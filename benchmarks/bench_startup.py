@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the web entry point (flask_app by default)
+
+Each run starts a fresh interpreter with ``python -X importtime`` and imports
+the module, as a gunicorn worker does on boot, with APP_WARMUP=false so only
+import-time work is counted. A second fresh interpreter also builds the
+scheduling agent, which is what the first request pays without warm-up.
+The slowest imports of the last run are listed by cumulative time.
+
+To compare against another revision, point --root at a checkout of it:
+    git worktree add /tmp/before <rev>
+    python benchmarks/bench_startup.py --root /tmp/before
+    python benchmarks/bench_startup.py --runs 10 --max-import-ms 600
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READY_SCRIPT = """
+import {module}
+if hasattr({module}, "get_scheduling_agent"):
+    {module}.get_scheduling_agent()
+else:
+    {module}.scheduling_agent
+"""
+
+
+def run(root: str, args: List[str]) -> Tuple[float, str]:
+    env = dict(os.environ, PYTHONPATH=root, APP_WARMUP="false")
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=root, env=env, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise SystemExit(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return elapsed_ms, result.stderr
+
+
+def parse_importtime(output: str) -> List[Tuple[int, float, str]]:
+    """(depth, cumulative ms, module) for each line of -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((depth, int(cumulative) / 1000, name.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=ROOT, help="Checkout to measure")
+    parser.add_argument("--module", default="flask_app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-ms", type=float, help="Exit non-zero if the median import exceeds this")
+    args = parser.parse_args()
+
+    import_ms = []
+    process_ms = []
+    ready_ms = []
+    imports = []
+    for _ in range(args.runs):
+        elapsed_ms, output = run(args.root, ["-X", "importtime", "-c", f"import {args.module}"])
+        imports = parse_importtime(output)
+        import_ms.append(next(ms for depth, ms, name in imports if depth == 0 and name == args.module))
+        process_ms.append(elapsed_ms)
+        ready_ms.append(run(args.root, ["-c", READY_SCRIPT.format(module=args.module)])[0])
+
+    print(f"{args.root}: import {args.module}, {args.runs} runs (medians)")
+    print(f"{'import':<28}{statistics.median(import_ms):>10.1f} ms")
+    print(f"{'process start + import':<28}{statistics.median(process_ms):>10.1f} ms")
+    print(f"{'... + build agent':<28}{statistics.median(ready_ms):>10.1f} ms")
+    print()
+    print("Slowest imports (cumulative, last run):")
+    for depth, ms, name in sorted((entry for entry in imports if 0 < entry[0] <= 2), key=lambda entry: -entry[1])[:args.top]:
+        print(f"  {ms:>8.1f} ms  {'  ' * (depth - 1)}{name}")
+
+    if args.max_import_ms is not None and statistics.median(import_ms) > args.max_import_ms:
+        raise SystemExit(f"❌ Median import {statistics.median(import_ms):.1f} ms exceeds {args.max_import_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Rerun latency of the Streamlit front end (app.py)
+
+Streamlit re-executes the whole script on every click or message, so anything
+done at module level is paid on each interaction. This drives the script
+headlessly with streamlit.testing.v1.AppTest and times the first run and the
+following reruns; no chat message is sent, so no OpenAI call is made.
+
+To compare against another revision, point --app at a copy of it:
+    git show <rev>:app.py > /tmp/app_before.py
+    python benchmarks/bench_streamlit_rerun.py --app /tmp/app_before.py
+    python benchmarks/bench_streamlit_rerun.py --reruns 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from streamlit.testing.v1 import AppTest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-run timeout in seconds")
+    args = parser.parse_args()
+
+    # app.py serves chatMATICStudio.html relative to the working directory
+    script = os.path.abspath(args.app)
+    os.chdir(ROOT)
+    app = AppTest.from_file(script, default_timeout=args.timeout)
+
+    start = time.perf_counter()
+    app.run()
+    first_ms = (time.perf_counter() - start) * 1000
+    if app.exception:
+        raise SystemExit(f"App raised: {app.exception}")
+
+    reruns = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        app.run()
+        reruns.append((time.perf_counter() - start) * 1000)
+
+    print(f"{args.app}: {args.reruns} reruns")
+    print(f"{'first run':<14}{first_ms:>10.1f} ms")
+    print(f"{'rerun median':<14}{statistics.median(reruns):>10.1f} ms")
+    print(f"{'rerun max':<14}{max(reruns):>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
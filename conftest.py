@@ -0,0 +1,11 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def openai_api_key(monkeypatch):
+    """Agents build their OpenAI client on construction; no test talks to the real API"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
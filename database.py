@@ -4,46 +4,367 @@ MongoDB integration for MATIC Studio Chat Agent
 Handles conversation storage and lead management
 """
 
+import atexit
+import base64
+import json
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import DESCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_STOP = object()
+
+# A failed connection is retried on use after this many seconds, doubling per failure up to the max
+DB_CONNECT_RETRY_SECONDS = float(os.getenv("DB_CONNECT_RETRY_SECONDS", 5))
+DB_CONNECT_MAX_RETRY_SECONDS = float(os.getenv("DB_CONNECT_MAX_RETRY_SECONDS", 300))
+# How long one connection attempt waits for a reachable MongoDB server (pymongo's default is 30s)
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 3000))
+
+# Hard cap on leads returned per admin API page
+LEADS_MAX_PAGE_SIZE = 200
+
+# Lead fields that may be requested through the admin API projection
+LEAD_FIELDS = {"name", "email", "phone", "company", "status", "source", "created_at", "updated_at",
+               "last_contact", "conversation_count"}
+
+# Fields managed by the lead upsert itself rather than copied from extracted lead data
+_LEAD_MANAGED_FIELDS = {"_id", "email_key", "phone_key", "created_at", "updated_at", "last_contact",
+                        "status", "source", "conversation_count"}
+
+
+def rollup_key(value: Optional[str]) -> str:
+    """Field-safe key for analytics rollup maps (field names cannot contain '.' or start with '$')"""
+    if not value or not str(value).strip():
+        return "_none"
+    return re.sub(r"[.$]", "_", str(value).strip().lower())
+
+
+def encode_lead_cursor(lead: Dict) -> str:
+    """Opaque keyset cursor pointing just after ``lead`` in (created_at, _id) descending order.
+    Leads without created_at sort last and are paged by _id alone"""
+    created_at = lead.get("created_at")
+    raw = json.dumps({"t": created_at.isoformat() if created_at else None, "id": str(lead["_id"])})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_lead_cursor(cursor: str) -> Tuple[Optional[datetime], ObjectId]:
+    """Inverse of encode_lead_cursor; raises ValueError for malformed cursors"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = datetime.fromisoformat(data["t"]) if data["t"] is not None else None
+        return created_at, ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Dedupe key for an email address: trimmed and lower-cased"""
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email if "@" in email else None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Dedupe key for a phone number: E.164-style '+' followed by digits only"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if phone.strip().startswith("00"):
+        digits = digits[2:]
+    # E.164 numbers carry at most 15 digits; anything under 7 is not a usable phone number
+    if not 7 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+
+class WriteBehindQueue:
+    """Background writer that takes conversation and lead writes off the request path.
+    
+    Writes are buffered in a bounded queue and drained by a single worker thread.
+    Message appends for the same session_id are coalesced into one update and flushed with
+    ``bulk_write`` once ``batch_size`` writes are pending or ``flush_interval``
+    seconds have passed. When the queue is full, producers wait up to
+    ``put_timeout`` seconds before the write is dropped.
+    """
+    
+    def __init__(self, db: "DatabaseManager", max_size: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 1.0, put_timeout: float = 0.5):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._conversations: Dict[str, Dict] = {}
+        self._leads: List[Dict] = []
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.written = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+    
+    def submit_messages(self, session_id: str, messages: List[Dict], metadata: Dict = None) -> bool:
+        return self._put(("conversation", session_id, {"messages": list(messages), "metadata": metadata}))
+    
+    def submit_lead(self, lead_data: Dict) -> bool:
+        return self._put(("lead", None, lead_data))
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything enqueued so far has been written"""
+        done = threading.Event()
+        if not self._put(("flush", None, done), timeout=timeout):
+            return False
+        return done.wait(timeout)
+    
+    def close(self, timeout: float = 10.0):
+        """Flush pending writes and stop the worker (registered with atexit)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+    
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+                "flush_errors": self.flush_errors,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_flush_ms": round(self.max_flush_ms, 2)
+            }
+    
+    def _put(self, item, timeout: Optional[float] = None) -> bool:
+        if self._closed:
+            return False
+        try:
+            # Backpressure: wait for the worker to make room before dropping
+            self._queue.put(item, timeout=self.put_timeout if timeout is None else timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            print("⚠️  Write-behind queue full, dropping database write")
+            return False
+        if item[0] != "flush":
+            with self._stats_lock:
+                self.enqueued += 1
+        return True
+    
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            
+            if item is _STOP:
+                self._flush()
+                return
+            
+            if item is not None:
+                kind, key, payload = item
+                if kind == "conversation":
+                    pending = self._conversations.get(key)
+                    if pending is None:
+                        self._conversations[key] = dict(payload, writes=1)
+                    else:
+                        # Later turns of the same session become a single $push
+                        pending["messages"].extend(payload["messages"])
+                        pending["metadata"] = payload["metadata"] or pending["metadata"]
+                        pending["writes"] += 1
+                        with self._stats_lock:
+                            self.coalesced += 1
+                elif kind == "lead":
+                    self._leads.append(payload)
+                else:
+                    self._flush()
+                    payload.set()
+            
+            pending = len(self._conversations) + len(self._leads)
+            if pending >= self.batch_size or time.monotonic() >= deadline:
+                self._flush()
+                deadline = time.monotonic() + self.flush_interval
+    
+    def _flush(self):
+        if not self._conversations and not self._leads:
+            return
+        
+        # The worker is the only writer that may wait on a connection; request threads never do
+        if not self.db.connect():
+            dropped = sum(pending["writes"] for pending in self._conversations.values()) + len(self._leads)
+            self._conversations = {}
+            self._leads = []
+            with self._stats_lock:
+                self.dropped += dropped
+                self.flush_errors += 1
+            print(f"⚠️  Database unavailable, dropping {dropped} pending write(s)")
+            return
+        
+        conversations = [
+            UpdateOne(*self.db._conversation_append(session_id, pending["messages"], pending["metadata"]), upsert=True)
+            for session_id, pending in self._conversations.items()
+        ]
+        # Submitted writes behind each coalesced update, so failures are counted per dropped write
+        conversation_writes = [pending["writes"] for pending in self._conversations.values()]
+        leads = self._leads
+        self._conversations = {}
+        self._leads = []
+        
+        start = time.perf_counter()
+        written = 0
+        errors = 0
+        dropped = 0
+        try:
+            if conversations and self.db.conversations is not None:
+                result = self.db.conversations.bulk_write(conversations, ordered=False)
+                written += len(conversations)
+                self.db._record_new_conversations(result.upserted_count)
+        except BulkWriteError as e:
+            # Unordered: every update without a write error was applied
+            failed = [error["index"] for error in e.details.get("writeErrors", [])]
+            errors += 1
+            written += len(conversations) - len(failed)
+            dropped += sum(conversation_writes[index] for index in failed)
+            self.db._record_new_conversations(e.details.get("nUpserted", 0))
+            print(f"❌ Error flushing conversations, dropped {len(failed)} update(s): {e}")
+        except Exception as e:
+            errors += 1
+            dropped += sum(conversation_writes)
+            print(f"❌ Error flushing conversations, dropped {sum(conversation_writes)} write(s): {e}")
+        
+        if leads:
+            written += self.db.save_leads(leads)
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.flushes += 1
+            self.written += written
+            self.flush_errors += errors
+            self.dropped += dropped
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+class _ConnectOnRead:
+    """DatabaseManager attribute that starts connecting to MongoDB the first time it is read.
+    Reads never wait: until the connection is up they return None, as when the database is down"""
+    
+    def __set_name__(self, owner, name):
+        self.attribute = "_" + name
+    
+    def __get__(self, manager, owner=None):
+        if manager is None:
+            return self
+        manager.connect(wait=False)
+        return getattr(manager, self.attribute)
+    
+    def __set__(self, manager, value):
+        setattr(manager, self.attribute, value)
+
 class DatabaseManager:
+    # Connecting is deferred to first use (or the app's warm-up) and runs off the calling thread,
+    # so neither importing this module nor serving a request waits on MongoDB
+    client = _ConnectOnRead()
+    db = _ConnectOnRead()
+    conversations = _ConnectOnRead()
+    leads = _ConnectOnRead()
+    analytics = _ConnectOnRead()
+    
     def __init__(self):
         self.mongodb_uri = os.getenv("MONGODB_URI")
-        self.client = None
-        self.db = None
-        self.conversations = None
-        self.leads = None
-        self.initialize_database()
+        self._client = None
+        self._db = None
+        self._conversations = None
+        self._leads = None
+        self._analytics = None
+        self._writer: Optional[WriteBehindQueue] = None
+        self._writer_lock = threading.Lock()
+        self.write_behind = bool(self.mongodb_uri) and os.getenv("DB_WRITE_BEHIND", "true").lower() != "false"
+        self._connected = False
+        self._connect_lock = threading.Lock()
+        self._connect_thread: Optional[threading.Thread] = None
+        self._connect_thread_lock = threading.Lock()
+        self._connect_failures = 0
+        self._retry_at = 0.0
+    
+    def connect(self, wait: bool = True) -> bool:
+        """Connect on first call; later calls return at once. Returns whether the database is available.
+        
+        A failed attempt is retried on a later call once its backoff has passed; without
+        MONGODB_URI the database stays disabled. With wait=False a due attempt is started on a
+        background thread and this returns immediately.
+        """
+        if not self._connected and time.monotonic() >= self._retry_at:
+            if wait:
+                self._connect()
+            else:
+                self._connect_in_background()
+        return self._client is not None
+    
+    def _connect(self):
+        with self._connect_lock:
+            if not self._connected and time.monotonic() >= self._retry_at:
+                self.initialize_database()
+                if self._client is not None or not self.mongodb_uri:
+                    self._connected = True
+                else:
+                    self._connect_failures += 1
+                    backoff = DB_CONNECT_RETRY_SECONDS * 2 ** (self._connect_failures - 1)
+                    self._retry_at = time.monotonic() + min(backoff, DB_CONNECT_MAX_RETRY_SECONDS)
+    
+    def _connect_in_background(self):
+        with self._connect_thread_lock:
+            if self._connect_thread is not None and self._connect_thread.is_alive():
+                return
+            self._connect_thread = threading.Thread(target=self._connect, name="db-connect", daemon=True)
+            self._connect_thread.start()
+    
+    def state(self) -> str:
+        """Connection state for /health, without triggering a connection"""
+        if not self._connected:
+            return "disconnected" if self._connect_failures else "not_connected_yet"
+        return "connected" if self._client is not None else "disconnected"
     
     def initialize_database(self):
         """Initialize MongoDB connection and collections"""
+        client = None
         try:
             if not self.mongodb_uri:
                 print("⚠️  MONGODB_URI not found. Database features will be disabled.")
                 return
             
-            self.client = MongoClient(self.mongodb_uri)
+            client = MongoClient(self.mongodb_uri, serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS)
             # Test the connection
-            self.client.admin.command('ping')
-            
-            self.db = self.client.maticstudio_chat
-            self.conversations = self.db.conversations
-            self.leads = self.db.leads
+            client.admin.command('ping')
             
-            # Create indexes for better performance
-            self.conversations.create_index("session_id")
-            self.conversations.create_index("created_at")
-            self.leads.create_index("email")
-            self.leads.create_index("company")
-            self.leads.create_index("created_at")
+            self.db = client.maticstudio_chat
+            self.conversations = self._db.conversations
+            self.leads = self._db.leads
+            # Incrementally maintained counters behind /api/admin/analytics
+            self.analytics = self._db.analytics
             
+            self.client = client
             print("✅ MongoDB connected successfully")
             
         except ConnectionFailure as e:
@@ -52,27 +373,77 @@ class DatabaseManager:
         except Exception as e:
             print(f"❌ Database initialization error: {e}")
             self.client = None
+        finally:
+            # A client that failed its ping still holds monitor threads and sockets; each retry builds a new one
+            if client is not None and self._client is not client:
+                client.close()
     
-    def save_conversation(self, session_id: str, messages: List[Dict], metadata: Dict = None):
-        """Save conversation to MongoDB"""
-        if not self.conversations:
+    def create_indexes(self):
+        """Create the indexes the app relies on. Run once per deploy (python database.py create-indexes),
+        not on startup; create_index is a no-op for indexes that already exist"""
+        self.conversations.create_index("session_id")
+        self.conversations.create_index("created_at")
+        self.leads.create_index("email")
+        self.leads.create_index(
+            "email_key", unique=True, partialFilterExpression={"email_key": {"$type": "string"}}
+        )
+        self.leads.create_index("phone_key", partialFilterExpression={"phone_key": {"$type": "string"}})
+        self.leads.create_index("company")
+        self.leads.create_index("created_at")
+        # Keyset pagination for the admin leads API, optionally filtered by status or company
+        self.leads.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        self.leads.create_index([("status", 1), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        self.leads.create_index([("company", 1), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    
+    def _conversation_append(self, session_id: str, messages: List[Dict], metadata: Dict = None) -> Tuple[Dict, Dict]:
+        now = datetime.utcnow()
+        update = {
+            # Append-only: only the new messages are sent, never the whole transcript
+            "$push": {"messages": {"$each": messages}},
+            "$inc": {"message_count": len(messages)},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        }
+        if metadata:
+            update["$set"]["metadata"] = metadata
+        return {"session_id": session_id}, update
+    
+    def append_messages(self, session_id: str, messages: List[Dict], metadata: Dict = None) -> bool:
+        """Append new messages to a conversation, creating it if needed"""
+        if self.conversations is None:
             return False
         
         try:
-            conversation_data = {
-                "session_id": session_id,
-                "messages": messages,
-                "metadata": metadata or {},
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
+            query, update = self._conversation_append(session_id, messages, metadata)
+            result = self.conversations.update_one(query, update, upsert=True)
+            self._record_new_conversations(1 if result.upserted_id is not None else 0)
+            return True
             
-            # Update existing conversation or insert new one
+        except Exception as e:
+            print(f"❌ Error saving conversation: {e}")
+            return False
+    
+    def save_conversation(self, session_id: str, messages: List[Dict], metadata: Dict = None):
+        """Replace the stored transcript of a conversation (prefer append_messages for new turns)"""
+        if self.conversations is None:
+            return False
+        
+        try:
+            now = datetime.utcnow()
             result = self.conversations.update_one(
                 {"session_id": session_id},
-                {"$set": conversation_data},
+                {
+                    "$set": {
+                        "messages": messages,
+                        "message_count": len(messages),
+                        "metadata": metadata or {},
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
                 upsert=True
             )
+            self._record_new_conversations(1 if result.upserted_id is not None else 0)
             
             return True
             
@@ -80,123 +451,566 @@ class DatabaseManager:
             print(f"❌ Error saving conversation: {e}")
             return False
     
-    def get_conversation(self, session_id: str) -> Optional[Dict]:
-        """Retrieve conversation from MongoDB"""
-        if not self.conversations:
+    def queue_messages(self, session_id: str, messages: List[Dict], metadata: Dict = None) -> bool:
+        """Append messages via the write-behind queue (synchronously if it is disabled)"""
+        writer = self._write_behind()
+        if writer is None:
+            return self.append_messages(session_id, messages, metadata)
+        return writer.submit_messages(session_id, messages, metadata)
+    
+    def queue_lead(self, lead_data: Dict) -> bool:
+        """Save lead via the write-behind queue (synchronously if it is disabled)"""
+        writer = self._write_behind()
+        if writer is None:
+            return self.save_lead(lead_data)
+        return writer.submit_lead(lead_data)
+    
+    def _write_behind(self) -> Optional[WriteBehindQueue]:
+        # Created without connecting: the queue accepts writes at once and its worker connects
+        if self._writer is None and self.write_behind:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = WriteBehindQueue(
+                        self,
+                        max_size=int(os.getenv("DB_WRITE_QUEUE_SIZE", 1000)),
+                        batch_size=int(os.getenv("DB_WRITE_BATCH_SIZE", 100)),
+                        flush_interval=float(os.getenv("DB_WRITE_FLUSH_SECONDS", 1.0))
+                    )
+        return self._writer
+    
+    def writer_stats(self) -> Dict:
+        # Read without connecting, so /health never blocks on MongoDB
+        return self._writer.stats() if self._writer else {}
+    
+    def get_conversation(self, session_id: str, last_n: Optional[int] = None) -> Optional[Dict]:
+        """Retrieve conversation from MongoDB, optionally only its last ``last_n`` messages"""
+        if self.conversations is None:
             return None
         
         try:
-            conversation = self.conversations.find_one({"session_id": session_id})
+            projection = {"messages": {"$slice": -last_n}} if last_n else None
+            conversation = self.conversations.find_one({"session_id": session_id}, projection)
             return conversation
             
         except Exception as e:
             print(f"❌ Error retrieving conversation: {e}")
             return None
     
+    def save_conversation_summary(self, session_id: str, summary: str, summarized_messages: int) -> bool:
+        """Store the rolling summary that replaces the first ``summarized_messages`` messages of a conversation"""
+        if self.conversations is None:
+            return False
+        
+        try:
+            now = datetime.utcnow()
+            result = self.conversations.update_one(
+                {"session_id": session_id},
+                {
+                    "$set": {
+                        "summary": summary,
+                        "summarized_messages": summarized_messages,
+                        "summary_updated_at": now,
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            self._record_new_conversations(1 if result.upserted_id is not None else 0)
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error saving conversation summary: {e}")
+            return False
+    
+    def get_conversation_memory(self, session_id: str, max_recent: int) -> Optional[Dict]:
+        """Load a conversation's summary plus the messages it does not cover, without reading the whole transcript"""
+        if self.conversations is None:
+            return None
+        
+        try:
+            conversation = self.conversations.find_one(
+                {"session_id": session_id},
+                {"summary": 1, "summarized_messages": 1, "message_count": 1, "messages": {"$slice": -max_recent}}
+            )
+            if conversation is None:
+                return None
+            
+            messages = conversation.get("messages", [])
+            unsummarized = conversation.get("message_count", len(messages)) - conversation.get("summarized_messages", 0)
+            # Anything older than max_recent that was never summarized is left out of the resumed context
+            recent = messages[-unsummarized:] if unsummarized > 0 else []
+            return {
+                "summary": conversation.get("summary", ""),
+                "summarized_messages": conversation.get("message_count", len(messages)) - len(recent),
+                "messages": recent
+            }
+            
+        except Exception as e:
+            print(f"❌ Error retrieving conversation memory: {e}")
+            return None
+    
+    def migrate_conversations(self) -> int:
+        """Backfill fields used by append-only storage on conversations written before it.
+        
+        Also repairs conversations whose message_count disagrees with their messages, e.g. a legacy
+        transcript that got an append ($inc from 0) before it was migrated. Safe to re-run.
+        """
+        if self.conversations is None:
+            return 0
+        
+        result = self.conversations.update_many(
+            {"$or": [
+                {"message_count": {"$exists": False}},
+                {"$expr": {"$ne": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]}}
+            ]},
+            [{
+                "$set": {
+                    "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+                    # created_at used to be overwritten on every turn; the ObjectId keeps the real insert time
+                    "created_at": {"$toDate": "$_id"}
+                }
+            }]
+        )
+        return result.modified_count
+    
+    def _lead_upsert(self, lead_data: Dict) -> Optional[Tuple[Dict, Dict]]:
+        email_key = normalize_email(lead_data.get("email"))
+        phone_key = normalize_phone(lead_data.get("phone"))
+        if not email_key and not phone_key:
+            return None
+        
+        now = datetime.utcnow()
+        fields = {key: value for key, value in lead_data.items() if value and key not in _LEAD_MANAGED_FIELDS}
+        fields.update({"updated_at": now, "last_contact": now})
+        if email_key:
+            fields["email"] = fields["email_key"] = email_key
+        else:
+            fields.pop("email", None)
+        if phone_key:
+            fields["phone_key"] = phone_key
+        
+        # Email is the primary identity. With an email, phone only matches a lead that gave no email
+        # yet, so a lead first seen by phone is completed (not duplicated) once the visitor shares one.
+        # The raw email is checked too: a lead with an email but no email_key (never migrated) belongs
+        # to someone else and must not have its email overwritten
+        if email_key and phone_key:
+            query = {"$or": [{"email_key": email_key}, {"phone_key": phone_key, "email_key": None, "email": None}]}
+        else:
+            query = {"email_key": email_key} if email_key else {"phone_key": phone_key}
+        update = {
+            "$set": fields,
+            "$setOnInsert": {"created_at": now, "status": "new", "source": "chat_agent"},
+            "$inc": {"conversation_count": 1}
+        }
+        return query, update
+    
     def save_lead(self, lead_data: Dict) -> bool:
-        """Save lead information to MongoDB"""
-        if not self.leads:
+        """Insert or update a lead in a single atomic upsert keyed on normalized email/phone"""
+        if self.leads is None:
             return False
         
         try:
-            lead_data.update({
-                "created_at": datetime.utcnow(),
-                "status": "new",
-                "source": "chat_agent"
-            })
-            
-            # Check if lead already exists
-            existing_lead = self.leads.find_one({
-                "$or": [
-                    {"email": lead_data.get("email")},
-                    {"phone": lead_data.get("phone")}
-                ]
-            })
-            
-            if existing_lead:
-                # Update existing lead
-                self.leads.update_one(
-                    {"_id": existing_lead["_id"]},
-                    {
-                        "$set": {
-                            "updated_at": datetime.utcnow(),
-                            "last_contact": datetime.utcnow(),
-                            "conversation_count": existing_lead.get("conversation_count", 0) + 1
-                        }
-                    }
-                )
-            else:
-                # Insert new lead
-                lead_data["conversation_count"] = 1
-                self.leads.insert_one(lead_data)
+            operation = self._lead_upsert(lead_data)
+            if operation is None:
+                return False
             
+            self._upsert_lead(lead_data, operation)
             return True
             
         except Exception as e:
             print(f"❌ Error saving lead: {e}")
             return False
     
-    def get_leads(self, limit: int = 50) -> List[Dict]:
-        """Retrieve leads from MongoDB"""
-        if not self.leads:
-            return []
+    def _upsert_lead(self, lead_data: Dict, operation: Tuple[Dict, Dict]):
+        """One upsert plus its rollup. Two concurrent upserts of a new lead can both try to insert;
+        the loser hits the unique email_key index and is retried once, now matching the winner's document"""
+        try:
+            # The pre-update document (None on insert) drives the analytics rollup deltas
+            before = self.leads.find_one_and_update(
+                *operation, upsert=True, projection={"company": 1}, return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            before = self.leads.find_one_and_update(
+                *operation, upsert=True, projection={"company": 1}, return_document=ReturnDocument.BEFORE
+            )
+        
+        inc, names = {}, {}
+        self._lead_rollup(before, lead_data.get("company"), inc, names)
+        self._apply_rollup(inc, names)
+    
+    def save_leads(self, leads: List[Dict]) -> int:
+        """Upsert many leads with one bulk_write; returns the number of leads written"""
+        if self.leads is None:
+            return 0
+        
+        pending = [(lead_data, operation) for lead_data, operation in zip(leads, map(self._lead_upsert, leads)) if operation]
+        if not pending:
+            return 0
+        
+        try:
+            # One read of the existing leads lets the whole batch update the rollups
+            known = {}
+            query = {"$or": [
+                {"email_key": {"$in": [op[1]["$set"]["email_key"] for _, op in pending if "email_key" in op[1]["$set"]]}},
+                {"phone_key": {"$in": [op[1]["$set"]["phone_key"] for _, op in pending if "phone_key" in op[1]["$set"]]}}
+            ]}
+            for lead in self.leads.find(query, {"email": 1, "email_key": 1, "phone_key": 1, "company": 1}):
+                for field in ("email_key", "phone_key"):
+                    if lead.get(field):
+                        known[(field, lead[field])] = lead
+            
+            retry = set()
+            try:
+                self.leads.bulk_write([UpdateOne(*operation, upsert=True) for _, operation in pending], ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in errors):
+                    raise
+                # Lost an insert race to another writer; redone one by one below
+                retry = {error["index"] for error in errors}
+            
+            inc, names = {}, {}
+            for index, (lead_data, (_, update)) in enumerate(pending):
+                if index in retry:
+                    continue
+                # Mirrors the upsert's query (see _lead_upsert)
+                email_key, phone_key = update["$set"].get("email_key"), update["$set"].get("phone_key")
+                before = known.get(("email_key", email_key)) if email_key else None
+                if before is None and phone_key:
+                    before = known.get(("phone_key", phone_key))
+                    if email_key and before is not None and (before.get("email_key") or before.get("email")):
+                        before = None
+                self._lead_rollup(before, lead_data.get("company"), inc, names)
+                # Later leads in the same batch with these keys update the lead just written
+                written = {
+                    "email": email_key or (before or {}).get("email"),
+                    "email_key": email_key or (before or {}).get("email_key"),
+                    "company": lead_data.get("company") or (before or {}).get("company")
+                }
+                for identity in (("email_key", email_key), ("phone_key", phone_key)):
+                    if identity[1]:
+                        known[identity] = written
+            self._apply_rollup(inc, names)
+            
+            for index in sorted(retry):
+                self._upsert_lead(*pending[index])
+            
+            return len(pending)
+            
+        except Exception as e:
+            print(f"❌ Error saving leads: {e}")
+            return 0
+    
+    def migrate_leads(self) -> Dict[str, int]:
+        """Backfill normalized email_key/phone_key on leads stored before keyed upserts.
+        
+        Legacy leads whose emails normalize to the same key (``Ana@x`` and ``ana@x``, or a legacy lead
+        and one already written by keyed upserts) cannot share the unique email_key index. They are
+        merged into the keyed or oldest lead: missing fields are filled in from the others, conversation
+        counts are added up and the others are deleted. Safe to re-run.
+        """
+        result = {"backfilled": 0, "merged": 0}
+        if self.leads is None:
+            return result
+        
+        operations = []
+        by_email: Dict[str, List[Dict]] = {}
+        for lead in self.leads.find({"email_key": {"$exists": False}, "phone_key": {"$exists": False}}):
+            email_key = normalize_email(lead.get("email"))
+            phone_key = normalize_phone(lead.get("phone"))
+            if email_key:
+                by_email.setdefault(email_key, []).append(lead)
+            elif phone_key:
+                operations.append(UpdateOne({"_id": lead["_id"]}, {"$set": {"phone_key": phone_key}}))
+        
+        for email_key, group in by_email.items():
+            keyed = self.leads.find_one({"email_key": email_key})
+            survivor, *duplicates = ([keyed] if keyed else []) + sorted(group, key=_lead_age)
+            fields = {"email_key": email_key}
+            for duplicate in duplicates:
+                for key, value in duplicate.items():
+                    if key == "_id" or value in (None, ""):
+                        continue
+                    if key == "conversation_count":
+                        fields[key] = fields.get(key, survivor.get(key, 1)) + value
+                    elif key == "created_at" and survivor.get(key) and value < survivor[key]:
+                        fields[key] = value
+                    elif survivor.get(key) in (None, "") and key not in fields:
+                        fields[key] = value
+            phone_key = normalize_phone(survivor.get("phone") or fields.get("phone"))
+            if phone_key and not survivor.get("phone_key"):
+                fields["phone_key"] = phone_key
+            operations.append(UpdateOne({"_id": survivor["_id"]}, {"$set": fields}))
+            
+            if duplicates:
+                # Deleted before the survivor gets its key, so the unique index never sees two
+                self.leads.delete_many({"_id": {"$in": [duplicate["_id"] for duplicate in duplicates]}})
+                result["merged"] += len(duplicates)
+                print(f"⚠️  Merged {len(duplicates)} duplicate lead(s) into {email_key}")
+        
+        if operations:
+            self.leads.bulk_write(operations, ordered=False)
+        result["backfilled"] = len(operations)
         
+        if result["merged"] and self.analytics is not None:
+            # Merging removed leads; the rollup is rebuilt from the merged collection on next read
+            self.analytics.delete_one({"_id": "global"})
+        return result
+    
+    def get_leads(self, limit: int = 50) -> List[Dict]:
+        """Retrieve the newest leads from MongoDB"""
         try:
-            leads = list(self.leads.find().sort("created_at", -1).limit(limit))
-            return leads
+            return list(self.find_leads(page_size=limit))[:limit]
             
         except Exception as e:
             print(f"❌ Error retrieving leads: {e}")
             return []
     
+    def find_leads(self, page_size: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                   company: Optional[str] = None, fields: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+        """Keyset-paginated leads, newest first.
+        
+        Lazily yields up to ``page_size + 1`` documents; the extra one only signals that
+        another page exists. ``cursor`` comes from encode_lead_cursor on the last lead of
+        the previous page. ``fields`` limits the projection to known lead fields.
+        """
+        if self.leads is None:
+            return iter(())
+        
+        page_size = max(1, min(page_size, LEADS_MAX_PAGE_SIZE))
+        query = {}
+        if status:
+            query["status"] = status
+        if company:
+            query["company"] = company
+        if cursor:
+            created_at, last_id = decode_lead_cursor(cursor)
+            if created_at is None:
+                # Missing created_at sorts lowest, so only undated leads can follow an undated one
+                query["created_at"] = None
+                query["_id"] = {"$lt": last_id}
+            else:
+                query["$or"] = [
+                    {"created_at": {"$lt": created_at}},
+                    {"created_at": created_at, "_id": {"$lt": last_id}},
+                    {"created_at": None}
+                ]
+        
+        projection = None
+        if fields:
+            # _id and created_at are needed to build the next cursor
+            projection = {field: 1 for field in LEAD_FIELDS.intersection(fields)}
+            projection["created_at"] = 1
+        
+        return self.leads.find(query, projection).sort(
+            [("created_at", DESCENDING), ("_id", DESCENDING)]
+        ).limit(page_size + 1)
+    
     def update_lead_status(self, email: str, status: str) -> bool:
         """Update lead status"""
-        if not self.leads:
+        if self.leads is None:
+            return False
+        
+        email_key = normalize_email(email)
+        if not email_key:
             return False
         
         try:
-            result = self.leads.update_one(
-                {"email": email},
+            # Leads stored before keyed upserts (not yet migrated) only have the raw email
+            before = self.leads.find_one_and_update(
+                {"$or": [{"email_key": email_key}, {"email": email.strip()}]},
                 {
                     "$set": {
                         "status": status,
                         "updated_at": datetime.utcnow()
                     }
-                }
+                },
+                projection={"status": 1},
+                return_document=ReturnDocument.BEFORE
             )
-            return result.modified_count > 0
+            if before is None or before.get("status") == status:
+                return False
+            
+            self._apply_rollup({
+                f"status.{rollup_key(before.get('status'))}": -1,
+                f"status.{rollup_key(status)}": 1
+            }, {})
+            return True
             
         except Exception as e:
             print(f"❌ Error updating lead status: {e}")
             return False
     
+    def _lead_rollup(self, before: Optional[Dict], company: Optional[str], inc: Dict[str, int], names: Dict):
+        """Accumulate rollup deltas for one lead write (``before`` is None when it was inserted)"""
+        def add(field: str, amount: int):
+            inc[field] = inc.get(field, 0) + amount
+        
+        company_key = rollup_key(company)
+        if before is None:
+            add("total_leads", 1)
+            add("status.new", 1)
+            add(f"daily.{datetime.utcnow():%Y-%m-%d}.leads", 1)
+            add(f"companies.{company_key}.count", 1)
+            names[f"companies.{company_key}.name"] = company or None
+        elif company and company_key != rollup_key(before.get("company")):
+            add(f"companies.{rollup_key(before.get('company'))}.count", -1)
+            add(f"companies.{company_key}.count", 1)
+            names[f"companies.{company_key}.name"] = company
+    
+    def _record_new_conversations(self, count: int):
+        if count:
+            self._apply_rollup({
+                "total_conversations": count,
+                f"daily.{datetime.utcnow():%Y-%m-%d}.conversations": count
+            }, {})
+    
+    def _apply_rollup(self, inc: Dict[str, int], names: Dict):
+        inc = {field: amount for field, amount in inc.items() if amount}
+        if self.analytics is None or not inc:
+            return
+        
+        try:
+            # Never upserted: a rollup created from a single write would hide every earlier lead and
+            # conversation. Until get_analytics (or rebuild-analytics) builds it from the collections,
+            # there is nothing to increment
+            self.analytics.update_one(
+                {"_id": "global"},
+                {"$inc": inc, "$set": {**names, "updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print(f"❌ Error updating analytics rollup: {e}")
+    
+    def _compute_rollup(self) -> Dict:
+        """Recompute the analytics rollup document from the leads and conversations collections"""
+        rollup = {
+            "_id": "global",
+            "total_leads": self.leads.count_documents({}),
+            "total_conversations": self.conversations.count_documents({}),
+            "status": {},
+            "companies": {},
+            "daily": {},
+            "updated_at": datetime.utcnow()
+        }
+        
+        for group in self.leads.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            key = rollup_key(group["_id"])
+            rollup["status"][key] = rollup["status"].get(key, 0) + group["count"]
+        
+        for group in self.leads.aggregate([{"$group": {"_id": "$company", "count": {"$sum": 1}}}]):
+            entry = rollup["companies"].setdefault(rollup_key(group["_id"]), {"name": group["_id"] or None, "count": 0})
+            entry["count"] += group["count"]
+        
+        for collection, field in ((self.leads, "leads"), (self.conversations, "conversations")):
+            for group in collection.aggregate([
+                {"$match": {"created_at": {"$type": "date"}}},
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "count": {"$sum": 1}}}
+            ]):
+                rollup["daily"].setdefault(group["_id"], {})[field] = group["count"]
+        
+        return rollup
+    
+    def rebuild_analytics(self) -> Dict:
+        """Recompute the analytics rollup from scratch and store it"""
+        rollup = self._compute_rollup()
+        self.analytics.replace_one({"_id": "global"}, rollup, upsert=True)
+        return rollup
+    
+    def check_analytics(self) -> List[str]:
+        """Compare the stored rollup with a fresh recomputation; returns the mismatches"""
+        expected = _flatten_counts(self._compute_rollup())
+        actual = _flatten_counts(self.analytics.find_one({"_id": "global"}) or {})
+        return [
+            f"{field}: stored {actual.get(field, 0)}, expected {expected.get(field, 0)}"
+            for field in sorted(set(expected) | set(actual))
+            if actual.get(field, 0) != expected.get(field, 0)
+        ]
+    
     def get_analytics(self) -> Dict:
-        """Get basic analytics from the database"""
-        if not self.leads or not self.conversations:
+        """Get analytics from the precomputed rollup (a single read by _id)"""
+        if self.analytics is None:
             return {}
         
         try:
-            total_leads = self.leads.count_documents({})
-            new_leads = self.leads.count_documents({"status": "new"})
-            total_conversations = self.conversations.count_documents({})
+            rollup = self.analytics.find_one({"_id": "global"})
+            if rollup is None:
+                # First use against existing data: build the rollup once; writes only increment it after that
+                rollup = self.rebuild_analytics()
             
-            # Get leads by company
-            company_stats = list(self.leads.aggregate([
-                {"$group": {"_id": "$company", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}},
-                {"$limit": 10}
-            ]))
+            status = rollup.get("status", {})
+            companies = sorted(
+                (entry for entry in rollup.get("companies", {}).values() if entry.get("count", 0) > 0),
+                key=lambda entry: entry["count"],
+                reverse=True
+            )[:10]
+            daily = rollup.get("daily", {})
             
             return {
-                "total_leads": total_leads,
-                "new_leads": new_leads,
-                "total_conversations": total_conversations,
-                "top_companies": company_stats
+                "total_leads": rollup.get("total_leads", 0),
+                "new_leads": status.get("new", 0),
+                "total_conversations": rollup.get("total_conversations", 0),
+                "top_companies": [{"_id": entry.get("name"), "count": entry["count"]} for entry in companies],
+                "status_counts": {key: count for key, count in status.items() if count},
+                "daily": {day: daily[day] for day in sorted(daily)[-30:]}
             }
             
         except Exception as e:
             print(f"❌ Error getting analytics: {e}")
             return {}
 
+
+def _lead_age(lead: Dict) -> datetime:
+    """Sort key putting the oldest lead first; the ObjectId stands in for a missing created_at"""
+    return lead.get("created_at") or lead["_id"].generation_time.replace(tzinfo=None)
+
+
+def _flatten_counts(rollup: Dict) -> Dict[str, int]:
+    counts = {
+        "total_leads": rollup.get("total_leads", 0),
+        "total_conversations": rollup.get("total_conversations", 0)
+    }
+    for key, count in rollup.get("status", {}).items():
+        counts[f"status.{key}"] = count
+    for key, entry in rollup.get("companies", {}).items():
+        counts[f"companies.{key}"] = entry.get("count", 0)
+    for day, buckets in rollup.get("daily", {}).items():
+        for field, count in buckets.items():
+            counts[f"daily.{day}.{field}"] = count
+    return counts
+
 # Global database instance
 db_manager = DatabaseManager()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="MATIC Studio database maintenance")
+    parser.add_argument("command", choices=[
+        "create-indexes", "migrate-conversations", "migrate-leads", "rebuild-analytics", "check-analytics"
+    ])
+    args = parser.parse_args()
+    
+    if not db_manager.connect():
+        print("❌ Database not available. Check MONGODB_URI.")
+        exit(1)
+    
+    if args.command == "create-indexes":
+        db_manager.create_indexes()
+        print("✅ Indexes created")
+    elif args.command == "migrate-conversations":
+        count = db_manager.migrate_conversations()
+        print(f"✅ Migrated {count} conversations to append-only storage")
+    elif args.command == "migrate-leads":
+        result = db_manager.migrate_leads()
+        print(f"✅ Backfilled dedupe keys on {result['backfilled']} leads, merged {result['merged']} duplicates")
+    elif args.command == "rebuild-analytics":
+        rollup = db_manager.rebuild_analytics()
+        print(f"✅ Rebuilt analytics: {rollup['total_leads']} leads, {rollup['total_conversations']} conversations")
+    elif args.command == "check-analytics":
+        mismatches = db_manager.check_analytics()
+        for mismatch in mismatches:
+            print(f"❌ {mismatch}")
+        if mismatches:
+            exit(1)
+        print("✅ Analytics rollup is consistent")
@@ -6,13 +6,29 @@ Production-ready for Render.com deployment
 """
 
 import os
+import itertools
+import json
+import queue
+import threading
+import time
 import uuid
 from datetime import datetime
+from typing import TYPE_CHECKING, Iterator, Optional
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, Response, request, jsonify, send_from_directory, session
 from flask_cors import CORS
-from src.agents.scheduling_agent import SchedulingAgent
-from database import db_manager
+from src.core.prompt_cache import prompt_cache_stats, track_prompt_usage
+from src.core.calendly import calendly_client
+from src.core.intent_router import intent_router
+from src.core.tool_cache import cache_stats
+from src.core.tools import calendly_link_pool, calendly_link_pool_stats
+from src.core.tool_executor import tool_stats
+from src.core.session_store import SessionStore
+from database import LEADS_MAX_PAGE_SIZE, db_manager, encode_lead_cursor
+from lead_extraction import LeadExtractor
+
+if TYPE_CHECKING:
+    from src.agents.scheduling_agent import SchedulingAgent
 
 # Load environment variables
 load_dotenv()
@@ -29,11 +45,53 @@ CORS(app, origins=[
     "http://localhost:5000"
 ])
 
-# Initialize the scheduling agent
+# The scheduling agent is built on first use (or by the warm-up below), not at import
 default_model = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
 # Use temperature=1 for models that don't support custom temperature
 temperature = 1.0 if default_model == "gpt-5" else 0.7
-scheduling_agent = SchedulingAgent(model=default_model, temperature=temperature)
+_scheduling_agent: Optional["SchedulingAgent"] = None
+_scheduling_agent_lock = threading.Lock()
+
+def get_scheduling_agent() -> "SchedulingAgent":
+    """The process-wide scheduling agent, created on first call"""
+    global _scheduling_agent
+    if _scheduling_agent is None:
+        with _scheduling_agent_lock:
+            if _scheduling_agent is None:
+                # Imported here: the agent pulls in the OpenAI SDK, the bulk of import time
+                from src.agents.scheduling_agent import SchedulingAgent
+                _scheduling_agent = SchedulingAgent(model=default_model, temperature=temperature)
+    return _scheduling_agent
+
+def context_stats() -> dict:
+    """The agent's context window stats; empty until the agent has been built"""
+    return _scheduling_agent.context_window.stats() if _scheduling_agent else {}
+
+def warm_up():
+    """Build the agent and connect to MongoDB ahead of the first request, and fill the Calendly link
+    pool when CALENDLY_LINK_POOL_WARMUP is set (every worker would otherwise create links on boot)"""
+    start = time.perf_counter()
+    try:
+        get_scheduling_agent()
+        db_manager.connect()
+        if os.getenv("CALENDLY_LINK_POOL_WARMUP", "false").lower() == "true":
+            calendly_link_pool()
+        print(f"🔥 Warm-up finished in {(time.perf_counter() - start) * 1000:.0f}ms")
+    except Exception as e:
+        print(f"⚠️  Warm-up failed, initializing on first request instead: {e}")
+
+# The worker starts accepting requests immediately; warm-up runs alongside unless APP_WARMUP=false
+if os.getenv("APP_WARMUP", "true").lower() != "false":
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+# Per-session conversation history (bounded by LRU, idle TTL and per-session turn caps)
+session_store = SessionStore.from_env()
+
+# Contact details seen so far in each session
+lead_extractor = LeadExtractor()
+
+# Seconds between SSE heartbeat events while waiting on the model
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
 
 @app.route('/')
 def serve_chat():
@@ -56,35 +114,19 @@ def chat_api():
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        # Process the message using the scheduling agent
-        response = scheduling_agent.process(user_message)
-        
-        # Update conversation history
-        updated_history = conversation_history + [
-            {"role": "user", "content": user_message},
-            {"role": "assistant", "content": response}
-        ]
-        
-        # Save conversation to database
-        metadata = {
-            "user_agent": request.headers.get('User-Agent'),
-            "ip_address": request.remote_addr,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        db_manager.save_conversation(session_id, updated_history, metadata)
+        # Process the message using the scheduling agent with this session's history only
+        session_history = session_store.get_history(session_id)
+        usage = track_prompt_usage()
+        response = get_scheduling_agent().process(user_message, conversation_history=session_history)
+        session_store.save_history(session_id, session_history)
         
-        # Check if this is a lead generation message (contains contact info)
-        if any(keyword in user_message.lower() for keyword in ['email', 'phone', 'company', 'name']):
-            # Extract potential lead information
-            lead_data = extract_lead_info(user_message, updated_history)
-            if lead_data:
-                db_manager.save_lead(lead_data)
+        persist_turn(session_id, user_message, response, conversation_history, request_metadata())
         
         return jsonify({
             'response': response,
             'status': 'success',
-            'session_id': session_id
+            'session_id': session_id,
+            'usage': usage
         })
         
     except Exception as e:
@@ -94,54 +136,124 @@ def chat_api():
             'status': 'error'
         }), 500
 
-def extract_lead_info(message: str, conversation_history: list) -> dict:
-    """Extract lead information from conversation"""
-    lead_data = {}
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_api():
+    """Server-Sent Events variant of /api/chat that forwards response chunks as they are generated"""
+    data = request.get_json() or {}
+    user_message = data.get('message', '')
+    conversation_history = data.get('conversation_history', [])
+    session_id = data.get('session_id') or str(uuid.uuid4())
     
-    # Simple extraction logic - can be enhanced with NLP
-    message_lower = message.lower()
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
     
-    # Extract email
-    import re
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, message)
-    if emails:
-        lead_data['email'] = emails[0]
+    # Request data must be captured before the response body starts streaming
+    metadata = request_metadata()
+    session_history = session_store.get_history(session_id)
     
-    # Extract phone
-    phone_pattern = r'[\+]?[1-9][\d]{0,15}'
-    phones = re.findall(phone_pattern, message)
-    if phones and len(phones[0]) >= 10:
-        lead_data['phone'] = phones[0]
+    chunks = queue.Queue()
+    cancelled = threading.Event()
     
-    # Extract company name (simple heuristic)
-    company_keywords = ['company', 'corp', 'inc', 'ltd', 'llc', 'enterprises']
-    words = message.split()
-    for i, word in enumerate(words):
-        if any(keyword in word.lower() for keyword in company_keywords):
-            if i > 0:
-                lead_data['company'] = words[i-1] + ' ' + word
-            break
+    def produce():
+        stream = get_scheduling_agent().process_stream(user_message, conversation_history=session_history)
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    return
+                chunks.put(("chunk", chunk))
+            chunks.put(("done", None))
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            chunks.put(("error", str(e)))
+        finally:
+            # Closing the agent generator also closes the upstream OpenAI stream
+            stream.close()
     
-    # Extract name (simple heuristic)
-    name_keywords = ['name', 'i am', 'my name is', 'call me']
-    for keyword in name_keywords:
-        if keyword in message_lower:
-            start_idx = message_lower.find(keyword) + len(keyword)
-            name_part = message[start_idx:].strip().split()[0:2]
-            if name_part:
-                lead_data['name'] = ' '.join(name_part)
-            break
+    def generate():
+        parts = []
+        completed = False
+        try:
+            yield sse_event("session", {"session_id": session_id})
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield sse_event("heartbeat", {})
+                    continue
+                
+                if kind == "chunk":
+                    parts.append(value)
+                    yield sse_event("token", {"content": value})
+                elif kind == "error":
+                    yield sse_event("error", {"error": value, "status": "error"})
+                    return
+                else:
+                    completed = True
+                    break
+            
+            response = "".join(parts)
+            session_store.save_history(session_id, session_history)
+            persist_turn(session_id, user_message, response, conversation_history, metadata)
+            yield sse_event("done", {"status": "success", "session_id": session_id})
+        finally:
+            # The WSGI server closes this generator when the client disconnects
+            if not completed:
+                cancelled.set()
+    
+    threading.Thread(target=produce, daemon=True).start()
     
-    return lead_data if lead_data else None
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def request_metadata() -> dict:
+    """Collect request metadata stored alongside the conversation"""
+    return {
+        "user_agent": request.headers.get('User-Agent'),
+        "ip_address": request.remote_addr,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def persist_turn(session_id: str, user_message: str, response: str, conversation_history: list, metadata: dict):
+    """Save the completed turn to the database and record any lead information"""
+    new_messages = [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": response}
+    ]
+    
+    # Only the new turn is appended; writes go through the write-behind queue so
+    # MongoDB latency stays off the response path
+    db_manager.queue_messages(session_id, new_messages, metadata)
+    
+    # Lead fields accumulate per session, so only the new turn is scanned
+    lead_data = lead_extractor.update(session_id, new_messages, history=conversation_history)
+    if lead_data and (lead_data.get('email') or lead_data.get('phone')):
+        db_manager.queue_lead(lead_data)
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
+    # Reports without initializing anything, so health checks stay fast during a cold start
+    from src.core.openai_clients import openai_client_stats
     return jsonify({
         'status': 'healthy',
         'service': 'MATIC Studio Chat Agent',
-        'database': 'connected' if db_manager.client else 'disconnected'
+        'database': db_manager.state(),
+        'database_writes': db_manager.writer_stats(),
+        'sessions': session_store.stats(),
+        'openai': openai_client_stats(),
+        'prompt_cache': prompt_cache_stats.stats(),
+        'context': context_stats(),
+        'intents': intent_router.stats(),
+        'tools': tool_stats.stats(),
+        'tool_cache': cache_stats(),
+        'calendly': calendly_client.stats(),
+        'calendly_link_pool': calendly_link_pool_stats()
     })
 
 @app.route('/api/admin/leads', methods=['GET'])
@@ -153,20 +265,45 @@ def get_leads():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        limit = int(request.args.get('limit', 50))
-        leads = db_manager.get_leads(limit)
-        
-        # Remove sensitive fields for security
-        for lead in leads:
-            lead.pop('_id', None)
-        
-        return jsonify({
-            'leads': leads,
-            'count': len(leads)
-        })
-        
+        # 'limit' is accepted as an alias for page_size
+        page_size = int(request.args.get('page_size', request.args.get('limit', 50)))
+        page_size = max(1, min(page_size, LEADS_MAX_PAGE_SIZE))
+        fields = [field for field in request.args.get('fields', '').split(',') if field]
+        leads = iter(db_manager.find_leads(
+            page_size=page_size,
+            cursor=request.args.get('cursor'),
+            status=request.args.get('status'),
+            company=request.args.get('company'),
+            fields=fields
+        ))
+        # The query runs on the first fetch; do it here so a database error is still a 500, not a broken stream
+        first = next(leads, None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    if first is not None:
+        leads = itertools.chain([first], leads)
+    return Response(leads_page_json(leads, page_size, fields, app.json.dumps), mimetype='application/json')
+
+def leads_page_json(leads, page_size: int, fields: list, dumps) -> Iterator[str]:
+    """Serialize a find_leads() page one lead at a time so memory stays flat regardless of page size"""
+    yield '{"leads": ['
+    count = 0
+    last_lead = None
+    next_cursor = None
+    for lead in leads:
+        if count == page_size:
+            # find_leads fetches one extra lead to signal that another page exists
+            next_cursor = encode_lead_cursor(last_lead)
+            break
+        last_lead = lead
+        # Remove sensitive fields for security
+        visible = {key: value for key, value in lead.items() if key != '_id' and (not fields or key in fields)}
+        yield (', ' if count else '') + dumps(visible)
+        count += 1
+    yield f'], "count": {count}, "next_cursor": {dumps(next_cursor)}}}'
 
 @app.route('/api/admin/analytics', methods=['GET'])
 def get_analytics():
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Lead extraction for MATIC Studio Chat Agent
+Pulls contact details (email, phone, company, name) out of visitor messages
+incrementally, accumulating fields across a session's turns
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.core.prompts import MATIC_STUDIO_INFO
+
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+
+# Runs of digits with common separators, e.g. +63 917 123 4567, (555) 123-4567
+PHONE_PATTERN = re.compile(r"(?<![\w@.])(?:\+|00)?\(?\d[\d\s().-]{5,}\d(?![\w@])")
+
+HAS_DIGIT = re.compile(r"\d")
+
+# 2025-03-14, 14/03/2025, 10 11 2025: digit runs that look like phones but are dates
+DATE_LIKE = re.compile(
+    r"^(?:\d{1,2}[-/.\s]\d{1,2}[-/.\s](?:\d{4}|\d{2})|\d{4}[-/.\s]\d{1,2}[-/.\s]\d{1,2})$"
+)
+
+# 100000 - 200000: a hyphen with a space beside it separates a range, not phone digit groups
+RANGE_LIKE = re.compile(r"\d\s+-|-\s+\d")
+
+# "Acme Corp", "Blue Ocean Holdings Inc."
+COMPANY_SUFFIX_PATTERN = re.compile(
+    r"\b((?:[A-Z][\w&'-]*\s+){0,3}[A-Z][\w&'-]*\s+"
+    r"(?i:inc|corp|corporation|ltd|llc|co|company|enterprises|group|holdings|gmbh|plc|solutions|technologies)\b\.?)"
+)
+
+COMPANY_SUFFIXES = frozenset((
+    "inc", "corp", "corporation", "ltd", "llc", "co", "company", "enterprises", "group", "holdings",
+    "gmbh", "plc", "solutions", "technologies"
+))
+
+# "I work at Acme", "our company is Blue Ocean", "company: Acme". A bare "from X" is usually a
+# place ("I am from Manila"); companies introduced that way are only taken with a suffix
+COMPANY_PHRASE_PATTERN = re.compile(
+    r"(?i:\b(?:i work (?:at|for)|we are|we're|company(?: name)? is|company:|our company,?))\s+"
+    r"((?:[A-Z][\w&'-]*)(?:\s+[A-Z][\w&'-]*){0,3})"
+)
+
+# Explicit introductions are trusted even when lower-cased
+NAME_EXPLICIT_PATTERN = re.compile(
+    r"(?i:\b(?:my name is|my name's|name is|name:|call me))\s+([A-Za-z][A-Za-z'-]+(?:\s+[A-Za-z][A-Za-z'-]+)?)"
+)
+
+# Casual introductions must be capitalized ("I'm Maria Santos", not "I'm interested")
+NAME_CASUAL_PATTERN = re.compile(
+    r"(?i:\b(?:i am|i'm|this is))\s+([A-Z][a-z'-]+(?:\s+[A-Z][a-z'-]+)?)"
+)
+
+# Capitalized words that follow "I'm"/"from"/"at" without being names or companies
+NOT_A_NAME = {
+    "Interested", "Looking", "Planning", "Trying", "Here", "Not", "The", "Just", "Curious", "Ready",
+    "Available", "Free", "Busy", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday",
+    "Sunday", "Today", "Tomorrow", "Next", "This", "Also", "Currently", "Based", "Working", "Sure",
+    "Happy", "Glad", "Thinking", "Wondering", "Hoping", "New", "A", "An", "In", "On"
+}
+
+# Words that start a suffix match without naming a company ("The company is growing")
+COMPANY_DETERMINERS = {"The", "Our", "My", "Your", "Their", "This", "That", "A", "An", "Any", "Which"}
+
+# Lower-cased words that follow "call me"/"name is" without being a name ("call me at 555-...")
+NAME_STOPWORDS = frozenset((
+    "at", "on", "in", "by", "via", "back", "later", "soon", "now", "anytime", "today", "tomorrow", "tonight",
+    "asap", "after", "before", "around", "when", "if", "please", "and", "or", "to", "for", "the", "a", "an",
+    "maybe", "sometime", "next", "this", "instead", "again"
+))
+
+# Lower-cased phrases that must appear before the phrase patterns are worth running
+COMPANY_PHRASES = ("i work", "we are", "we're", "company")
+NAME_PHRASES = ("name", "call me", "i am", "i'm", "this is")
+
+STUDIO_EMAILS = {MATIC_STUDIO_INFO["email"].lower(), MATIC_STUDIO_INFO["lead_architect_email"].lower()}
+
+
+def extract_fields(text: str) -> Dict[str, str]:
+    """Extract contact fields from a single message"""
+    fields = {}
+
+    if "@" in text:
+        for email in EMAIL_PATTERN.findall(text):
+            if email.lower() not in STUDIO_EMAILS:
+                fields["email"] = email
+                break
+
+    if HAS_DIGIT.search(text):
+        for match in PHONE_PATTERN.finditer(text):
+            candidate = match.group().strip()
+            digits = sum(ch.isdigit() for ch in candidate)
+            # E.164 numbers carry 7-15 digits; shorter runs are times, budgets, etc.
+            if 7 <= digits <= 15 and not DATE_LIKE.match(candidate) and not RANGE_LIKE.search(candidate):
+                fields["phone"] = candidate
+                break
+
+    lowered = text.lower()
+    # Only run the suffix pattern when a suffix word is present at all
+    words = lowered.replace(".", " ").replace(",", " ").split()
+    if not COMPANY_SUFFIXES.isdisjoint(words):
+        for match in COMPANY_SUFFIX_PATTERN.finditer(text):
+            words = match.group(1).split()
+            while words and words[0] in COMPANY_DETERMINERS:
+                words.pop(0)
+            # A suffix alone ("company", "group") is not a company name
+            if len(words) > 1:
+                fields["company"] = " ".join(words)
+                break
+    if "company" not in fields and any(phrase in lowered for phrase in COMPANY_PHRASES):
+        for match in COMPANY_PHRASE_PATTERN.finditer(text):
+            words = match.group(1).split()
+            while words and words[-1] in NOT_A_NAME:
+                words.pop()
+            if words and words[0] not in NOT_A_NAME:
+                fields["company"] = " ".join(words)
+                break
+
+    if not any(phrase in lowered for phrase in NAME_PHRASES):
+        return fields
+
+    for match in NAME_EXPLICIT_PATTERN.finditer(text):
+        words = match.group(1).split()
+        while words and words[-1].lower() in NAME_STOPWORDS:
+            words.pop()
+        if words and words[0].lower() not in NAME_STOPWORDS:
+            fields["name"] = " ".join(words).title()
+            break
+    if "name" not in fields:
+        for match in NAME_CASUAL_PATTERN.finditer(text):
+            words = [word for word in match.group(1).split() if word not in NOT_A_NAME]
+            if words and words[0] == match.group(1).split()[0]:
+                fields["name"] = " ".join(words)
+                break
+
+    return fields
+
+
+class LeadExtractor:
+    """Incremental per-session lead extraction.
+
+    Each session's fields accumulate across turns, so contact details given in
+    earlier messages are kept. Only messages passed to ``update`` are scanned;
+    the full history is read once, the first time a session is seen. Sessions
+    are kept in a bounded LRU.
+    """
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, session_id: str, new_messages: List[Dict[str, str]],
+               history: Optional[List[Dict[str, str]]] = None) -> Optional[Dict[str, str]]:
+        """Scan new messages; returns the session's accumulated lead fields when they changed"""
+        with self._lock:
+            known = self._sessions.get(session_id)
+            if known is not None:
+                self._sessions.move_to_end(session_id)
+
+        messages = new_messages if known is not None else (history or []) + new_messages
+        found = {}
+        for message in messages:
+            # Assistant turns quote the studio's own contact details, so only visitors are scanned
+            if message.get("role") == "user" and message.get("content"):
+                found.update(extract_fields(message["content"]))
+
+        with self._lock:
+            fields = self._sessions.setdefault(session_id, {})
+            self._sessions.move_to_end(session_id)
+            changed = {key: value for key, value in found.items() if fields.get(key) != value}
+            fields.update(changed)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return dict(fields) if changed else None
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
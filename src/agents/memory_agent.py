@@ -1,41 +1,55 @@
-from typing import Iterator
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
 from src.core.base_agent import BaseAgent
-from src.core.prompts import MATIC_STUDIO_ENHANCED_PROMPT, MATIC_STUDIO_FEW_SHOT_EXAMPLES
+from src.core.prompt_cache import ENHANCED_PREFIX
+from src.core.prompts import MEMORY_SUMMARY_PROMPT
+
+# Upper bound on the length of each rolling summary
+SUMMARY_MAX_TOKENS = 300
 
 
 class MemoryAgent(BaseAgent):
+    """Conversational agent with optional hierarchical memory.
+    
+    With ``summarize=True`` only the last ``keep_turns`` turns are kept raw. Once
+    ``summarize_batch_turns`` more have accumulated, a background worker folds
+    the older turns into a running summary, so the prompt stays roughly the same
+    size however long the session runs. Given a ``store`` (``db_manager``) and a
+    ``session_id``, turns and the summary are persisted and ``resume`` restores
+    them without replaying the whole transcript.
+    """
+    
+    def __init__(self, summarize: bool = False, keep_turns: int = 6, summarize_batch_turns: int = 4,
+                 session_id: Optional[str] = None, store: Any = None, **kwargs):
+        super().__init__(**kwargs)
+        self.summarize = summarize
+        self.keep_turns = keep_turns
+        self.summarize_batch_turns = summarize_batch_turns
+        self.session_id = session_id
+        self.store = store
+        self.summary = ""
+        self.summarized_messages = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary") if summarize else None
+        self._pending_summary: Optional[Future] = None
+    
     def process(self, user_input: str) -> str:
-        # Build messages with full conversation history
-        messages = [{"role": "system", "content": MATIC_STUDIO_ENHANCED_PROMPT}]
-        
-        # Add few-shot examples first (before conversation history)
-        for example in MATIC_STUDIO_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
-        
-        messages.extend(self.conversation_history)
-        messages.append({"role": "user", "content": user_input})
+        # Few-shot examples stay in the shared prefix, before summary and recent history
+        with self._lock:
+            messages = self._build_context(ENHANCED_PREFIX, self.conversation_history, user_input)
         
         # Get response
         response = self._call_llm(messages)
         
         # Update conversation history
-        self.conversation_history.append({"role": "user", "content": user_input})
-        self.conversation_history.append({"role": "assistant", "content": response})
-        
+        self._remember(user_input, response)
         return response
     
     def process_stream(self, user_input: str) -> Iterator[str]:
-        # Build messages with full conversation history
-        messages = [{"role": "system", "content": MATIC_STUDIO_ENHANCED_PROMPT}]
-        
-        # Add few-shot examples first (before conversation history)
-        for example in MATIC_STUDIO_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
-        
-        messages.extend(self.conversation_history)
-        messages.append({"role": "user", "content": user_input})
+        with self._lock:
+            messages = self._build_context(ENHANCED_PREFIX, self.conversation_history, user_input)
         
         # Stream response and collect it
         full_response = ""
@@ -44,8 +58,90 @@ class MemoryAgent(BaseAgent):
             yield chunk
         
         # Update conversation history with complete response
-        self.conversation_history.append({"role": "user", "content": user_input})
-        self.conversation_history.append({"role": "assistant", "content": full_response})
+        self._remember(user_input, full_response)
+    
+    def _pinned_messages(self) -> List[Dict[str, str]]:
+        pinned = super()._pinned_messages()
+        if self.summary:
+            pinned.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return pinned
+    
+    def _remember(self, user_input: str, response: str):
+        turn = [{"role": "user", "content": user_input}, {"role": "assistant", "content": response}]
+        with self._lock:
+            self.conversation_history.extend(turn)
+            backlog = len(self.conversation_history) - self.keep_turns * 2
+        
+        if self.store is not None and self.session_id:
+            self.store.queue_messages(self.session_id, turn)
+        
+        # Summarization runs on the worker thread, never on the request path
+        if self.summarize and backlog >= self.summarize_batch_turns * 2:
+            pending = self._pending_summary
+            if pending is None or pending.done():
+                self._pending_summary = self._summarizer.submit(self._summarize_oldest)
+    
+    def _summarize_oldest(self):
+        with self._lock:
+            fold = self.conversation_history[:len(self.conversation_history) - self.keep_turns * 2]
+            summary = self.summary
+            generation = self._generation
+        if not fold:
+            return
+        
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in fold)
+        messages = [
+            {"role": "system", "content": MEMORY_SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+        ]
+        try:
+            new_summary = (self._call_llm(messages, max_tokens=SUMMARY_MAX_TOKENS) or "").strip()
+        except Exception as e:
+            print(f"❌ Error summarizing conversation: {e}")
+            return
+        
+        with self._lock:
+            if generation != self._generation:
+                return  # memory was cleared while the summary was being written
+            # Only appends happen while the worker runs, so the folded turns are still the oldest
+            del self.conversation_history[:len(fold)]
+            self.summary = new_summary
+            self.summarized_messages += len(fold)
+            summarized_messages = self.summarized_messages
+        
+        if self.store is not None and self.session_id:
+            self.store.save_conversation_summary(self.session_id, new_summary, summarized_messages)
+    
+    def wait_for_summary(self, timeout: Optional[float] = None):
+        """Block until any in-flight summarization has finished"""
+        pending = self._pending_summary
+        if pending is not None:
+            pending.result(timeout)
+    
+    def resume(self, session_id: str) -> bool:
+        """Restore a stored session's summary and unsummarized turns"""
+        self.session_id = session_id
+        if self.store is None:
+            return False
+        
+        memory = self.store.get_conversation_memory(
+            session_id, max_recent=(self.keep_turns + self.summarize_batch_turns) * 2
+        )
+        if memory is None:
+            return False
+        
+        with self._lock:
+            self._generation += 1
+            self.summary = memory["summary"]
+            self.summarized_messages = memory["summarized_messages"]
+            self.conversation_history = [
+                {"role": message["role"], "content": message["content"]} for message in memory["messages"]
+            ]
+        return True
     
     def clear_memory(self):
-        self.conversation_history = []
\ No newline at end of file
+        with self._lock:
+            self._generation += 1
+            self.conversation_history = []
+            self.summary = ""
+            self.summarized_messages = 0
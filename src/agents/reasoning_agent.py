@@ -1,20 +1,15 @@
-import json
 from typing import List, Dict, Any, Optional, Iterator
 from src.agents.tool_agent import ToolAgent
+from src.core.prompt_cache import PromptPrefix
+from src.core.prompts import MATIC_STUDIO_FEW_SHOT_EXAMPLES
+from src.core.streaming import StreamedMessage, tool_call_arguments
+from src.core.tool_executor import ToolExecutor, is_failure
 from src.core.tools import Tool
 
 
-class ReasoningAgent(ToolAgent):
-    def __init__(self, max_iterations: int = 20, **kwargs):
-        super().__init__(**kwargs)
-        self.max_iterations = max_iterations
-        self.enable_memory = True
-        self.show_reasoning = True  # Always show reasoning for agent loop
-    
-    def process(self, user_input: str) -> str:
-        # Initial system prompt with planning capability
-        system_prompt = """You are a helpful travel planning assistant with access to real-time information tools.
-
+# Initial system prompt with planning capability
+REASONING_SYSTEM_PROMPT = """You are a helpful travel planning assistant with access to real-time information tools.
+        
         When helping users plan trips, you should:
         1. Always check the weather forecast for their destination and travel dates first
         2. Search for flight options and provide specific recommendations with prices
@@ -25,20 +20,21 @@ class ReasoningAgent(ToolAgent):
         
         Your goal is to create personalized, weather-aware travel plans with actionable booking information.
         You can call multiple tools to gather all necessary information. Tools may occasionally fail due to service issues - simply retry them or use alternative approaches if needed."""
-        
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add few-shot examples from parent classes
-        from src.core.prompts import TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES
-        for example in TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
-        
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
-        
-        messages.append({"role": "user", "content": user_input})
+
+REASONING_PREFIX = PromptPrefix(REASONING_SYSTEM_PROMPT, MATIC_STUDIO_FEW_SHOT_EXAMPLES)
+
+
+class ReasoningAgent(ToolAgent):
+    prompt_prefix = REASONING_PREFIX
+    
+    def __init__(self, max_iterations: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.max_iterations = max_iterations
+        self.enable_memory = True
+        self.show_reasoning = True  # Always show reasoning for agent loop
+    
+    def process(self, user_input: str) -> str:
+        messages = self._build_messages(user_input)
         
         iterations = 0
         final_response = None
@@ -46,62 +42,41 @@ class ReasoningAgent(ToolAgent):
         
         reasoning_trace.append(f"🤖 **Agent Loop Starting** (max {self.max_iterations} iterations)\n")
         
+        # One executor per turn: its deadline spans every iteration, failed calls are retried once
+        executor = ToolExecutor(self.tool_map, retries=1)
+        
         while iterations < self.max_iterations:
             reasoning_trace.append(f"\n🔄 **Iteration {iterations + 1}**")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-                tool_choice="auto"
-            )
+            # Tools start while the rest of the message is still streaming in
+            streamed = StreamedMessage(on_tool_call=executor.start)
+            for _ in self._stream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto"):
+                pass
             
-            response_message = response.choices[0].message
-            messages.append(response_message)
+            messages.append(streamed.to_message())
             
             # Log the agent's reasoning
-            if response_message.content:
-                reasoning_trace.append(f"💭 **Thinking**: {response_message.content}")
+            if streamed.content:
+                reasoning_trace.append(f"💭 **Thinking**: {streamed.content}")
             
             # If no tool calls, we have our final answer
-            if not response_message.tool_calls:
+            if not streamed.tool_calls:
                 reasoning_trace.append("✨ **Final response ready!**\n\n---\n")
-                final_response = response_message.content
+                final_response = streamed.content
                 break
             
-            # Execute all tool calls with immediate retry on failure
-            reasoning_trace.append(f"🔧 **Executing {len(response_message.tool_calls)} tool(s)**:")
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
+            # All tool calls run concurrently; results are collected in call order
+            reasoning_trace.append(f"🔧 **Executing {len(streamed.tool_calls)} tool(s)**:")
+            for tool_call in streamed.tool_calls:
+                result = executor.result(tool_call)
+                reasoning_trace.extend(self._describe_tool_call(executor, tool_call, result))
                 
-                reasoning_trace.append(f"  • {tool_name}({tool_args})")
-                
-                if tool_name in self.tool_map:
-                    # Try the tool, retry once if it fails
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    
-                    if result.startswith("❌"):
-                        reasoning_trace.append(f"    → ⚠️ Failed: {result}")
-                        reasoning_trace.append(f"    → 🔄 Retrying immediately...")
-                        
-                        # Immediate retry
-                        result = self.tool_map[tool_name].execute(**tool_args)
-                        
-                        if result.startswith("❌"):
-                            reasoning_trace.append(f"    → ❌ Retry failed: {result}")
-                            reasoning_trace.append(f"    → Will continue with partial information")
-                        else:
-                            reasoning_trace.append(f"    → ✅ Retry successful: {result}")
-                    else:
-                        reasoning_trace.append(f"    → ✅ Success: {result}")
-                    
-                    messages.append({
-                        "role": "tool",
-                        "content": result,
-                        "tool_call_id": tool_call.id
-                    })
+                messages.append({
+                    "role": "tool",
+                    "content": result,
+                    "tool_call_id": tool_call["id"]
+                })
+            self.last_tool_timings = executor.timings(streamed)
             
             iterations += 1
         
@@ -116,109 +91,82 @@ class ReasoningAgent(ToolAgent):
             return "\n".join(reasoning_trace) + "\n" + full_response
         return full_response
     
+    def _describe_tool_call(self, executor: ToolExecutor, tool_call: Dict[str, Any], result: str) -> List[str]:
+        """Trace lines for one tool call, including the executor's immediate retry"""
+        tool_name = tool_call["function"]["name"]
+        try:
+            lines = [f"  • {tool_name}({tool_call_arguments(tool_call)})"]
+        except ValueError:
+            lines = [f"  • {tool_name}({tool_call['function']['arguments']})"]
+        if tool_name not in self.tool_map:
+            return lines
+        
+        attempts = executor.attempts(tool_call)
+        if len(attempts) > 1:
+            lines.append(f"    → ⚠️ Failed: {attempts[0]}")
+            lines.append(f"    → 🔄 Retrying immediately...")
+            if is_failure(result):
+                lines.append(f"    → ❌ Retry failed: {result}")
+                lines.append(f"    → Will continue with partial information")
+            else:
+                lines.append(f"    → ✅ Retry successful: {result}")
+        elif is_failure(result):
+            lines.append(f"    → ❌ Failed: {result}")
+            lines.append(f"    → Will continue with partial information")
+        else:
+            lines.append(f"    → ✅ Success: {result}")
+        return lines
+    
     def clear_memory(self):
         self.conversation_history = []
     
     def process_stream(self, user_input: str) -> Iterator[str]:
-        # Initial system prompt with planning capability
-        system_prompt = """You are a helpful travel planning assistant with access to real-time information tools.
-
-        When helping users plan trips, you should:
-        1. Always check the weather forecast for their destination and travel dates first
-        2. Search for flight options and provide specific recommendations with prices
-        3. Look for hotel accommodations that match their preferences
-        4. Consider weather conditions when suggesting activities
-        5. If a tool fails (returns an error message starting with ❌), retry it or try alternative approaches
-        6. Provide comprehensive travel plans with specific flight and hotel recommendations
-        
-        Your goal is to create personalized, weather-aware travel plans with actionable booking information.
-        You can call multiple tools to gather all necessary information. Tools may occasionally fail due to service issues - simply retry them or use alternative approaches if needed."""
-        
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add few-shot examples from parent classes
-        from src.core.prompts import TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES
-        for example in TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
-        
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
-        
-        messages.append({"role": "user", "content": user_input})
+        messages = self._build_messages(user_input)
         
         iterations = 0
         final_response = None
         
         yield f"🤖 **Agent Loop Starting** (max {self.max_iterations} iterations)\n\n"
         
+        executor = ToolExecutor(self.tool_map, retries=1)
+        
         while iterations < self.max_iterations:
             yield f"🔄 **Iteration {iterations + 1}**\n"
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-                tool_choice="auto"
-            )
+            # Tools start while the rest of the message is still streaming in
+            streamed = StreamedMessage(on_tool_call=executor.start)
+            for _ in self._stream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto"):
+                pass
             
-            response_message = response.choices[0].message
-            messages.append(response_message)
+            messages.append(streamed.to_message())
             
             # Stream the agent's reasoning
-            if response_message.content:
-                yield f"💭 **Thinking**: {response_message.content}\n"
+            if streamed.content:
+                yield f"💭 **Thinking**: {streamed.content}\n"
             
             # If no tool calls, we have the final answer
-            if not response_message.tool_calls:
+            if not streamed.tool_calls:
                 yield "\n✨ **Final response ready!**\n\n---\n\n"
                 
-                # The response_message.content IS the final travel plan
-                final_response = response_message.content
-                
-                # Stream the final response word by word to simulate streaming
-                words = final_response.split()
-                for i, word in enumerate(words):
-                    if i > 0:
-                        yield " "
-                    yield word
+                # The streamed content IS the final travel plan
+                final_response = streamed.content
+                yield final_response
                 
                 break
             
-            # Execute all tool calls with immediate retry
-            yield f"\n🔧 **Executing {len(response_message.tool_calls)} tool(s)**:\n"
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                yield f"  • {tool_name}({tool_args})\n"
+            # All tool calls run concurrently; results are collected in call order
+            yield f"\n🔧 **Executing {len(streamed.tool_calls)} tool(s)**:\n"
+            for tool_call in streamed.tool_calls:
+                result = executor.result(tool_call)
+                for line in self._describe_tool_call(executor, tool_call, result):
+                    yield line + "\n"
                 
-                if tool_name in self.tool_map:
-                    # Try the tool, retry once if it fails
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    
-                    if result.startswith("❌"):
-                        yield f"    → ⚠️ Failed: {result}\n"
-                        yield f"    → 🔄 Retrying immediately...\n"
-                        
-                        # Immediate retry
-                        result = self.tool_map[tool_name].execute(**tool_args)
-                        
-                        if result.startswith("❌"):
-                            yield f"    → ❌ Retry failed: {result}\n"
-                            yield f"    → Will continue with partial information\n"
-                        else:
-                            yield f"    → ✅ Retry successful: {result}\n"
-                    else:
-                        yield f"    → ✅ Success: {result}\n"
-                    
-                    messages.append({
-                        "role": "tool",
-                        "content": result,
-                        "tool_call_id": tool_call.id
-                    })
+                messages.append({
+                    "role": "tool",
+                    "content": result,
+                    "tool_call_id": tool_call["id"]
+                })
+            self.last_tool_timings = executor.timings(streamed)
             
             yield "\n"
             iterations += 1
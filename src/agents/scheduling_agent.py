@@ -1,192 +1,77 @@
-import json
-from typing import List, Dict, Any, Iterator
+from typing import List, Dict, AsyncIterator, Iterator, Optional
 from src.core.base_agent import BaseAgent
-from src.core.prompts import MATIC_STUDIO_SCHEDULING_PROMPT
+from src.core.intent_router import IntentRouter, intent_router
+from src.core.prompt_cache import SCHEDULING_PREFIX
 from src.core.tools import Tool, MATIC_STUDIO_TOOLS
 
 
 class SchedulingAgent(BaseAgent):
+    tool_turn_start = "📅 **Scheduling consultation meeting...**"
+    tool_call_line = "🔧 **Using {tool_name}** to schedule meeting"
+    tool_success_line = "✅ **Meeting scheduled successfully**"
+    tool_failure_line = "❌ **Could not schedule the meeting**"
+    tool_turn_finish = "💭 **Finalizing meeting details...**"
+    
     def __init__(self, tools: List[Tool] = None, **kwargs):
         super().__init__(**kwargs)
         self.tools = tools or [tool for tool in MATIC_STUDIO_TOOLS if tool.name == "schedule_consultation_meeting"]
-        self.tool_map = {tool.name: tool for tool in self.tools}
         self.show_reasoning = True
         self.enable_memory = True
+        # Set to None to send every message to the LLM
+        self.intent_router: Optional[IntentRouter] = intent_router
     
-    def process(self, user_input: str) -> str:
-        # Handle "Learn more about MATICStudio" specifically
-        if user_input.lower().strip() in ["learn more about maticstudio", "learn more about matic studio", "tell me about maticstudio", "tell me about matic studio"]:
-            return self._get_matic_studio_overview()
-        
-        reasoning_trace = []
-        messages = [{"role": "system", "content": MATIC_STUDIO_SCHEDULING_PROMPT}]
-        
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
-        
-        messages.append({"role": "user", "content": user_input})
-        
-        # Call LLM with tools
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-            tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-            tool_choice="auto"
-        )
-        
-        response_message = response.choices[0].message
-        
-        # Check if the model wants to use tools
-        if response_message.tool_calls:
-            reasoning_trace.append("📅 **Scheduling consultation meeting...**\n")
-            
-            # Execute tool calls
-            tool_results = []
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                reasoning_trace.append(f"🔧 **Using {tool_name}** to schedule meeting")
-                
-                if tool_name in self.tool_map:
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    tool_results.append({
-                        "tool_call_id": tool_call.id,
-                        "output": result
-                    })
-                    reasoning_trace.append(f"✅ **Meeting scheduled successfully**\n")
-            
-            # Add tool results to messages and get final response
-            messages.append(response_message)
-            for result in tool_results:
-                messages.append({
-                    "role": "tool",
-                    "content": result["output"],
-                    "tool_call_id": result["tool_call_id"]
-                })
-            
-            reasoning_trace.append("💭 **Finalizing meeting details...**\n\n---\n")
-            
-            # Get final response with tool results
-            final_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature
-            )
-            
-            final_content = final_response.choices[0].message.content
-        else:
-            final_content = response_message.content
-        
-        # Update conversation history if memory is enabled
-        if self.enable_memory:
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": final_content})
+    def _build_messages(self, user_input: str, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        # Shared static prefix first so provider prefix caching can hit; only the tail varies
+        return self._build_context(SCHEDULING_PREFIX, history if self.enable_memory else (), user_input)
+    
+    def process(self, user_input: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        # Common questions ("what does MATIC Studio do?", "what is RPA?") are answered without the LLM
+        answer = self._local_answer(user_input, conversation_history)
+        if answer is not None:
+            return answer
         
-        if self.show_reasoning and reasoning_trace:
-            return "\n".join(reasoning_trace) + "\n" + final_content
-        return final_content
+        history = self._history(conversation_history)
+        return "".join(self._tool_turn(self._build_messages(user_input, history), user_input, history))
     
-    def _get_matic_studio_overview(self) -> str:
-        """Return a precise overview of MATIC Studio for the 'Learn more' prompt"""
-        return """**About MATIC Studio**
-
-MATIC Studio is a Filipino-led business process automation studio that makes automation accessible, practical, and impactful for businesses worldwide.
-
-**What We Do:**
-• **Business Process Automation** - Custom solutions that actually work
-• **Microsoft Power Platform** - Low-code apps, workflows, and automations  
-• **M365 & VBA** - Excel and Office automation with macro scripting
-• **RPA Solutions** - End-to-end automation using UiPath and Automation Anywhere
-• **Data Visualization & BI** - Transform data into insights with Power BI and Tableau
-• **AI-Powered Automation** - Intelligent systems that learn and adapt
-
-**Our Approach:**
-1. **Discovery & Diagnostics** - We listen under the hood of your business
-2. **Deep Process Mapping** - We map your operations bolt by bolt  
-3. **Custom-Built Automation** - We engineer solutions that fit your exact needs
-4. **Testing & Fine-Tuning** - We ensure smooth operation
-5. **Deployment & Support** - We launch with full support
-
-**Industries We Serve:**
-Healthcare, Banking, Oil & Gas, Payments, BPOs, and more.
-
-To schedule a call, I'll need:
-• Your full name
-• Company name  
-• Preferred date & time
-• Email address
-
-What's your company name and when would you like to connect?"""
+    def _local_answer(self, user_input: str, conversation_history: Optional[List[Dict[str, str]]]) -> Optional[str]:
+        """A prepared answer when the intent router is confident, recorded in history like any other turn"""
+        if self.intent_router is None:
+            return None
+        history = self._history(conversation_history)
+        answer = self.intent_router.route(user_input, history if self.enable_memory else ())
+        if answer is not None and self.enable_memory:
+            history.append({"role": "user", "content": user_input})
+            history.append({"role": "assistant", "content": answer})
+        return answer
     
-    def process_stream(self, user_input: str) -> Iterator[str]:
-        messages = [{"role": "system", "content": MATIC_STUDIO_SCHEDULING_PROMPT}]
-        
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
+    def process_stream(self, user_input: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        answer = self._local_answer(user_input, conversation_history)
+        if answer is not None:
+            yield answer
+            return
         
-        messages.append({"role": "user", "content": user_input})
-        
-        # For scheduling, we'll use non-streaming to get complete meeting details
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-            tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-            tool_choice="auto"
-        )
-        
-        response_message = response.choices[0].message
-        
-        if response_message.tool_calls:
-            yield "📅 **Scheduling consultation meeting...**\n\n"
-            
-            # Execute tool calls
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                yield f"🔧 **Using {tool_name}** to schedule meeting\n"
-                
-                if tool_name in self.tool_map:
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    yield "✅ **Meeting scheduled successfully**\n\n"
-                    
-                    # Add tool results to messages
-                    messages.append(response_message)
-                    messages.append({
-                        "role": "tool",
-                        "content": result,
-                        "tool_call_id": tool_call.id
-                    })
-            
-            yield "💭 **Finalizing meeting details...**\n\n---\n\n"
-            
-            # Get final response
-            final_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature
-            )
-            
-            final_content = final_response.choices[0].message.content
-        else:
-            final_content = response_message.content
+        history = self._history(conversation_history)
+        yield from self._tool_turn(self._build_messages(user_input, history), user_input, history)
+    
+    async def aprocess(self, user_input: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """Async variant of process() for the ASGI app"""
+        answer = self._local_answer(user_input, conversation_history)
+        if answer is not None:
+            return answer
         
-        # Stream the final content word by word
-        words = final_content.split()
-        for i, word in enumerate(words):
-            if i > 0:
-                yield " "
-            yield word
+        history = self._history(conversation_history)
+        return "".join([chunk async for chunk in self._atool_turn(self._build_messages(user_input, history), user_input, history)])
+    
+    async def aprocess_stream(self, user_input: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """Async variant of process_stream() for the ASGI app"""
+        answer = self._local_answer(user_input, conversation_history)
+        if answer is not None:
+            yield answer
+            return
         
-        # Update conversation history
-        if self.enable_memory:
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": final_content})
+        history = self._history(conversation_history)
+        async for chunk in self._atool_turn(self._build_messages(user_input, history), user_input, history):
+            yield chunk
     
     def clear_memory(self):
-        self.conversation_history = [] 
\ No newline at end of file
+        self.conversation_history = []
\ No newline at end of file
@@ -1,19 +1,13 @@
 from typing import Iterator
 from src.core.base_agent import BaseAgent
-from src.core.prompts import MATIC_STUDIO_BASE_PROMPT
+from src.core.prompt_cache import BASE_PREFIX
 
 
 class SimpleAgent(BaseAgent):
     def process(self, user_input: str) -> str:
-        messages = [
-            {"role": "system", "content": MATIC_STUDIO_BASE_PROMPT},
-            {"role": "user", "content": user_input}
-        ]
+        messages = self._build_context(BASE_PREFIX, (), user_input)
         return self._call_llm(messages)
     
     def process_stream(self, user_input: str) -> Iterator[str]:
-        messages = [
-            {"role": "system", "content": MATIC_STUDIO_BASE_PROMPT},
-            {"role": "user", "content": user_input}
-        ]
+        messages = self._build_context(BASE_PREFIX, (), user_input)
         yield from self._call_llm_stream(messages)
\ No newline at end of file
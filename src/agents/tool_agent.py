@@ -1,85 +1,69 @@
-import json
 from typing import List, Dict, Any, Iterator
 from src.core.base_agent import BaseAgent
-from src.core.prompts import TRAVEL_AGENT_TOOL_SYSTEM_PROMPT, TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES
-from src.core.tools import Tool, TRAVEL_TOOLS
+from src.core.prompt_cache import ENHANCED_PREFIX
+from src.core.streaming import StreamedMessage, tool_call_arguments
+from src.core.tool_executor import ToolExecutor
+from src.core.tools import Tool, MATIC_STUDIO_TOOLS
 
 
 class ToolAgent(BaseAgent):
+    prompt_prefix = ENHANCED_PREFIX
+    
     def __init__(self, tools: List[Tool] = None, **kwargs):
         super().__init__(**kwargs)
-        self.tools = tools or TRAVEL_TOOLS
-        self.tool_map = {tool.name: tool for tool in self.tools}
+        self.tools = tools or MATIC_STUDIO_TOOLS
         self.show_reasoning = True  # Show tool calling process
         self.enable_memory = True  # Enable conversation memory
     
+    @staticmethod
+    def _describe_arguments(tool_call: Dict[str, Any]) -> str:
+        """Arguments for the trace; malformed JSON is shown raw (the executor reports the failure)"""
+        try:
+            return str(tool_call_arguments(tool_call))
+        except ValueError:
+            return tool_call["function"]["arguments"]
+    
+    def _build_messages(self, user_input: str) -> List[Dict[str, Any]]:
+        # Shared static prefix first so provider prefix caching can hit; only the tail varies
+        history = self.conversation_history if self.enable_memory else ()
+        return self._build_context(self.prompt_prefix, history, user_input)
+    
     def process(self, user_input: str) -> str:
         reasoning_trace = []
-        messages = [{"role": "system", "content": TRAVEL_AGENT_TOOL_SYSTEM_PROMPT}]
-        
-        # Add few-shot examples
-        for example in TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
-        
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
-        
-        messages.append({"role": "user", "content": user_input})
+        messages = self._build_messages(user_input)
         
-        # Call LLM with tools
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-            tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-            tool_choice="auto"
-        )
-        
-        response_message = response.choices[0].message
+        # Call LLM with tools; each tool starts on the shared pool as soon as its arguments are complete
+        executor = ToolExecutor(self.tool_map)
+        streamed = StreamedMessage(on_tool_call=executor.start)
+        for _ in self._stream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto"):
+            pass
         
         # Check if the model wants to use tools
-        if response_message.tool_calls:
+        if streamed.tool_calls:
             reasoning_trace.append("🤔 **Planning to use tools...**\n")
             
-            # Execute tool calls
-            tool_results = []
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
-                
-                reasoning_trace.append(f"🔧 **Calling {tool_name}** with args: {tool_args}")
+            # Tool calls run concurrently; results are collected in call order
+            messages.append(streamed.to_message())
+            for tool_call, result in zip(streamed.tool_calls, executor.run(streamed.tool_calls)):
+                tool_name = tool_call["function"]["name"]
                 
+                reasoning_trace.append(f"🔧 **Calling {tool_name}** with args: {self._describe_arguments(tool_call)}")
                 if tool_name in self.tool_map:
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    tool_results.append({
-                        "tool_call_id": tool_call.id,
-                        "output": result
-                    })
                     reasoning_trace.append(f"✅ **{tool_name} result**: {result}\n")
-            
-            # Add tool results to messages and get final response
-            messages.append(response_message)
-            for result in tool_results:
+                
                 messages.append({
                     "role": "tool",
-                    "content": result["output"],
-                    "tool_call_id": result["tool_call_id"]
+                    "content": result,
+                    "tool_call_id": tool_call["id"]
                 })
+            self.last_tool_timings = executor.timings(streamed)
             
             reasoning_trace.append("💭 **Synthesizing results into final response...**\n\n---\n")
             
             # Get final response with tool results
-            final_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature
-            )
-            
-            final_content = final_response.choices[0].message.content
+            final_content = self._call_llm(messages)
         else:
-            final_content = response_message.content
+            final_content = streamed.content
         
         # Update conversation history if memory is enabled
         if self.enable_memory:
@@ -91,80 +75,43 @@ class ToolAgent(BaseAgent):
         return final_content
     
     def process_stream(self, user_input: str) -> Iterator[str]:
-        messages = [{"role": "system", "content": TRAVEL_AGENT_TOOL_SYSTEM_PROMPT}]
-        
-        # Add few-shot examples
-        for example in TRAVEL_AGENT_TOOL_FEW_SHOT_EXAMPLES:
-            messages.append({"role": "user", "content": example["user"]})
-            messages.append({"role": "assistant", "content": example["assistant"]})
+        messages = self._build_messages(user_input)
         
-        # Add conversation history if memory is enabled
-        if self.enable_memory:
-            messages.extend(self.conversation_history)
-        
-        messages.append({"role": "user", "content": user_input})
-        
-        # First, check if tools will be used
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-            tools=[{"type": "function", "function": tool.to_openai_function()} for tool in self.tools],
-            tool_choice="auto"
-        )
-        
-        response_message = response.choices[0].message
+        # Stream from the first token; tools start as soon as their arguments are complete
+        executor = ToolExecutor(self.tool_map)
+        streamed = StreamedMessage(on_tool_call=executor.start)
+        yield from self._stream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto")
+        final_content = streamed.content
         
-        final_content = ""
-        
-        if response_message.tool_calls:
+        if streamed.tool_calls:
             # Stream the reasoning process
             if self.show_reasoning:
                 yield "🤔 **Planning to use tools...**\n\n"
             
-            # Execute tool calls
-            for tool_call in response_message.tool_calls:
-                tool_name = tool_call.function.name
-                tool_args = json.loads(tool_call.function.arguments)
+            # The executor memoizes each call, so the result shown is the one sent back to the model
+            messages.append(streamed.to_message())
+            for tool_call in streamed.tool_calls:
+                tool_name = tool_call["function"]["name"]
                 
                 if self.show_reasoning:
-                    yield f"🔧 **Calling {tool_name}** with args: {tool_args}\n"
+                    yield f"🔧 **Calling {tool_name}** with args: {self._describe_arguments(tool_call)}\n"
                 
-                if tool_name in self.tool_map:
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    if self.show_reasoning:
-                        yield f"✅ **{tool_name} result**: {result}\n\n"
-            
-            # Prepare for final response
-            messages.append(response_message)
-            for tool_call in response_message.tool_calls:
-                if tool_call.function.name in self.tool_map:
-                    tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
-                    result = self.tool_map[tool_name].execute(**tool_args)
-                    messages.append({
-                        "role": "tool",
-                        "content": result,
-                        "tool_call_id": tool_call.id
-                    })
+                result = executor.result(tool_call)
+                if self.show_reasoning and tool_name in self.tool_map:
+                    yield f"✅ **{tool_name} result**: {result}\n\n"
+                
+                messages.append({
+                    "role": "tool",
+                    "content": result,
+                    "tool_call_id": tool_call["id"]
+                })
+            self.last_tool_timings = executor.timings(streamed)
             
             if self.show_reasoning:
                 yield "💭 **Synthesizing results into final response...**\n\n---\n\n"
             
             # Stream final response
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                stream=True
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    final_content += chunk.choices[0].delta.content
-                    yield chunk.choices[0].delta.content
-        else:
-            # No tools needed, stream the response directly
+            final_content = ""
             for chunk in self._call_llm_stream(messages):
                 final_content += chunk
                 yield chunk
@@ -1,18 +1,70 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Iterator
-from openai import OpenAI
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Iterator, Sequence, Tuple
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
-import os
+from src.core.context_window import ContextWindow
+from src.core.openai_clients import get_async_openai_client, get_openai_client
+from src.core.prompt_cache import PromptPrefix, prompt_cache_stats
+from src.core.streaming import StreamedMessage
+from src.core.tool_executor import ToolExecutor, is_failure
+from src.core.tools import Tool
 
 load_dotenv()
 
+# Kept per thread / asyncio task rather than on the agent, which concurrent sessions share
+_last_tool_timings: ContextVar[Tuple[Dict[str, Any], ...]] = ContextVar("last_tool_timings", default=())
+
 
 class BaseAgent(ABC):
-    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.7):
+    # Reasoning trace shown by _tool_turn/_atool_turn; agents built on them override these
+    tool_turn_start = "🔧 **Using tools...**"
+    tool_call_line = "🔧 **Using {tool_name}**"
+    tool_success_line = "✅ **{tool_name} finished**"
+    tool_failure_line = "❌ **{tool_name} failed**"
+    tool_turn_finish = "💭 **Putting the answer together...**"
+    
+    def __init__(self, model: str = "gpt-4o-mini", temperature: float = 0.7, context_budget: Optional[int] = None):
         self.model = model
         self.temperature = temperature
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.context_window = ContextWindow(model, context_budget)
+        # Shared with every other agent in the process, so sessions reuse one connection pool
+        self.client = get_openai_client()
+        self._async_client: Optional[AsyncOpenAI] = None
         self.conversation_history: List[Dict[str, str]] = []
+        self.tools = ()
+    
+    @property
+    def tools(self) -> Tuple[Tool, ...]:
+        return self._tools
+    
+    @tools.setter
+    def tools(self, tools: Iterable[Tool]):
+        # The request payload is rebuilt only when the tool set is replaced, not per call
+        self._tools = tuple(tools or ())
+        self.tool_map = {tool.name: tool for tool in self._tools}
+        self.tools_payload = tuple(tool.openai_tool for tool in self._tools)
+    
+    @property
+    def last_tool_timings(self) -> List[Dict[str, Any]]:
+        """Per-tool timings of the last tool-using turn run by this thread or task, including overlap
+        with the model's stream"""
+        return list(_last_tool_timings.get())
+    
+    @last_tool_timings.setter
+    def last_tool_timings(self, timings: Iterable[Dict[str, Any]]):
+        _last_tool_timings.set(tuple(timings))
+    
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # Looked up per call: the shared async client belongs to the running event loop
+        if self._async_client is None:
+            return get_async_openai_client()
+        return self._async_client
+    
+    @async_client.setter
+    def async_client(self, client: AsyncOpenAI):
+        self._async_client = client
     
     @abstractmethod
     def process(self, user_input: str) -> str:
@@ -25,24 +77,169 @@ class BaseAgent(ABC):
     def _create_messages(self, user_input: str) -> List[Dict[str, str]]:
         return [{"role": "user", "content": user_input}]
     
-    def _call_llm(self, messages: List[Dict[str, str]], **kwargs) -> str:
+    def _pinned_messages(self) -> List[Dict[str, str]]:
+        """Context that is sent with every request after the static prefix, however much history is
+        trimmed (e.g. MemoryAgent's summary)"""
+        return []
+    
+    def _build_context(self, prefix: PromptPrefix, history: Sequence[Dict[str, str]], user_input: str) -> List[Dict[str, str]]:
+        """Static prefix, pinned context, as much recent history as the token budget allows, then the user message"""
+        tail = [{"role": "user", "content": user_input}]
+        messages, _ = self.context_window.fit(prefix, history, tail, self._pinned_messages())
+        return messages
+    
+    def _create_completion(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """Every chat completion goes through here so prompt cache usage is recorded"""
         response = self.client.chat.completions.create(
             model=self.model,
             messages=messages,
             temperature=self.temperature,
             **kwargs
         )
-        return response.choices[0].message.content
+        prompt_cache_stats.record(getattr(response, "usage", None))
+        return response
     
-    def _call_llm_stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
-        stream = self.client.chat.completions.create(
+    async def _acreate_completion(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        response = await self.async_client.chat.completions.create(
             model=self.model,
             messages=messages,
             temperature=self.temperature,
-            stream=True,
             **kwargs
         )
+        prompt_cache_stats.record(getattr(response, "usage", None))
+        return response
+    
+    def _call_llm(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        response = self._create_completion(messages, **kwargs)
+        return response.choices[0].message.content
+    
+    def _call_llm_stream(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        yield from self._stream_completion(messages, StreamedMessage(), **kwargs)
+    
+    def _stream_completion(self, messages: List[Dict[str, str]], streamed: StreamedMessage, **kwargs) -> Iterator[str]:
+        """Yield content deltas as they arrive while ``streamed`` assembles the full message, tool calls included"""
+        # include_usage adds a final chunk with empty choices that carries the token usage
+        stream = self._create_completion(messages, stream=True, stream_options={"include_usage": True}, **kwargs)
+        
+        try:
+            for chunk in stream:
+                content = streamed.add(chunk)
+                if content:
+                    yield content
+                if getattr(chunk, "usage", None) is not None:
+                    prompt_cache_stats.record(chunk.usage)
+            streamed.finish()
+        finally:
+            # Release the HTTP connection when the consumer stops early (e.g. client disconnect)
+            stream.close()
+    
+    async def _acall_llm(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        response = await self._acreate_completion(messages, **kwargs)
+        return response.choices[0].message.content
+    
+    async def _acall_llm_stream(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        async for content in self._astream_completion(messages, StreamedMessage(), **kwargs):
+            yield content
+    
+    async def _astream_completion(self, messages: List[Dict[str, str]], streamed: StreamedMessage, **kwargs) -> AsyncIterator[str]:
+        stream = await self._acreate_completion(messages, stream=True, stream_options={"include_usage": True}, **kwargs)
+        
+        try:
+            async for chunk in stream:
+                content = streamed.add(chunk)
+                if content:
+                    yield content
+                if getattr(chunk, "usage", None) is not None:
+                    prompt_cache_stats.record(chunk.usage)
+            streamed.finish()
+        finally:
+            await stream.close()
+    
+    def _tool_turn(self, messages: List[Dict[str, Any]], user_input: str, history: List[Dict[str, str]]) -> Iterator[str]:
+        """One turn with tools: stream the reply, or run the tools it calls and stream the follow-up.
+        Each tool starts as soon as its streamed arguments are complete; the turn is recorded in ``history``"""
+        executor = ToolExecutor(self.tool_map)
+        streamed = StreamedMessage(on_tool_call=executor.start)
+        yield from self._stream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto")
+        final_content = streamed.content
+        
+        if streamed.tool_calls:
+            if self.show_reasoning:
+                yield f"{self.tool_turn_start}\n\n"
+            
+            # Collect tool results; most are already running or done by now
+            messages.append(streamed.to_message())
+            for tool_call in streamed.tool_calls:
+                if self.show_reasoning:
+                    yield self._tool_call_trace(tool_call)
+                result = executor.result(tool_call)
+                if self.show_reasoning and tool_call["function"]["name"] in self.tool_map:
+                    yield self._tool_result_trace(tool_call, result)
+                messages.append(self._tool_message(tool_call, result))
+            self.last_tool_timings = executor.timings(streamed)
+            
+            if self.show_reasoning:
+                yield f"{self.tool_turn_finish}\n\n---\n\n"
+            
+            final_content = ""
+            for chunk in self._call_llm_stream(messages):
+                final_content += chunk
+                yield chunk
         
-        for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                yield chunk.choices[0].delta.content
\ No newline at end of file
+        self._record_turn(history, user_input, final_content)
+    
+    async def _atool_turn(self, messages: List[Dict[str, Any]], user_input: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Async variant of _tool_turn() for the ASGI app"""
+        # Tools run on the shared tool pool (they do blocking I/O), never on the event loop
+        executor = ToolExecutor(self.tool_map)
+        streamed = StreamedMessage(on_tool_call=executor.start)
+        async for chunk in self._astream_completion(messages, streamed, tools=self.tools_payload, tool_choice="auto"):
+            yield chunk
+        final_content = streamed.content
+        
+        if streamed.tool_calls:
+            if self.show_reasoning:
+                yield f"{self.tool_turn_start}\n\n"
+            
+            messages.append(streamed.to_message())
+            for tool_call in streamed.tool_calls:
+                if self.show_reasoning:
+                    yield self._tool_call_trace(tool_call)
+                result = await executor.aresult(tool_call)
+                if self.show_reasoning and tool_call["function"]["name"] in self.tool_map:
+                    yield self._tool_result_trace(tool_call, result)
+                messages.append(self._tool_message(tool_call, result))
+            self.last_tool_timings = executor.timings(streamed)
+            
+            if self.show_reasoning:
+                yield f"{self.tool_turn_finish}\n\n---\n\n"
+            
+            final_content = ""
+            async for chunk in self._acall_llm_stream(messages):
+                final_content += chunk
+                yield chunk
+        
+        self._record_turn(history, user_input, final_content)
+    
+    def _tool_call_trace(self, tool_call: Dict[str, Any]) -> str:
+        return self.tool_call_line.format(tool_name=tool_call["function"]["name"]) + "\n"
+    
+    def _tool_result_trace(self, tool_call: Dict[str, Any], result: str) -> str:
+        tool_name = tool_call["function"]["name"]
+        if is_failure(result):
+            return f"{self.tool_failure_line.format(tool_name=tool_name)}: {result}\n\n"
+        return self.tool_success_line.format(tool_name=tool_name) + "\n\n"
+    
+    @staticmethod
+    def _tool_message(tool_call: Dict[str, Any], result: str) -> Dict[str, Any]:
+        # Every tool call needs a result message before the follow-up completion
+        return {"role": "tool", "content": result, "tool_call_id": tool_call["id"]}
+    
+    def _history(self, conversation_history: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        # A caller-supplied history (e.g. per-session) takes precedence over the agent's own
+        return self.conversation_history if conversation_history is None else conversation_history
+    
+    def _record_turn(self, history: List[Dict[str, str]], user_input: str, final_content: str):
+        if self.enable_memory:
+            history.append({"role": "user", "content": user_input})
+            history.append({"role": "assistant", "content": final_content})
@@ -0,0 +1,365 @@
+"""
+Calendly API client.
+
+One shared requests.Session keeps connections to Calendly alive across chat
+turns, so only the first call pays for the TLS handshake. 429 and 5xx
+responses and connection errors are retried a bounded number of times with
+jittered exponential backoff, all within a total time budget. A circuit
+breaker stops calling Calendly after repeated failures; while it is open,
+calls fail immediately and scheduling falls back to the prepared invite.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CALENDLY_API_URL = os.getenv("CALENDLY_API_URL", "https://api.calendly.com")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CalendlyError(Exception):
+    """A Calendly call failed after any retries"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets one trial call
+    through every ``reset_timeout`` seconds until a call succeeds again"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.opened = 0
+        self.short_circuits = 0
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+    
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.reset_timeout else "open"
+    
+    def before_call(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.short_circuits += 1
+        raise CircuitOpenError("circuit open")
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()  # (re)open; the next trial waits a full reset_timeout
+            self._trial_in_flight = False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state(time.monotonic()),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "short_circuits": self.short_circuits
+            }
+
+
+class CalendlyClient:
+    """Pooled, retrying Calendly client with a circuit breaker and latency/error metrics"""
+    
+    def __init__(self, base_url: str = CALENDLY_API_URL, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 total_timeout: float = 15.0, retries: int = 2, backoff: float = 0.25, max_backoff: float = 2.0,
+                 pool_size: int = 10, breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        
+        # Retries are handled here (with the breaker and budget), not by urllib3
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.attempts = 0
+        self.retried = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.status_counts: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+    
+    def create_scheduling_link(self, event_type_url: str, api_token: str, invitee_name: Optional[str] = None,
+                               invitee_email: Optional[str] = None) -> Dict[str, Any]:
+        """Create a one-off scheduling link, with prefilled name/email when given.
+        Docs: POST https://api.calendly.com/scheduling_links
+        """
+        payload = {
+            "owner": event_type_url,
+            "owner_type": "EventType",
+            "max_event_count": 1
+        }
+        if invitee_name or invitee_email:
+            payload["prefill"] = {
+                "name": invitee_name,
+                "email": invitee_email
+            }
+        try:
+            data = self._post("/scheduling_links", api_token, payload)
+        except CircuitOpenError:
+            return {"error": "Calendly is temporarily unavailable (circuit open)"}
+        except CalendlyError as e:
+            return {"error": str(e)}
+        
+        resource = data.get("resource")
+        if not isinstance(resource, dict):
+            return {"error": "Calendly returned a response without a scheduling link", "raw": data}
+        return {
+            "scheduling_url": resource.get("booking_url") or resource.get("scheduling_url"),
+            "raw": data
+        }
+    
+    def _post(self, path: str, api_token: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.breaker.before_call()
+        headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
+        start = time.perf_counter()
+        deadline = start + self.total_timeout
+        attempt = 0
+        # Whatever ends the call, the breaker hears about it, so a half-open trial is always released
+        healthy = False
+        
+        try:
+            while True:
+                attempt += 1
+                remaining = deadline - time.perf_counter()
+                retry_after = None
+                try:
+                    resp = self.session.post(
+                        self.base_url + path,
+                        headers=headers,
+                        json=payload,
+                        timeout=(max(0.1, min(self.connect_timeout, remaining)), max(0.1, min(self.read_timeout, remaining)))
+                    )
+                except requests.RequestException as e:
+                    error = CalendlyError(f"Calendly request failed: {e}")
+                    self._count_status("network_error")
+                else:
+                    self._count_status(str(resp.status_code))
+                    if resp.status_code < 400:
+                        try:
+                            data = resp.json()
+                        except (ValueError, requests.RequestException):
+                            data = None
+                        if not isinstance(data, dict):
+                            raise CalendlyError("Calendly returned an invalid response")
+                        healthy = True
+                        return data
+                    error = CalendlyError(f"Calendly API error {resp.status_code}: {resp.text}")
+                    if resp.status_code not in RETRY_STATUSES:
+                        # The request itself is wrong; retrying will not help and Calendly is healthy
+                        healthy = True
+                        raise error
+                    retry_after = _retry_after_seconds(resp)
+                
+                delay = self._backoff(attempt, retry_after)
+                if attempt > self.retries or time.perf_counter() + delay >= deadline:
+                    raise error
+                with self._lock:
+                    self.retried += 1
+                time.sleep(delay)
+        except CalendlyError as e:
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)[:200]
+            raise
+        finally:
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.requests += 1
+                self.attempts += attempt
+                self.total_ms += elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+    
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter keeps retries from many workers from arriving together
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+    
+    def _count_status(self, status: str):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "attempts": self.attempts,
+                "retries": self.retried,
+                "failures": self.failures,
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else 0,
+                "max_ms": round(self.max_ms, 1),
+                "status_counts": dict(self.status_counts),
+                "last_error": self.last_error,
+                "breaker": self.breaker.stats()
+            }
+
+
+def _retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+# Shared by every agent and worker thread in the process
+calendly_client = CalendlyClient()
+
+
+class SchedulingLinkPool:
+    """Single-use scheduling links for one event type, created ahead of time.
+    
+    ``acquire`` hands out a ready link instantly, with the invitee's details
+    attached as URL prefill parameters, and tops the pool back up in the
+    background. Links older than ``max_age`` are discarded unused. When the
+    pool is empty ``acquire`` returns None and the caller creates a link inline.
+    """
+    
+    def __init__(self, event_type_url: str, api_token: str, size: int = 5, max_age: float = 6 * 3600,
+                 client: Optional[CalendlyClient] = None):
+        self.event_type_url = event_type_url
+        self.api_token = api_token
+        self.size = size
+        self.max_age = max_age
+        self.client = client or calendly_client
+        self._links: Deque[Tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calendly-pool")
+        self._refilling = False
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.created = 0
+        self.refill_failures = 0
+        self.refill_ms = 0.0
+        self.last_refill_error: Optional[str] = None
+    
+    def acquire(self, invitee_name: str = "", invitee_email: str = "") -> Optional[str]:
+        now = time.monotonic()
+        url = None
+        with self._lock:
+            self._drop_expired(now)
+            if self._links:
+                url = self._links.popleft()[1]
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.refill()
+        if url is None:
+            return None
+        return with_prefill(url, invitee_name, invitee_email)
+    
+    def refill(self):
+        """Top the pool up on the background worker; a no-op while a refill is running"""
+        with self._lock:
+            if self._refilling or len(self._links) >= self.size:
+                return
+            self._refilling = True
+        self._refiller.submit(self._refill)
+    
+    def _refill(self):
+        try:
+            while True:
+                with self._lock:
+                    self._drop_expired(time.monotonic())
+                    if len(self._links) >= self.size:
+                        self._refilling = False
+                        return
+                start = time.perf_counter()
+                result = self.client.create_scheduling_link(self.event_type_url, self.api_token)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    self.refill_ms += elapsed_ms
+                    if not result.get("scheduling_url"):
+                        # Stop until the next acquire; the client's breaker handles a Calendly outage
+                        self.refill_failures += 1
+                        self.last_refill_error = str(result.get("error"))[:200]
+                        self._refilling = False
+                        return
+                    self.created += 1
+                    self._links.append((time.monotonic(), result["scheduling_url"]))
+        except Exception:
+            with self._lock:
+                self._refilling = False
+            raise
+    
+    def _drop_expired(self, now: float):
+        while self._links and now - self._links[0][0] > self.max_age:
+            self._links.popleft()
+            self.expired += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            acquired = self.hits + self.misses
+            refills = self.created + self.refill_failures
+            return {
+                "ready": len(self._links),
+                "target_size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / acquired, 4) if acquired else 0.0,
+                "created": self.created,
+                "expired": self.expired,
+                "refill_failures": self.refill_failures,
+                "avg_refill_ms": round(self.refill_ms / refills, 1) if refills else 0,
+                "last_refill_error": self.last_refill_error
+            }
+
+
+def with_prefill(url: str, invitee_name: str = "", invitee_email: str = "") -> str:
+    """Attach Calendly's name/email prefill query parameters to a booking URL"""
+    params = {key: value for key, value in (("name", invitee_name), ("email", invitee_email)) if value}
+    if not params:
+        return url
+    return url + ("&" if "?" in url else "?") + urlencode(params)
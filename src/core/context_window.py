@@ -0,0 +1,141 @@
+"""
+Token-budgeted context window.
+
+Counts prompt tokens locally and trims the oldest conversation turns so a
+request never exceeds the agent's budget. The static prompt prefix, pinned
+context and the current turn are always kept. Uses tiktoken when it is
+installed and a characters-per-token estimate otherwise.
+"""
+
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.prompt_cache import PromptPrefix, add_request_usage
+
+try:
+    import tiktoken
+except ImportError:  # optional: install tiktoken for exact counts
+    tiktoken = None
+
+# Input-token budgets per model; CONTEXT_TOKEN_BUDGET overrides them all.
+# Budgets sit well under the context windows so long sessions stay cheap and fast.
+MODEL_CONTEXT_BUDGETS = {
+    "gpt-3.5-turbo": 12000,
+    "gpt-4o-mini": 16000,
+    "gpt-4o": 16000,
+    "gpt-4.1-mini": 16000,
+    "gpt-4.1": 16000,
+    "gpt-5": 16000,
+}
+DEFAULT_CONTEXT_BUDGET = 16000
+
+# Per-message framing and reply priming, as counted by OpenAI's chat format
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Heuristic used without tiktoken; English prose averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def _encoding_for(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@lru_cache(maxsize=16384)
+def _count_text(text: str, model: str) -> int:
+    if tiktoken is not None:
+        return len(_encoding_for(model).encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(message: Any, model: str = "gpt-4o-mini") -> int:
+    """Tokens one chat message costs; content counts are cached per distinct string"""
+    if isinstance(message, dict):
+        role, content = message.get("role", ""), message.get("content")
+    else:
+        role, content = getattr(message, "role", ""), getattr(message, "content", None)
+    tokens = TOKENS_PER_MESSAGE + _count_text(role, model)
+    if content:
+        tokens += _count_text(content, model)
+    return tokens
+
+
+def budget_for_model(model: str) -> int:
+    if os.getenv("CONTEXT_TOKEN_BUDGET"):
+        return int(os.getenv("CONTEXT_TOKEN_BUDGET"))
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+
+class ContextWindow:
+    """Fits prefix + pinned context + history + current turn into a token budget"""
+
+    def __init__(self, model: str, budget: Optional[int] = None):
+        self.model = model
+        self.budget = budget or budget_for_model(model)
+        self._prefix_tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_sent = 0
+        self.last_tokens_sent = 0
+        self.max_tokens_sent = 0
+        self.turns_dropped = 0
+
+    def count(self, messages: Iterable[Any]) -> int:
+        return sum(count_message_tokens(message, self.model) for message in messages)
+
+    def fit(self, prefix: PromptPrefix, history: Sequence[Any], tail: Sequence[Any],
+            pinned: Sequence[Any] = ()) -> Tuple[List[Any], int]:
+        """Build the request messages, dropping the oldest history turns that do not fit"""
+        prefix_tokens = self._prefix_tokens.get(prefix.fingerprint)
+        if prefix_tokens is None:
+            prefix_tokens = self._prefix_tokens[prefix.fingerprint] = self.count(prefix.messages)
+
+        tokens = prefix_tokens + self.count(pinned) + self.count(tail) + TOKENS_PER_REPLY
+
+        # Keep the newest turns that fit, walking back from the end of the history
+        start = len(history)
+        while start > 0:
+            cost = count_message_tokens(history[start - 1], self.model)
+            if tokens + cost > self.budget:
+                break
+            tokens += cost
+            start -= 1
+
+        # Never open the kept window on an assistant reply whose question was dropped
+        while start < len(history) and start > 0 and _role(history[start]) != "user":
+            tokens -= count_message_tokens(history[start], self.model)
+            start += 1
+
+        with self._lock:
+            self.requests += 1
+            self.tokens_sent += tokens
+            self.last_tokens_sent = tokens
+            self.max_tokens_sent = max(self.max_tokens_sent, tokens)
+            self.turns_dropped += sum(1 for message in history[:start] if _role(message) == "user")
+        add_request_usage("context_tokens", tokens)
+
+        return prefix.build(pinned, history[start:], tail), tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model,
+                "budget": self.budget,
+                "tokenizer": "tiktoken" if tiktoken is not None else "estimate",
+                "requests": self.requests,
+                "tokens_sent": self.tokens_sent,
+                "last_tokens_sent": self.last_tokens_sent,
+                "max_tokens_sent": self.max_tokens_sent,
+                "avg_tokens_sent": round(self.tokens_sent / self.requests, 1) if self.requests else 0,
+                "turns_dropped": self.turns_dropped
+            }
+
+
+def _role(message: Any) -> str:
+    return message.get("role", "") if isinstance(message, dict) else getattr(message, "role", "")
@@ -0,0 +1,200 @@
+"""
+Local intent routing for common questions.
+
+Questions such as "what does MATIC Studio do?" or "what is RPA?" have one
+good answer, so they are answered from prepared text instead of an OpenAI
+round-trip. Messages are normalized and scored against a keyword vocabulary
+per intent, built from MATIC_STUDIO_SERVICES and the few-shot examples: the
+confidence is the share of the message's content words the intent covers,
+with matches on an intent's defining keywords, then bigram matches, breaking
+ties. Only answers at or above the confidence threshold are served;
+everything else falls through to the LLM.
+
+Messages are only routed at the start of a conversation or after an
+assistant turn that did not ask anything: a short reply such as "UiPath"
+or "automation" is usually the answer to the agent's own question and
+belongs to the LLM, as do messages under ``min_words`` words.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.prompts import MATIC_STUDIO_FEW_SHOT_EXAMPLES, MATIC_STUDIO_INFO, MATIC_STUDIO_SERVICES
+
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", 0.8))
+INTENT_MIN_WORDS = int(os.getenv("INTENT_MIN_WORDS", 3))
+
+# Question scaffolding that says nothing about which intent is meant
+STOPWORDS = frozenset("""
+a an the is are was be what whats which who how do does did can could would will you your yours me my i im we our
+us it its this that about tell more learn of for to in on at with and or please pls hi hello hey there know explain
+describe give some any info information details detail s
+""".split())
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, spell the company name one way and reduce punctuation to single spaces"""
+    text = text.lower().replace("&", " and ").replace("maticstudio", "matic studio")
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _stem(token: str) -> str:
+    # Prefix stemming is enough for this vocabulary: automate/automation, process/processes
+    return token[:6]
+
+
+def content_tokens(text: str) -> List[str]:
+    return [_stem(token) for token in normalize(text).split() if token not in STOPWORDS]
+
+
+def _bigrams(tokens: List[str]) -> set:
+    return set(zip(tokens, tokens[1:]))
+
+
+def awaits_answer(history: Sequence[Dict[str, str]]) -> bool:
+    """Whether the last assistant turn ended with a question"""
+    for message in reversed(history):
+        if message.get("role") == "assistant":
+            return (message.get("content") or "").rstrip().rstrip("*_").endswith("?")
+    return False
+
+
+class Intent:
+    """A prepared ``answer`` for messages described by ``keywords`` (what defines the intent) and ``phrases``"""
+    
+    def __init__(self, name: str, keywords: Iterable[str], phrases: Iterable[str], answer: str):
+        self.name = name
+        self.answer = answer
+        self.keywords = frozenset(token for keyword in keywords for token in content_tokens(keyword))
+        phrase_tokens = [content_tokens(phrase) for phrase in phrases]
+        self.vocabulary = self.keywords.union(*phrase_tokens)
+        self.bigrams = frozenset(bigram for tokens in phrase_tokens for bigram in _bigrams(tokens))
+
+
+class IntentRouter:
+    """Answers high-confidence intents locally and counts hits per intent"""
+    
+    def __init__(self, intents: Iterable[Intent], threshold: float = INTENT_CONFIDENCE_THRESHOLD,
+                 min_words: int = INTENT_MIN_WORDS):
+        self.intents: Tuple[Intent, ...] = tuple(intents)
+        self.threshold = threshold
+        self.min_words = min_words
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {intent.name: 0 for intent in self.intents}
+        self.fallthroughs = 0
+        self.below_threshold = 0
+        self.skipped = 0
+        self.total_us = 0.0
+        self.routed = 0
+    
+    def classify(self, text: str) -> Tuple[Optional[Intent], float]:
+        """The best-matching intent and its confidence (0 to 1); earlier intents win ties"""
+        tokens = content_tokens(text)
+        if not tokens:
+            return None, 0.0
+        bigrams = _bigrams(tokens)
+        best, best_key = None, (0.0, 0, 0)
+        for intent in self.intents:
+            coverage = sum(1 for token in tokens if token in intent.vocabulary) / len(tokens)
+            key = (coverage, sum(1 for token in tokens if token in intent.keywords), len(bigrams & intent.bigrams))
+            if key > best_key:
+                best, best_key = intent, key
+        return best, best_key[0]
+    
+    def route(self, text: str, history: Sequence[Dict[str, str]] = ()) -> Optional[str]:
+        """The prepared answer for ``text``, or None when the LLM should handle it"""
+        start = time.perf_counter()
+        # Short messages and replies to the agent's questions are never routed, however well they match
+        skipped = len(normalize(text).split()) < self.min_words or awaits_answer(history)
+        intent, confidence = (None, 0.0) if skipped else self.classify(text)
+        matched = intent is not None and confidence >= self.threshold
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        with self._lock:
+            self.routed += 1
+            self.total_us += elapsed_us
+            if matched:
+                self.hits[intent.name] += 1
+            else:
+                self.fallthroughs += 1
+                self.skipped += 1 if skipped else 0
+                self.below_threshold += 1 if intent is not None else 0
+        return intent.answer if matched else None
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = sum(self.hits.values())
+            return {
+                "threshold": self.threshold,
+                "routed": self.routed,
+                "served_locally": served,
+                "hit_rate": round(served / self.routed, 4) if self.routed else 0.0,
+                "fallthroughs": self.fallthroughs,
+                "below_threshold": self.below_threshold,
+                "skipped": self.skipped,
+                "avg_us": round(self.total_us / self.routed, 1) if self.routed else 0,
+                "hits": dict(self.hits)
+            }
+
+
+def _call_to_action(topic: str) -> str:
+    return (f"Would you like to explore how {topic} could work for your business? I can schedule a consultation "
+            f"call with {MATIC_STUDIO_INFO['lead_architect']}, our lead architect - just share your name, company, "
+            f"email address and a preferred date & time.")
+
+
+def _services_answer() -> str:
+    lines = ["**MATIC Studio Services**", ""]
+    for service in MATIC_STUDIO_SERVICES.values():
+        lines.append(f"• **{service['name']}** - {service['description']}")
+    lines += ["", "**Industries We Serve:**", "Healthcare, Banking, Oil & Gas, Payments, BPOs, and more.", "",
+              _call_to_action("automation")]
+    return "\n".join(lines)
+
+
+def _service_answer(service: Dict[str, Any]) -> str:
+    lines = [f"**{service['name']}**", "", f"{service['description']}.", "",
+             f"**Technologies:** {', '.join(service['technologies'])}", "", "**Typical projects:**"]
+    lines += [f"• {example}" for example in service["examples"]]
+    lines += ["", _call_to_action(service["name"])]
+    return "\n".join(lines)
+
+
+# Products listed under several services, pinned to the service that answers them best
+SERVICE_KEYWORDS = {
+    "data_visualization_bi": ["power bi", "tableau", "dashboards"]
+}
+
+
+def matic_studio_intents() -> List[Intent]:
+    """Company overview, the service list, then one intent per entry of MATIC_STUDIO_SERVICES"""
+    overview, services = MATIC_STUDIO_FEW_SHOT_EXAMPLES[0], MATIC_STUDIO_FEW_SHOT_EXAMPLES[1]
+    intents = [
+        Intent("company_overview", ["matic studio"], [
+            overview["user"],
+            "tell me about matic studio",
+            "what does matic studio do",
+            "who is matic studio"
+        ], overview["assistant"].strip()),
+        Intent("services", ["services offer provide solutions"], [
+            services["user"],
+            "what services do you offer",
+            "what services do you provide",
+            "list your services and solutions"
+        ], _services_answer())
+    ]
+    for key, service in MATIC_STUDIO_SERVICES.items():
+        keywords = [service["name"], key.replace("_", " "), *SERVICE_KEYWORDS.get(key, ())]
+        intents.append(Intent(f"service:{key}", keywords, [
+            *service["technologies"],
+            *service["examples"]
+        ], _service_answer(service)))
+    return intents
+
+
+# Shared by every agent in the process, so hit counters cover all sessions
+intent_router = IntentRouter(matic_studio_intents())
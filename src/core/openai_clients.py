@@ -0,0 +1,168 @@
+"""
+Process-wide OpenAI clients.
+
+Every agent, session and worker thread shares one client per API key, and
+with it one HTTP connection pool, so keep-alive connections and TLS state are
+reused instead of being set up again for each new agent. Pool limits,
+timeouts and the SDK's retry policy come from the environment. Request,
+retry and pool utilization counts are available for /health.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI, Timeout
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 30))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", 5))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 60))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+
+# The SDK's own HTTP library defines the pool limits type
+Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+
+class ClientStats:
+    """Requests, SDK retries and response statuses seen by one client's connection pool"""
+    
+    def __init__(self, limits: Any):
+        self.transport: Any = None
+        self.limits = limits
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.status_counts: Dict[str, int] = {}
+    
+    def record_request(self, request: Any):
+        with self._lock:
+            self.requests += 1
+            # The SDK numbers its retries in this header
+            if request.headers.get("x-stainless-retry-count", "0") != "0":
+                self.retries += 1
+    
+    def record_response(self, response: Any):
+        with self._lock:
+            status = str(response.status_code)
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+    
+    def pool(self) -> Dict[str, Any]:
+        # httpx does not expose its pool publicly; report what the transport's connection pool holds
+        connections = list(getattr(getattr(self.transport, "_pool", None), "connections", ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        active = sum(1 for connection in connections if not connection.is_idle() and not connection.is_closed())
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": len(connections),
+            "active": active,
+            "idle": idle,
+            "utilization": round(active / self.limits.max_connections, 4) if self.limits.max_connections else 0.0
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        pool = self.pool()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "status_counts": dict(self.status_counts),
+                "pool": pool
+            }
+
+
+class OpenAIClientRegistry:
+    """Hands out one shared sync client per API key and one async client per API key and event loop"""
+    
+    def __init__(self, max_connections: int = OPENAI_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                 connect_timeout: float = OPENAI_CONNECT_TIMEOUT_SECONDS, timeout: float = OPENAI_TIMEOUT_SECONDS,
+                 max_retries: int = OPENAI_MAX_RETRIES):
+        self.limits = Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[Optional[str], Optional[str]], Tuple[OpenAI, ClientStats]] = {}
+        # httpx async pools are bound to the loop that opened them, so async clients are kept per
+        # loop and go away with it
+        self._async_clients: "weakref.WeakKeyDictionary[Any, Dict[Any, Tuple[AsyncOpenAI, ClientStats]]]" = weakref.WeakKeyDictionary()
+    
+    def client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        with self._lock:
+            entry = self._clients.get((api_key, base_url))
+            if entry is None:
+                stats = ClientStats(self.limits)
+                http_client = DefaultHttpxClient(
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [stats.record_request], "response": [stats.record_response]}
+                )
+                stats.transport = getattr(http_client, "_transport", None)
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                                timeout=self.timeout, max_retries=self.max_retries)
+                entry = self._clients[(api_key, base_url)] = (client, stats)
+            return entry[0]
+    
+    def async_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            entry = clients.get((api_key, base_url))
+            if entry is None:
+                stats = ClientStats(self.limits)
+                
+                async def on_request(request: Any):
+                    stats.record_request(request)
+                
+                async def on_response(response: Any):
+                    stats.record_response(response)
+                
+                http_client = DefaultAsyncHttpxClient(
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [on_request], "response": [on_response]}
+                )
+                stats.transport = getattr(http_client, "_transport", None)
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                                     timeout=self.timeout, max_retries=self.max_retries)
+                entry = clients[(api_key, base_url)] = (client, stats)
+            return entry[0]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = [("sync", stats) for _, stats in self._clients.values()]
+            clients += [("async", stats) for loop_clients in self._async_clients.values() for _, stats in loop_clients.values()]
+        return {
+            "max_retries": self.max_retries,
+            "timeout_seconds": self.timeout.read,
+            "connect_timeout_seconds": self.timeout.connect,
+            "clients": [{"type": kind, **stats.stats()} for kind, stats in clients]
+        }
+
+
+# Shared by every agent and worker thread in the process
+openai_clients = OpenAIClientRegistry()
+
+
+def get_openai_client(api_key: Optional[str] = None) -> OpenAI:
+    return openai_clients.client(api_key)
+
+
+def get_async_openai_client(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """Must be called from the event loop the client will be used on"""
+    return openai_clients.async_client(api_key)
+
+
+def openai_client_stats() -> Dict[str, Any]:
+    return openai_clients.stats()
@@ -0,0 +1,121 @@
+"""
+Prompt assembly for provider-side prefix caching.
+
+OpenAI caches the longest previously seen prompt prefix (1024 tokens and up),
+so every request from an agent should start with exactly the same messages in
+exactly the same order. Each agent's system prompt and few-shot examples are
+built once into an immutable PromptPrefix; requests only append their dynamic
+tail (history, the new user message, tool results).
+"""
+
+import hashlib
+import json
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.core.prompts import (
+    MATIC_STUDIO_BASE_PROMPT,
+    MATIC_STUDIO_EMAIL_EXAMPLES,
+    MATIC_STUDIO_EMAIL_PROMPT,
+    MATIC_STUDIO_ENHANCED_PROMPT,
+    MATIC_STUDIO_FEW_SHOT_EXAMPLES,
+    MATIC_STUDIO_SCHEDULING_PROMPT,
+)
+from src.core.tools import FrozenDict
+
+
+class PromptPrefix:
+    """System prompt plus few-shot example pairs, frozen at construction"""
+
+    def __init__(self, system_prompt: str, examples: Iterable[Dict[str, str]] = ()):
+        messages = [FrozenDict(role="system", content=system_prompt)]
+        for example in examples:
+            messages.append(FrozenDict(role="user", content=example["user"]))
+            messages.append(FrozenDict(role="assistant", content=example["assistant"]))
+        self.messages: Tuple[FrozenDict, ...] = tuple(messages)
+
+        # Identifies the exact prefix bytes, e.g. to confirm two deployments share a cache entry
+        encoded = json.dumps(self.messages, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.fingerprint = hashlib.sha256(encoded).hexdigest()[:16]
+
+    def build(self, *tails: Iterable[Any]) -> List[Any]:
+        """Return a new request message list: the shared prefix followed by each tail in order"""
+        messages = list(self.messages)
+        for tail in tails:
+            messages.extend(tail)
+        return messages
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+
+BASE_PREFIX = PromptPrefix(MATIC_STUDIO_BASE_PROMPT)
+ENHANCED_PREFIX = PromptPrefix(MATIC_STUDIO_ENHANCED_PROMPT, MATIC_STUDIO_FEW_SHOT_EXAMPLES)
+EMAIL_PREFIX = PromptPrefix(MATIC_STUDIO_EMAIL_PROMPT, MATIC_STUDIO_EMAIL_EXAMPLES)
+SCHEDULING_PREFIX = PromptPrefix(MATIC_STUDIO_SCHEDULING_PROMPT)
+
+
+# Usage of the LLM calls made while handling the current request (see track_prompt_usage)
+_request_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar("request_usage", default=None)
+
+
+def track_prompt_usage() -> Dict[str, int]:
+    """Start a per-request usage tally; LLM calls in this thread or task add to the returned dict"""
+    usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "uncached_tokens": 0, "context_tokens": 0}
+    _request_usage.set(usage)
+    return usage
+
+
+def add_request_usage(key: str, value: int):
+    """Add to the current request's usage tally, if one is being tracked"""
+    usage = _request_usage.get()
+    if usage is not None:
+        usage[key] = usage.get(key, 0) + value
+
+
+class PromptCacheStats:
+    """Process-wide cached vs. uncached prompt token counts from response ``usage``"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, usage: Any) -> Optional[Dict[str, int]]:
+        """Account one completion's usage; returns its prompt token split"""
+        if usage is None:
+            return None
+
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        split = {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": prompt_tokens - cached_tokens
+        }
+
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        add_request_usage("calls", 1)
+        for key, value in split.items():
+            add_request_usage(key, value)
+        return split
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "uncached_tokens": self.prompt_tokens - self.cached_tokens,
+                "hit_rate": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
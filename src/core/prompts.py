@@ -319,4 +319,10 @@ Best regards,
 {LEAD_GEN_POLICY}
 """
     }
-]
\ No newline at end of file
+]
+MEMORY_SUMMARY_PROMPT = """You maintain the running memory of a chat between a visitor and the MATIC Studio assistant.
+Merge the existing summary with the new conversation turns into one updated summary.
+
+Keep: the visitor's name, company, contact details, needs, budget, timeline, decisions and open questions.
+Drop: greetings, small talk and anything the assistant repeated from its own service descriptions.
+Write at most 150 words of plain prose. Output only the summary."""
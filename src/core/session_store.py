@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SessionStore:
+    """Bounded, thread-safe conversation history keyed by session_id.
+
+    Sessions are evicted least-recently-used once ``max_sessions`` is reached
+    and after ``ttl_seconds`` of inactivity. Each session keeps at most
+    ``max_turns`` user/assistant pairs.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, max_turns: int = 20):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", 1000)),
+            ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", 1800)),
+            max_turns=int(os.getenv("SESSION_MAX_TURNS", 20))
+        )
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Return a copy of the session history (empty for unknown or expired sessions)"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            entry["last_access"] = now
+            self._sessions.move_to_end(session_id)
+            return list(entry["messages"])
+
+    def save_history(self, session_id: str, messages: List[Dict[str, str]]):
+        """Store the session history, trimmed to the per-session turn cap"""
+        messages = list(messages[-self.max_turns * 2:]) if self.max_turns else []
+        size = sum(_message_size(message) for message in messages)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry["bytes"]
+            self._sessions[session_id] = {"messages": messages, "bytes": size, "last_access": now}
+            self._bytes += size
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= evicted["bytes"]
+                self.evictions += 1
+
+    def append_turn(self, session_id: str, user_input: str, response: str):
+        history = self.get_history(session_id)
+        history.append({"role": "user", "content": user_input})
+        history.append({"role": "assistant", "content": response})
+        self.save_history(session_id, history)
+
+    def clear(self, session_id: Optional[str] = None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+                self._bytes = 0
+                return
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry["bytes"]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _expire(self, now: float):
+        # Entries are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry["last_access"] < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._bytes -= entry["bytes"]
+            self.expirations += 1
+
+
+def _message_size(message: Dict[str, str]) -> int:
+    return len(message.get("role", "")) + len((message.get("content") or "").encode("utf-8"))
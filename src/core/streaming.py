@@ -0,0 +1,100 @@
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StreamedMessage:
+    """Assistant message assembled incrementally from ``stream=True`` chunks.
+    
+    Content deltas are returned by ``add`` as they arrive so callers can forward
+    them immediately; tool-call deltas (id and name first, then argument
+    fragments) are accumulated per index. As soon as a tool call's argument JSON
+    is complete, ``on_tool_call`` is invoked with it, before the stream ends.
+    """
+    
+    def __init__(self, on_tool_call: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._content: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self._ready: set = set()
+        self.on_tool_call = on_tool_call
+        self.finish_reason: Optional[str] = None
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+    
+    def add(self, chunk: Any) -> Optional[str]:
+        """Fold one chunk into the message; returns its content delta, if any"""
+        if not chunk.choices:
+            return None  # the trailing usage chunk
+        
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            self.finish_reason = choice.finish_reason
+        
+        delta = choice.delta
+        for call in getattr(delta, "tool_calls", None) or ():
+            assembled = self._tool_calls.setdefault(call.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if call.id:
+                assembled["id"] = call.id
+            if call.function is not None:
+                if call.function.name:
+                    assembled["function"]["name"] += call.function.name
+                if call.function.arguments:
+                    assembled["function"]["arguments"] += call.function.arguments
+                    # Only a fragment closing an object can complete the JSON, so parsing is rarely attempted
+                    if call.function.arguments.rstrip().endswith("}"):
+                        self._check_ready(call.index)
+        
+        if delta.content:
+            self._content.append(delta.content)
+            return delta.content
+        return None
+    
+    def finish(self):
+        """Mark the stream complete; tool calls not yet handed to ``on_tool_call`` are released now"""
+        self.finished_at = time.perf_counter()
+        for index in sorted(self._tool_calls):
+            self._release(index)
+    
+    def _check_ready(self, index: int):
+        if index in self._ready:
+            return
+        try:
+            json.loads(self._tool_calls[index]["function"]["arguments"])
+        except ValueError:
+            return
+        self._release(index)
+    
+    def _release(self, index: int):
+        if index in self._ready:
+            return
+        self._ready.add(index)
+        self._tool_calls[index]["ready_at"] = time.perf_counter()
+        if self.on_tool_call is not None:
+            self.on_tool_call(self._tool_calls[index])
+    
+    @property
+    def content(self) -> str:
+        return "".join(self._content)
+    
+    @property
+    def tool_calls(self) -> List[Dict[str, Any]]:
+        return [self._tool_calls[index] for index in sorted(self._tool_calls)]
+    
+    def to_message(self) -> Dict[str, Any]:
+        """The assistant message to append to the conversation before tool results"""
+        message = {"role": "assistant", "content": self.content or None}
+        if self._tool_calls:
+            message["tool_calls"] = [
+                {"id": call["id"], "type": call["type"], "function": dict(call["function"])} for call in self.tool_calls
+            ]
+        return message
+
+
+def tool_call_arguments(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Parsed arguments of an assembled tool call (an empty argument string means no arguments)"""
+    return json.loads(tool_call["function"]["arguments"] or "{}")
+
@@ -0,0 +1,100 @@
+"""
+Result caching for tools.
+
+Each tool declares a CachePolicy: pure tools keep results indefinitely,
+idempotent external calls keep them for a TTL, and tools with side effects
+pass no policy and are never cached. Caches are bounded LRUs and report
+hits, misses, expirations and evictions.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+_MISSING = object()
+
+
+class CachePolicy:
+    """How a tool's results may be reused.
+    
+    ``ttl`` is in seconds (None keeps results until evicted); ``key_args``
+    limits the cache key to those arguments (None uses all of them).
+    """
+    
+    def __init__(self, ttl: Optional[float] = None, key_args: Optional[Sequence[str]] = None, max_entries: int = 256):
+        self.ttl = ttl
+        self.key_args = tuple(key_args) if key_args is not None else None
+        self.max_entries = max_entries
+    
+    def key(self, arguments: Dict[str, Any]) -> str:
+        if self.key_args is not None:
+            arguments = {name: arguments.get(name) for name in self.key_args}
+        return json.dumps(arguments, sort_keys=True, default=str)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time to live"""
+    
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        _caches[name] = self
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+    
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions
+            }
+
+
+# Every cache by name, for /health
+_caches: Dict[str, TTLCache] = {}
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,224 @@
+"""
+Concurrent tool execution.
+
+Tool calls from one assistant message are independent, so they run side by
+side on a bounded, process-wide thread pool instead of one after another.
+Results are always collected in the order of the tool calls, each call has a
+timeout (``Tool.timeout`` or the executor default) and the whole turn has a
+deadline. A call can be submitted while the model is still streaming (pass
+``start`` as a StreamedMessage's ``on_tool_call``), so tools overlap the rest
+of the message.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.streaming import StreamedMessage, tool_call_arguments
+from src.core.tools import ToolResult
+
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", 8))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", 20))
+TOOL_TURN_DEADLINE_SECONDS = float(os.getenv("TOOL_TURN_DEADLINE_SECONDS", 45))
+
+# Shared by every agent; bounds how many tool calls (mostly outbound HTTP) run at once
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def is_failure(result: str) -> bool:
+    """Tool.execute flags failures on its ToolResult; other callables report them with a leading ❌"""
+    failed = getattr(result, "failed", None)
+    return result.startswith("❌") if failed is None else failed
+
+
+class ToolStats:
+    """Process-wide per-tool latency, failures, retries and overlap with the model's stream"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, float]] = {}
+    
+    def record(self, timing: Dict[str, Any]):
+        with self._lock:
+            stats = self._tools.setdefault(timing["tool"], {
+                "calls": 0, "speculative": 0, "failures": 0, "timeouts": 0, "retries": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "overlap_ms": 0.0
+            })
+            stats["calls"] += 1
+            stats["speculative"] += 1 if timing["speculative"] else 0
+            stats["failures"] += 1 if timing["failed"] else 0
+            stats["timeouts"] += 1 if timing["timed_out"] else 0
+            stats["retries"] += timing["attempts"] - 1
+            stats["total_ms"] += timing["tool_ms"]
+            stats["max_ms"] = max(stats["max_ms"], timing["tool_ms"])
+            stats["overlap_ms"] += timing["overlap_ms"]
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    **{key: value for key, value in stats.items() if key not in ("total_ms", "max_ms", "overlap_ms")},
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 1),
+                    "max_ms": round(stats["max_ms"], 1),
+                    "overlap_ms": round(stats["overlap_ms"], 1)
+                }
+                for name, stats in self._tools.items()
+            }
+
+
+tool_stats = ToolStats()
+
+
+class ToolExecutor:
+    """Runs one turn's tool calls concurrently, within per-tool timeouts and a turn deadline.
+    
+    ``start`` submits a call; ``result`` and ``aresult`` wait for it,
+    submitting it first if needed. ``run`` does both for a whole list of
+    calls. Runs are memoized per turn by tool_call id and by tool name plus
+    arguments, so however often a call is looked up (or repeated by the model)
+    it executes exactly once; a repeat of a call that failed or timed out runs
+    again. With ``retries``, a failed call is run again on the same worker.
+    """
+    
+    def __init__(self, tool_map: Dict[str, Any], timeout: Optional[float] = None,
+                 deadline: Optional[float] = None, retries: int = 0):
+        self.tool_map = tool_map
+        self.timeout = timeout or TOOL_TIMEOUT_SECONDS
+        self.retries = retries
+        self.started_at = time.perf_counter()
+        self.deadline_at = self.started_at + (deadline or TOOL_TURN_DEADLINE_SECONDS)
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._runs_by_args: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    
+    def start(self, tool_call: Dict[str, Any], speculative: bool = True):
+        tool = self.tool_map.get(tool_call["function"]["name"])
+        if tool is None or tool_call["id"] in self._runs:
+            return
+        try:
+            arguments = tool_call_arguments(tool_call)
+        except ValueError:
+            return  # reported by result() once the message is complete
+        
+        key = (tool.name, json.dumps(arguments, sort_keys=True, default=str))
+        previous = self._runs_by_args.get(key)
+        if previous is not None and not self._failed(previous):
+            self._runs[tool_call["id"]] = previous
+            return
+        
+        run = {
+            "name": tool.name,
+            "speculative": speculative,
+            "timeout": getattr(tool, "timeout", None) or self.timeout,
+            "attempts": [],
+            "started": time.perf_counter(),
+            "finished": None,
+            "timed_out": False,
+            "reported": False
+        }
+        if run["started"] >= self.deadline_at:
+            run["future"] = self._resolved(ToolResult(f"❌ {tool.name} skipped: the turn's tool deadline has passed", failed=True))
+            run["timed_out"] = True
+            run["finished"] = run["started"]
+        else:
+            run["future"] = _tool_pool.submit(self._execute, tool, arguments, run)
+        self._runs[tool_call["id"]] = self._runs_by_args[key] = run
+    
+    def _execute(self, tool: Any, arguments: Dict[str, Any], run: Dict[str, Any]) -> str:
+        try:
+            result = tool.execute(**arguments)
+            run["attempts"].append(result)
+            for _ in range(self.retries):
+                if not is_failure(result) or time.perf_counter() >= self.deadline_at:
+                    break
+                result = tool.execute(**arguments)
+                run["attempts"].append(result)
+            return result
+        finally:
+            run["finished"] = time.perf_counter()
+    
+    @staticmethod
+    def _failed(run: Dict[str, Any]) -> bool:
+        if run["timed_out"]:
+            return True
+        return run["future"].done() and is_failure(run["future"].result())
+    
+    @staticmethod
+    def _resolved(result: str) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+    
+    def _run_for(self, tool_call: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if tool_call["id"] not in self._runs:
+            self.start(tool_call, speculative=False)
+        return self._runs.get(tool_call["id"])
+    
+    def _wait_seconds(self, run: Dict[str, Any]) -> float:
+        return max(0.0, min(run["started"] + run["timeout"], self.deadline_at) - time.perf_counter())
+    
+    def _timed_out(self, run: Dict[str, Any]) -> str:
+        # The worker cannot be interrupted; it finishes in the background and its result is discarded
+        run["timed_out"] = True
+        run["finished"] = time.perf_counter()
+        return ToolResult(f"❌ {run['name']} timed out after {run['finished'] - run['started']:.1f}s", failed=True)
+    
+    def result(self, tool_call: Dict[str, Any]) -> str:
+        run = self._run_for(tool_call)
+        if run is None:
+            # Unknown tool or arguments that are not valid JSON
+            return ToolResult(f"Error executing {tool_call['function']['name']}: invalid tool call", failed=True)
+        try:
+            return run["future"].result(timeout=self._wait_seconds(run))
+        except FutureTimeoutError:
+            return self._timed_out(run)
+    
+    async def aresult(self, tool_call: Dict[str, Any]) -> str:
+        run = self._run_for(tool_call)
+        if run is None or run["future"].done():
+            return self.result(tool_call)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(run["future"])), self._wait_seconds(run))
+        except asyncio.TimeoutError:
+            return self._timed_out(run)
+    
+    def run(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """Run all calls concurrently; results come back in the order of ``tool_calls``"""
+        for tool_call in tool_calls:
+            self.start(tool_call, speculative=False)
+        return [self.result(tool_call) for tool_call in tool_calls]
+    
+    def attempts(self, tool_call: Dict[str, Any]) -> List[str]:
+        """Every result the call produced, first attempt first"""
+        run = self._runs.get(tool_call["id"])
+        return list(run["attempts"]) if run is not None else []
+    
+    def timings(self, streamed: Optional[StreamedMessage] = None) -> List[Dict[str, Any]]:
+        """Timings of calls not reported yet, relative to the stream (or turn) start.
+        
+        ``overlap_ms`` is how long each tool ran while the model was still streaming.
+        """
+        origin = streamed.started_at if streamed is not None else self.started_at
+        stream_end = streamed.finished_at if streamed is not None and streamed.finished_at else origin
+        timings = []
+        for run in self._runs.values():
+            if run["reported"] or run["finished"] is None:
+                continue
+            run["reported"] = True
+            timing = {
+                "tool": run["name"],
+                "speculative": run["speculative"],
+                "attempts": max(1, len(run["attempts"])),
+                "failed": run["timed_out"] or bool(run["attempts"] and is_failure(run["attempts"][-1])),
+                "timed_out": run["timed_out"],
+                "started_ms": round((run["started"] - origin) * 1000, 1),
+                "stream_ms": round((stream_end - origin) * 1000, 1),
+                "tool_ms": round((run["finished"] - run["started"]) * 1000, 1),
+                "overlap_ms": round(max(0.0, min(run["finished"], stream_end) - run["started"]) * 1000, 1)
+            }
+            tool_stats.record(timing)
+            timings.append(timing)
+        return timings
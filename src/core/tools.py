@@ -1,32 +1,85 @@
-from typing import Dict, List, Callable, Any
+from typing import Dict, List, Callable, Any, Optional
 import json
 from datetime import datetime, timedelta
 import random
 import os
-import requests
+import threading
+from src.core.calendly import SchedulingLinkPool, calendly_client
 from src.core.prompts import MATIC_STUDIO_INFO
+from src.core.tool_cache import CachePolicy, TTLCache
+
+
+class FrozenDict(dict):
+    """Read-only dict; still a dict, so it serializes like the spec it replaces"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("OpenAI tool specs are immutable; build a new Tool instead")
+    
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ToolResult(str):
+    """A tool's output text; ``failed`` marks errors, which are sent to the model but never cached or reused"""
+    
+    def __new__(cls, text: str, failed: bool = False):
+        result = super().__new__(cls, text)
+        result.failed = failed
+        return result
 
 
 class Tool:
-    def __init__(self, name: str, description: str, function: Callable, parameters: Dict[str, Any]):
+    def __init__(self, name: str, description: str, function: Callable, parameters: Dict[str, Any],
+                 timeout: Optional[float] = None, cache: Optional[CachePolicy] = None):
         self.name = name
         self.description = description
         self.function = function
         self.parameters = parameters
+        self.timeout = timeout  # seconds ToolExecutor waits for a call; None uses its default
+        # No policy means the tool has side effects and every call runs
+        self.cache = cache
+        self._results = TTLCache(f"tool:{name}", cache.ttl, cache.max_entries) if cache is not None else None
+        
+        # The schema never changes after construction, so it is built once
+        self.openai_function = freeze({
+            "name": name,
+            "description": description,
+            "parameters": parameters
+        })
+        self.openai_tool = FrozenDict(type="function", function=self.openai_function)
     
     def to_openai_function(self) -> Dict[str, Any]:
-        return {
-            "name": self.name,
-            "description": self.description,
-            "parameters": self.parameters
-        }
+        return self.openai_function
     
-    def execute(self, **kwargs) -> str:
+    def execute(self, **kwargs) -> ToolResult:
+        if self._results is not None:
+            key = self.cache.key(kwargs)
+            cached = self._results.get(key)
+            if cached is not None:
+                return ToolResult(cached)
+        
         try:
             result = self.function(**kwargs)
-            return json.dumps(result) if not isinstance(result, str) else result
+            output = json.dumps(result) if not isinstance(result, str) else result
         except Exception as e:
-            return f"Error executing {self.name}: {str(e)}"
+            return ToolResult(f"Error executing {self.name}: {str(e)}", failed=True)
+        
+        # Failures are never cached so the next call can succeed
+        failed = output.startswith("❌") or (isinstance(result, dict) and "error" in result)
+        if self._results is not None and not failed:
+            self._results.set(key, output)
+        return ToolResult(output, failed=failed)
 
 
 def _create_calendly_scheduling_link(
@@ -37,33 +90,9 @@ def _create_calendly_scheduling_link(
 ) -> Dict[str, Any]:
     """Create a Calendly scheduling link (one-off) with prefilled name/email.
     Requires: CALENDLY_EVENT_TYPE_URL, CALENDLY_API_TOKEN
-    Docs: POST https://api.calendly.com/scheduling_links
+    Returns {"error": ...} on failure, so scheduling falls back to the prepared invite.
     """
-    try:
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "owner": event_type_url,
-            "owner_type": "EventType",
-            "max_event_count": 1,
-            "prefill": {
-                "name": invitee_name,
-                "email": invitee_email
-            }
-        }
-        resp = requests.post("https://api.calendly.com/scheduling_links", headers=headers, json=payload, timeout=15)
-        if resp.status_code >= 400:
-            return {"error": f"Calendly API error {resp.status_code}: {resp.text}"}
-        data = resp.json()
-        resource = data.get("resource", {})
-        return {
-            "scheduling_url": resource.get("booking_url") or resource.get("scheduling_url"),
-            "raw": data
-        }
-    except Exception as e:
-        return {"error": f"Calendly request failed: {str(e)}"}
+    return calendly_client.create_scheduling_link(event_type_url, api_token, invitee_name, invitee_email)
 
 
 # Email composition tool
@@ -123,6 +152,78 @@ Best regards,
     }
 
 
+# Available time slots (fallback mock implementation)
+AVAILABLE_SLOTS = (
+    "Monday 10:00 AM EST",
+    "Monday 2:00 PM EST",
+    "Tuesday 11:00 AM EST",
+    "Tuesday 3:00 PM EST",
+    "Wednesday 10:00 AM EST",
+    "Wednesday 2:00 PM EST",
+    "Thursday 11:00 AM EST",
+    "Thursday 3:00 PM EST",
+    "Friday 10:00 AM EST",
+    "Friday 2:00 PM EST"
+)
+
+# Scheduling links are idempotent per invitee, so a repeat request reuses the link already created
+CALENDLY_LINK_CACHE = TTLCache(
+    "calendly_links",
+    ttl=float(os.getenv("CALENDLY_LINK_TTL_SECONDS", 1800)),
+    max_entries=int(os.getenv("CALENDLY_LINK_CACHE_SIZE", 1024))
+)
+
+
+# Ready-made single-use links per event type (0 disables pooling)
+CALENDLY_LINK_POOL_SIZE = int(os.getenv("CALENDLY_LINK_POOL_SIZE", 5))
+CALENDLY_LINK_MAX_AGE_SECONDS = float(os.getenv("CALENDLY_LINK_MAX_AGE_SECONDS", 6 * 3600))
+_link_pools: Dict[str, SchedulingLinkPool] = {}
+_link_pools_lock = threading.Lock()
+
+
+def calendly_link_pool(event_type_url: str = "", api_token: str = "") -> Optional[SchedulingLinkPool]:
+    """The link pool for an event type (default: the configured one), created and warmed on first use.
+    None when Calendly is not configured or pooling is disabled."""
+    event_type_url = event_type_url or os.getenv("CALENDLY_EVENT_TYPE_URL", "").strip()
+    api_token = api_token or os.getenv("CALENDLY_API_TOKEN", "").strip()
+    if not (event_type_url and api_token) or CALENDLY_LINK_POOL_SIZE <= 0:
+        return None
+    
+    with _link_pools_lock:
+        pool = _link_pools.get(event_type_url)
+        if pool is None:
+            pool = _link_pools[event_type_url] = SchedulingLinkPool(
+                event_type_url, api_token, size=CALENDLY_LINK_POOL_SIZE, max_age=CALENDLY_LINK_MAX_AGE_SECONDS
+            )
+            pool.refill()
+    return pool
+
+
+def calendly_link_pool_stats() -> Dict[str, Any]:
+    with _link_pools_lock:
+        pools = list(_link_pools.items())
+    return {event_type_url: pool.stats() for event_type_url, pool in pools}
+
+
+def _calendly_link_for_invitee(event_type_url: str, api_token: str, invitee_name: str, invitee_email: str) -> Dict[str, Any]:
+    """Cached per event type and invitee; failed requests are not cached.
+    A warm pooled link is used when one is ready, so no Calendly call sits on the request path."""
+    key = (event_type_url, invitee_name.strip().lower(), invitee_email.strip().lower())
+    cached = CALENDLY_LINK_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    pool = calendly_link_pool(event_type_url, api_token)
+    pooled_url = pool.acquire(invitee_name, invitee_email) if pool is not None else None
+    if pooled_url:
+        result = {"scheduling_url": pooled_url, "pooled": True}
+    else:
+        result = _create_calendly_scheduling_link(event_type_url, api_token, invitee_name=invitee_name, invitee_email=invitee_email)
+    if result.get("scheduling_url"):
+        CALENDLY_LINK_CACHE.set(key, result)
+    return result
+
+
 # Meeting scheduling tool
 def schedule_consultation_meeting(
     client_name: str,
@@ -139,25 +240,11 @@ def schedule_consultation_meeting(
     Optional: project_type, meeting_duration, contact_phone
     """
     
-    # Generate available time slots (fallback mock implementation)
-    available_slots = [
-        "Monday 10:00 AM EST",
-        "Monday 2:00 PM EST", 
-        "Tuesday 11:00 AM EST",
-        "Tuesday 3:00 PM EST",
-        "Wednesday 10:00 AM EST",
-        "Wednesday 2:00 PM EST",
-        "Thursday 11:00 AM EST",
-        "Thursday 3:00 PM EST",
-        "Friday 10:00 AM EST",
-        "Friday 2:00 PM EST"
-    ]
-    
     # Use provided date/time if available; otherwise pick a slot
     if preferred_date and preferred_time:
         selected_slot = f"{preferred_date} {preferred_time}"
     else:
-        selected_slot = random.choice(available_slots)
+        selected_slot = random.choice(AVAILABLE_SLOTS)
     
     meeting_details = {
         "meeting_type": "Initial Consultation",
@@ -191,12 +278,12 @@ Contact: {contact_email}{f' | {contact_phone}' if contact_phone else ''}""",
             "status": "invite_prepared"
         }
     }
-
+    
     # Try Calendly integration if configured
     calendly_event_type_url = os.getenv("CALENDLY_EVENT_TYPE_URL", "").strip()
     calendly_api_token = os.getenv("CALENDLY_API_TOKEN", "").strip()
     if calendly_event_type_url and calendly_api_token:
-        calendly_result = _create_calendly_scheduling_link(
+        calendly_result = _calendly_link_for_invitee(
             calendly_event_type_url,
             calendly_api_token,
             invitee_name=client_name,
@@ -212,72 +299,72 @@ Contact: {contact_email}{f' | {contact_phone}' if contact_phone else ''}""",
 
 
 # Service information tool
+# Static catalog, built once at import; freeze() keeps lookups from mutating it
+SERVICE_CATALOG = freeze({
+    "web_development": {
+        "name": "Web Development",
+        "description": "Custom web applications, e-commerce platforms, and responsive websites",
+        "technologies": ["React", "Vue.js", "Node.js", "Python", "PHP", "WordPress"],
+        "process": [
+            "Requirements gathering and planning",
+            "UI/UX design and wireframing", 
+            "Frontend and backend development",
+            "Testing and quality assurance",
+            "Deployment and launch",
+            "Ongoing maintenance and support"
+        ],
+        "timeline": "4-12 weeks depending on complexity",
+        "starting_price": "$15,000"
+    },
+    "mobile_development": {
+        "name": "Mobile Development", 
+        "description": "Native and cross-platform mobile applications for iOS and Android",
+        "technologies": ["React Native", "Flutter", "Swift", "Kotlin", "Xamarin"],
+        "process": [
+            "App concept and requirements",
+            "UI/UX design and prototyping",
+            "Development and testing",
+            "App store submission",
+            "Launch and maintenance"
+        ],
+        "timeline": "8-16 weeks depending on complexity",
+        "starting_price": "$25,000"
+    },
+    "ui_ux_design": {
+        "name": "UI/UX Design",
+        "description": "User-centered design solutions with focus on usability and aesthetics",
+        "deliverables": ["Wireframes", "Prototypes", "Design systems", "User research", "Usability testing"],
+        "process": [
+            "User research and analysis",
+            "Information architecture",
+            "Wireframing and prototyping",
+            "Visual design and branding",
+            "Usability testing and iteration"
+        ],
+        "timeline": "3-8 weeks depending on scope",
+        "starting_price": "$8,000"
+    },
+    "consulting": {
+        "name": "Digital Strategy Consulting",
+        "description": "Strategic guidance for digital transformation and product development",
+        "services": ["Product strategy", "Technology consulting", "Digital transformation", "Market analysis"],
+        "process": [
+            "Current state assessment",
+            "Strategy development",
+            "Technology recommendations",
+            "Implementation roadmap",
+            "Ongoing guidance and support"
+        ],
+        "timeline": "2-6 weeks depending on scope",
+        "starting_price": "$5,000"
+    }
+})
+SERVICE_NOT_FOUND = "Service '{}' not found. Available services: " + str(list(SERVICE_CATALOG))
+
+
 def get_service_details(service_name: str) -> Dict[str, Any]:
     """Get detailed information about Matic Studio services"""
-    
-    services = {
-        "web_development": {
-            "name": "Web Development",
-            "description": "Custom web applications, e-commerce platforms, and responsive websites",
-            "technologies": ["React", "Vue.js", "Node.js", "Python", "PHP", "WordPress"],
-            "process": [
-                "Requirements gathering and planning",
-                "UI/UX design and wireframing", 
-                "Frontend and backend development",
-                "Testing and quality assurance",
-                "Deployment and launch",
-                "Ongoing maintenance and support"
-            ],
-            "timeline": "4-12 weeks depending on complexity",
-            "starting_price": "$15,000"
-        },
-        "mobile_development": {
-            "name": "Mobile Development", 
-            "description": "Native and cross-platform mobile applications for iOS and Android",
-            "technologies": ["React Native", "Flutter", "Swift", "Kotlin", "Xamarin"],
-            "process": [
-                "App concept and requirements",
-                "UI/UX design and prototyping",
-                "Development and testing",
-                "App store submission",
-                "Launch and maintenance"
-            ],
-            "timeline": "8-16 weeks depending on complexity",
-            "starting_price": "$25,000"
-        },
-        "ui_ux_design": {
-            "name": "UI/UX Design",
-            "description": "User-centered design solutions with focus on usability and aesthetics",
-            "deliverables": ["Wireframes", "Prototypes", "Design systems", "User research", "Usability testing"],
-            "process": [
-                "User research and analysis",
-                "Information architecture",
-                "Wireframing and prototyping",
-                "Visual design and branding",
-                "Usability testing and iteration"
-            ],
-            "timeline": "3-8 weeks depending on scope",
-            "starting_price": "$8,000"
-        },
-        "consulting": {
-            "name": "Digital Strategy Consulting",
-            "description": "Strategic guidance for digital transformation and product development",
-            "services": ["Product strategy", "Technology consulting", "Digital transformation", "Market analysis"],
-            "process": [
-                "Current state assessment",
-                "Strategy development",
-                "Technology recommendations",
-                "Implementation roadmap",
-                "Ongoing guidance and support"
-            ],
-            "timeline": "2-6 weeks depending on scope",
-            "starting_price": "$5,000"
-        }
-    }
-    
-    return services.get(service_name.lower(), {
-        "error": f"Service '{service_name}' not found. Available services: {list(services.keys())}"
-    })
+    return SERVICE_CATALOG.get(service_name.lower()) or {"error": SERVICE_NOT_FOUND.format(service_name)}
 
 
 # Tool definitions
@@ -318,7 +405,9 @@ MATIC_STUDIO_TOOLS = [
                 "contact_phone": {"type": "string", "description": "Client's phone number (optional)"}
             },
             "required": ["client_name", "company_name", "preferred_date", "preferred_time", "contact_email"]
-        }
+        },
+        timeout=20  # Calendly's own request timeout is 15s
+        # Not cached as a whole: the result depends on the requested slot; the Calendly link is cached per invitee
     ),
     Tool(
         name="get_service_details",
@@ -330,6 +419,7 @@ MATIC_STUDIO_TOOLS = [
                 "service_name": {"type": "string", "description": "Name of the service (web_development, mobile_development, ui_ux_design, consulting)"}
             },
             "required": ["service_name"]
-        }
+        },
+        cache=CachePolicy()  # pure lookup over a static catalog
     )
 ]
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled Calendly client, run against a local stub HTTP server
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core import tools
+from src.core.calendly import CalendlyClient, CircuitBreaker, SchedulingLinkPool
+
+
+class StubCalendly(BaseHTTPRequestHandler):
+    """Answers POST /scheduling_links with the server's scripted statuses (or raw 201 bodies), then 201s"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append(body)
+        status = server.script.pop(0) if server.script else 201
+        
+        if isinstance(status, str):
+            status, payload = 201, status
+        elif status < 400:
+            payload = json.dumps({"resource": {"booking_url": f"https://calendly.test/{len(server.requests)}"}})
+        else:
+            payload = json.dumps({"message": "stub error"})
+        encoded = payload.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(encoded)
+    
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCalendly)
+    server.script = []
+    server.requests = []
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, **kwargs) -> CalendlyClient:
+    kwargs.setdefault("backoff", 0.01)
+    kwargs.setdefault("max_backoff", 0.02)
+    return CalendlyClient(base_url=f"http://127.0.0.1:{stub.server_address[1]}", **kwargs)
+
+
+def create(client: CalendlyClient):
+    return client.create_scheduling_link("https://api.calendly.com/event_types/ET", "token", "Ana Cruz", "ana@acme.com")
+
+
+def test_success_reuses_one_pooled_connection(stub):
+    client = make_client(stub)
+    
+    results = [create(client) for _ in range(3)]
+    
+    assert [result["scheduling_url"] for result in results] == [f"https://calendly.test/{i}" for i in (1, 2, 3)]
+    assert stub.requests[0]["prefill"] == {"name": "Ana Cruz", "email": "ana@acme.com"}
+    assert stub.connections == 1
+    assert client.stats()["requests"] == 3
+
+
+def test_retries_5xx_and_429_then_succeeds(stub):
+    stub.script = [503, 429]
+    client = make_client(stub, retries=2)
+    
+    result = create(client)
+    
+    assert result["scheduling_url"] == "https://calendly.test/3"
+    stats = client.stats()
+    assert stats["retries"] == 2
+    assert stats["status_counts"] == {"503": 1, "429": 1, "201": 1}
+    assert stats["breaker"]["state"] == "closed"
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.script = [400]
+    client = make_client(stub)
+    
+    result = create(client)
+    
+    assert "Calendly API error 400" in result["error"]
+    assert len(stub.requests) == 1
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_opens_fails_fast_and_recovers(stub):
+    stub.script = [500] * 4
+    client = make_client(stub, retries=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+    
+    assert "error" in create(client)
+    assert "error" in create(client)
+    assert client.breaker.state == "open"
+    
+    # While open, calls never reach the server
+    result = create(client)
+    assert "circuit open" in result["error"]
+    assert len(stub.requests) == 4
+    assert client.stats()["breaker"]["short_circuits"] == 1
+    
+    # After the reset timeout one trial call goes through and closes the circuit
+    threading.Event().wait(0.25)
+    assert create(client)["scheduling_url"]
+    assert client.breaker.state == "closed"
+
+
+@pytest.mark.parametrize("body", ["<html>Bad gateway</html>", "[]", '{"resource": "gone"}'])
+def test_malformed_bodies_are_errors_and_release_the_trial_call(stub, body):
+    client = make_client(stub, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+    client.breaker.record_failure()
+    time.sleep(0.06)
+    stub.script = [body]
+    
+    assert "error" in create(client)
+    assert client.breaker.state == ("closed" if body.startswith("{") else "open")
+    time.sleep(0.06)
+    assert create(client)["scheduling_url"] == "https://calendly.test/2"
+    assert client.breaker.state == "closed"
+
+
+def test_any_requests_error_is_reported_not_raised():
+    client = CalendlyClient(base_url="http://", retries=0, breaker=CircuitBreaker(failure_threshold=1))
+    
+    assert "Invalid URL" in create(client)["error"]
+    assert client.breaker.state == "open"
+    assert client.stats()["status_counts"] == {"network_error": 1}
+
+
+def test_open_breaker_falls_back_to_prepared_invite(stub, monkeypatch):
+    client = make_client(stub, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    client.breaker.record_failure()
+    monkeypatch.setattr(tools, "calendly_client", client)
+    monkeypatch.setenv("CALENDLY_EVENT_TYPE_URL", "https://api.calendly.com/event_types/ET")
+    monkeypatch.setenv("CALENDLY_API_TOKEN", "token")
+    tools.CALENDLY_LINK_CACHE.clear()
+    
+    details = tools.schedule_consultation_meeting(
+        client_name="Ana Cruz",
+        company_name="Acme",
+        preferred_date="Monday",
+        preferred_time="10:00 AM",
+        contact_email="ana@acme.com"
+    )
+    
+    assert stub.requests == []
+    assert details["calendar_invite"]["status"] == "invite_prepared"
+    assert details["date_time"] == "Monday 10:00 AM"
+    assert "circuit open" in details["calendly"]["error"]
+
+
+def wait_for_ready(pool: SchedulingLinkPool, ready: int, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pool.stats()["ready"] >= ready:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_link_pool_hands_out_warm_links_with_prefill(stub):
+    pool = SchedulingLinkPool("https://api.calendly.com/event_types/ET", "token", size=3, client=make_client(stub))
+    pool.refill()
+    assert wait_for_ready(pool, 3)
+    assert all("prefill" not in body for body in stub.requests)
+    
+    url = pool.acquire("Ana Cruz", "ana@acme.com")
+    
+    assert url == "https://calendly.test/1?name=Ana+Cruz&email=ana%40acme.com"
+    # The used link is replaced in the background
+    assert wait_for_ready(pool, 3)
+    stats = pool.stats()
+    assert stats["hits"] == 1 and stats["created"] == 4
+
+
+def test_link_pool_miss_and_expiry(stub):
+    stub.script = [500] * 3
+    pool = SchedulingLinkPool("https://api.calendly.com/event_types/ET", "token", size=2, max_age=0.2,
+                              client=make_client(stub, retries=2))
+    
+    # Calendly failing: the pool stays empty and acquire falls through to the caller
+    assert pool.acquire("Ana Cruz", "ana@acme.com") is None
+    deadline = time.monotonic() + 5
+    while pool.stats()["refill_failures"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    # Refilling stopped at the failure; the next refill succeeds
+    pool.refill()
+    assert wait_for_ready(pool, 2)
+    
+    time.sleep(0.25)
+    pool.acquire("Bo", "bo@acme.com")
+    stats = pool.stats()
+    assert stats["expired"] == 2
+    assert stats["misses"] == 2
+    assert stats["refill_failures"] == 1
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the /api/chat/stream Server-Sent Events endpoints
+"""
+
+import json
+import time
+
+import pytest
+
+import flask_app
+from src.core.session_store import SessionStore
+
+
+@pytest.mark.parametrize("body", ["{not json", "[1, 2]"])
+def test_asgi_stream_rejects_bodies_that_are_not_a_json_object(body):
+    testclient = pytest.importorskip("starlette.testclient")
+    import asgi_app
+    
+    response = testclient.TestClient(asgi_app.app).post(
+        "/api/chat/stream", content=body, headers={"Content-Type": "application/json"}
+    )
+    
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+
+class StubAgent:
+    """Streams ``chunks`` like SchedulingAgent.process_stream, pausing ``delay`` seconds before each one"""
+    
+    def __init__(self, chunks, delay=0.0, error=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+    
+    def process_stream(self, user_input, conversation_history):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+        if self.error:
+            raise self.error
+        conversation_history += [{"role": "user", "content": user_input}, {"role": "assistant", "content": "".join(self.chunks)}]
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    turns = []
+    store = SessionStore()
+    monkeypatch.setattr(flask_app, "session_store", store)
+    monkeypatch.setattr(flask_app, "persist_turn", lambda *args: turns.append(args))
+    
+    def post(agent, body=None):
+        monkeypatch.setattr(flask_app, "get_scheduling_agent", lambda: agent)
+        response = flask_app.app.test_client().post("/api/chat/stream", json=body or {"message": "Hi", "session_id": "s1"})
+        return response, parse_events(response.get_data(as_text=True))
+    
+    post.turns = turns
+    post.store = store
+    return post
+
+
+def parse_events(body):
+    events = []
+    for block in body.split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            assert event.startswith("event: ") and data.startswith("data: ")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_tokens_are_framed_as_events_and_the_turn_is_saved_after_streaming(stream):
+    response, events = stream(StubAgent(["Hel", "lo!"]))
+    
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert events == [
+        ("session", {"session_id": "s1"}),
+        ("token", {"content": "Hel"}),
+        ("token", {"content": "lo!"}),
+        ("done", {"status": "success", "session_id": "s1"})
+    ]
+    assert [turn[:3] for turn in stream.turns] == [("s1", "Hi", "Hello!")]
+    assert stream.store.get_history("s1")[-1] == {"role": "assistant", "content": "Hello!"}
+
+
+def test_heartbeats_keep_a_slow_stream_open(stream, monkeypatch):
+    monkeypatch.setattr(flask_app, "SSE_HEARTBEAT_SECONDS", 0.01)
+    
+    _, events = stream(StubAgent(["Hello"], delay=0.2))
+    
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "session" and kinds[-2:] == ["token", "done"]
+    assert set(kinds[1:-2]) == {"heartbeat"}
+    assert stream.turns
+
+
+def test_agent_errors_end_the_stream_without_saving(stream):
+    _, events = stream(StubAgent(["Hel"], error=RuntimeError("OpenAI unavailable")))
+    
+    assert events[-1] == ("error", {"error": "OpenAI unavailable", "status": "error"})
+    assert "done" not in [kind for kind, _ in events]
+    assert stream.turns == []
+    assert stream.store.get_history("s1") == []
+
+
+def test_missing_message_is_rejected_before_streaming():
+    response = flask_app.app.test_client().post("/api/chat/stream", json={"session_id": "s1"})
+    
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "No message provided"}
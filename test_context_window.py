@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for ContextWindow.fit: token-budgeted history trimming
+"""
+
+import contextvars
+
+from src.core.context_window import TOKENS_PER_REPLY, ContextWindow
+from src.core.prompt_cache import PromptPrefix, track_prompt_usage
+
+PREFIX = PromptPrefix("You are a helpful assistant for MATIC Studio.", [{"user": "Hi", "assistant": "Hello!"}])
+PINNED = [{"role": "system", "content": "Summary: the visitor runs a logistics company."}]
+TAIL = [{"role": "user", "content": "Can you book a call for Friday?"}]
+
+
+def history(turns):
+    messages = []
+    for n in range(turns):
+        messages.append({"role": "user", "content": f"Question number {n} about automating our invoices"})
+        messages.append({"role": "assistant", "content": f"Answer number {n}: we can automate that with RPA"})
+    return messages
+
+
+def window_fitting(extra_messages):
+    """A window whose budget holds prefix, pinned, tail and the last ``extra_messages`` history messages"""
+    window = ContextWindow("gpt-4o-mini", budget=1)
+    window.budget = window.count(PREFIX.messages) + window.count(PINNED) + window.count(TAIL) + TOKENS_PER_REPLY
+    if extra_messages:
+        window.budget += window.count(history(10)[-extra_messages:])
+    return window
+
+
+def test_everything_is_sent_when_it_fits():
+    window = ContextWindow("gpt-4o-mini", budget=100000)
+    
+    messages, tokens = window.fit(PREFIX, history(3), TAIL, PINNED)
+    
+    assert messages == list(PREFIX.messages) + PINNED + history(3) + TAIL
+    assert tokens == window.count(messages) + TOKENS_PER_REPLY
+    assert window.stats()["turns_dropped"] == 0
+
+
+def test_oldest_turns_are_dropped_first():
+    window = window_fitting(4)
+    
+    messages, _ = window.fit(PREFIX, history(10), TAIL, PINNED)
+    
+    assert messages == list(PREFIX.messages) + PINNED + history(10)[-4:] + TAIL
+    assert window.stats()["turns_dropped"] == 8
+
+
+def test_window_never_opens_on_an_orphaned_reply():
+    # Room for three messages: the third from the end is an assistant reply whose question does not fit
+    window = window_fitting(3)
+    
+    messages, tokens = window.fit(PREFIX, history(10), TAIL, PINNED)
+    
+    assert messages == list(PREFIX.messages) + PINNED + history(10)[-2:] + TAIL
+    assert tokens == window.count(messages) + TOKENS_PER_REPLY
+
+
+def test_prefix_pinned_and_current_turn_are_kept_over_budget():
+    window = ContextWindow("gpt-4o-mini", budget=1)
+    
+    messages, tokens = window.fit(PREFIX, history(5), TAIL, PINNED)
+    
+    assert messages == list(PREFIX.messages) + PINNED + TAIL
+    assert tokens > window.budget
+
+
+def test_tokens_sent_are_recorded_per_window_and_request():
+    window = window_fitting(2)
+    
+    def request():
+        # Run in its own context so the usage tally does not leak into other tests
+        usage = track_prompt_usage()
+        _, first = window.fit(PREFIX, history(10), TAIL, PINNED)
+        _, second = window.fit(PREFIX, [], TAIL)
+        return usage, first, second
+    
+    usage, first, second = contextvars.copy_context().run(request)
+    
+    stats = window.stats()
+    assert stats["requests"] == 2
+    assert stats["tokens_sent"] == first + second == usage["context_tokens"]
+    assert stats["last_tokens_sent"] == second
+    assert stats["max_tokens_sent"] == first == window.budget
+    assert stats["avg_tokens_sent"] == round((first + second) / 2, 1)
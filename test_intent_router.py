@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the local intent router and the SchedulingAgent fast path
+"""
+
+import pytest
+
+from src.agents.scheduling_agent import SchedulingAgent
+from src.core.intent_router import IntentRouter, matic_studio_intents
+from src.core.prompts import MATIC_STUDIO_SERVICES
+
+
+class NoLLM:
+    """Fails the test if the agent calls OpenAI"""
+    
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+    
+    def create(self, **kwargs):
+        raise AssertionError("the LLM should not have been called")
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(matic_studio_intents(), threshold=0.8)
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("Learn more about MATICStudio", "company_overview"),
+    ("tell me about matic studio", "company_overview"),
+    ("What does Matic Studio do?", "company_overview"),
+    ("What services does MATIC Studio offer?", "services"),
+    ("what services do you provide", "services"),
+    ("What is RPA?", "service:rpa_solutions"),
+    ("tell me about uipath", "service:rpa_solutions"),
+    ("Do you do Excel VBA macros?", "service:m365_vba_automation"),
+    ("what is power automate", "service:microsoft_power_platform"),
+    ("tell me about power bi", "service:data_visualization_bi"),
+])
+def test_known_intents_are_answered_locally(router, message, intent):
+    matched, confidence = router.classify(message)
+    
+    assert matched.name == intent
+    assert confidence >= router.threshold
+    assert router.route(message) == matched.answer
+
+
+@pytest.mark.parametrize("message", [
+    "I want to automate data entry with RPA, can we schedule a meeting Monday 10am?",
+    "My name is Ana Cruz, ana@acme.com",
+    "How much does RPA cost?",
+    "yes please",
+    "hi",
+    "automation",
+    "Tableau please",
+    "matic studio",
+])
+def test_everything_else_falls_through(router, message):
+    assert router.route(message) is None
+
+
+def test_service_answers_are_built_from_the_catalog(router):
+    answer = router.route("What is RPA?")
+    service = MATIC_STUDIO_SERVICES["rpa_solutions"]
+    
+    assert service["name"] in answer
+    assert all(technology in answer for technology in service["technologies"])
+
+
+def test_threshold_and_counters():
+    router = IntentRouter(matic_studio_intents(), threshold=0.3)
+    
+    assert router.route("How much does RPA cost?") is not None
+    router.threshold = 1.01
+    assert router.route("What is RPA?") is None
+    assert router.route("hi") is None
+    
+    stats = router.stats()
+    assert stats["hits"]["service:rpa_solutions"] == 1
+    assert stats["routed"] == 3 and stats["served_locally"] == 1
+    assert stats["fallthroughs"] == 2 and stats["below_threshold"] == 1
+    assert stats["skipped"] == 1
+
+
+@pytest.mark.parametrize("reply", ["Excel", "automation", "UiPath", "Tell me about Power BI dashboards"])
+def test_replies_to_an_assistant_question_go_to_the_llm(router, reply):
+    history = [
+        {"role": "user", "content": "I'd like to automate our monthly reporting"},
+        {"role": "assistant", "content": "Happy to help! Which tools does your team use today?"}
+    ]
+    
+    assert router.route(reply, history) is None
+    assert router.route("Tell me about Power BI dashboards", history[:1]) is not None
+
+
+def test_agent_answers_without_the_llm_and_keeps_history(router):
+    agent = SchedulingAgent()
+    agent.client = NoLLM()
+    agent.intent_router = router
+    history = []
+    
+    streamed = "".join(agent.process_stream("What is RPA?", conversation_history=history))
+    answer = agent.process("What does MATIC Studio do?", conversation_history=history)
+    
+    assert "About MATIC Studio" in answer
+    assert "Robotic Process Automation" in streamed
+    assert [message["role"] for message in history] == ["user", "assistant"] * 2
+    assert router.stats()["served_locally"] == 2
+
+
+def test_agent_hands_follow_ups_to_the_llm(router):
+    agent = SchedulingAgent()
+    agent.intent_router = router
+    history = [
+        {"role": "user", "content": "Can you automate our reports?"},
+        {"role": "assistant", "content": "Sure - are your reports built in Excel or Power BI?"}
+    ]
+    
+    assert agent._local_answer("Tell me about Power BI", history) is None
+    assert len(history) == 2
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for contact-field extraction from visitor messages
+"""
+
+import pytest
+
+from lead_extraction import LeadExtractor, extract_fields
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("My name is ana cruz, ana@acme.com", {"name": "Ana Cruz", "email": "ana@acme.com"}),
+    ("I'm Ben Cruz from Acme Corp. ben@acme.io is best.", {"name": "Ben Cruz", "company": "Acme Corp.", "email": "ben@acme.io"}),
+    ("Our company is Blue Ocean", {"company": "Blue Ocean"}),
+    ("We are Blue Ocean Holdings Inc.", {"company": "Blue Ocean Holdings Inc."}),
+    ("Call me Ana, or reach me on +63 917 123 4567", {"name": "Ana", "phone": "+63 917 123 4567"}),
+])
+def test_contact_fields_are_extracted(message, expected):
+    assert extract_fields(message) == expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Call me at 555-123-4567", {"phone": "555-123-4567"}),
+    ("Call me back later please", {}),
+    ("The company is growing fast", {}),
+    ("Our group is small", {}),
+    ("I am from Manila", {}),
+    ("I'm from Quezon City, free on Monday", {}),
+    ("Our budget is 100000 - 200000", {}),
+    ("Can we meet on 10 11 2025?", {}),
+    ("Let's meet 2025 11 10 or 10/11/2025", {}),
+    ("Landline is 02 8123 4567", {"phone": "02 8123 4567"}),
+])
+def test_prepositions_places_and_bare_suffixes_are_not_leads(message, expected):
+    assert extract_fields(message) == expected
+
+
+def test_fields_accumulate_across_turns():
+    extractor = LeadExtractor()
+    
+    assert extractor.update("s1", [{"role": "user", "content": "Hi, I'm Maria Santos"}]) == {"name": "Maria Santos"}
+    assert extractor.update("s1", [{"role": "user", "content": "Call me at 555-123-4567"}]) == {
+        "name": "Maria Santos", "phone": "555-123-4567"
+    }
+    assert extractor.update("s1", [{"role": "assistant", "content": "Email us at hello@maticstudio.net"}]) is None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the keyset-paginated admin leads API, run against an in-memory MongoDB
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import flask_app
+from database import DatabaseManager, decode_lead_cursor, encode_lead_cursor
+
+
+@pytest.fixture
+def leads(monkeypatch):
+    manager = DatabaseManager()
+    manager._connected = True
+    manager.leads = mongomock.MongoClient().maticstudio_chat.leads
+    monkeypatch.setattr(flask_app, "db_manager", manager)
+    monkeypatch.setenv("ADMIN_API_KEY", "admin")
+    return manager.leads
+
+
+def get_page(cursor=None, page_size=2):
+    params = {"page_size": page_size, **({"cursor": cursor} if cursor else {})}
+    return flask_app.app.test_client().get("/api/admin/leads", query_string=params, headers={"X-API-Key": "admin"})
+
+
+def test_pages_cover_dated_then_undated_leads(leads):
+    start = datetime(2024, 1, 1)
+    leads.insert_many([{"name": f"dated-{i}", "created_at": start + timedelta(days=i)} for i in range(3)])
+    leads.insert_many([{"name": f"undated-{i}"} for i in range(3)])
+    
+    names, cursor = [], None
+    for _ in range(4):
+        page = get_page(cursor).get_json()
+        names += [lead["name"] for lead in page["leads"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert names == ["dated-2", "dated-1", "dated-0", "undated-2", "undated-1", "undated-0"]
+
+
+def test_cursor_without_created_at_round_trips():
+    lead = {"_id": mongomock.ObjectId()}
+    
+    assert decode_lead_cursor(encode_lead_cursor(lead)) == (None, lead["_id"])
+
+
+class BrokenCursor:
+    """Like a pymongo cursor, fails only once the first batch is fetched"""
+    
+    def sort(self, *args):
+        return self
+    
+    def limit(self, *args):
+        return self
+    
+    def __iter__(self):
+        raise RuntimeError("connection reset")
+
+
+def test_database_errors_are_reported_before_streaming(leads, monkeypatch):
+    monkeypatch.setattr(leads, "find", lambda *args: BrokenCursor())
+    response = get_page()
+    
+    assert response.status_code == 500
+    assert response.get_json() == {"error": "connection reset"}
+
+
+def test_asgi_database_errors_are_reported_before_streaming(leads, monkeypatch):
+    testclient = pytest.importorskip("starlette.testclient")
+    import asgi_app
+    
+    monkeypatch.setattr(asgi_app, "db_manager", flask_app.db_manager)
+    client = testclient.TestClient(asgi_app.app)
+    get_asgi_page = lambda: client.get("/api/admin/leads", params={"page_size": 2}, headers={"X-API-Key": "admin"})
+    
+    leads.insert_many([{"name": f"lead-{i}"} for i in range(3)])
+    page = get_asgi_page().json()
+    assert [lead["name"] for lead in page["leads"]] == ["lead-2", "lead-1"]
+    
+    monkeypatch.setattr(leads, "find", lambda *args: BrokenCursor())
+    response = get_asgi_page()
+    
+    assert response.status_code == 500
+    assert response.json() == {"error": "connection reset"}
+
+
+def test_bad_cursor_is_a_client_error(leads):
+    assert get_page("not-a-cursor").status_code == 400
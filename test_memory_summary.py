@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for MemoryAgent rolling summarization, driven by a local fake LLM
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents.memory_agent import MemoryAgent
+from src.core.prompts import MEMORY_SUMMARY_PROMPT
+
+TURNS = 200
+
+
+class FakeLLM:
+    """Stands in for OpenAI's chat.completions; records every prompt it is sent"""
+    
+    def __init__(self, summary_gate: threading.Event = None):
+        self.chat = SimpleNamespace(completions=self)
+        self.prompts = []
+        self.summaries = 0
+        self.summary_gate = summary_gate
+    
+    def create(self, messages, **kwargs):
+        if messages[0]["content"] == MEMORY_SUMMARY_PROMPT:
+            if self.summary_gate is not None:
+                self.summary_gate.wait(5)
+            self.summaries += 1
+            content = f"Visitor discussed automation needs across {self.summaries} summaries. " * 3
+        else:
+            self.prompts.append(list(messages))
+            content = f"Here is a detailed answer about automation, reply {len(self.prompts)}. " * 5
+        message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def prompt_chars(messages) -> int:
+    return sum(len(message["content"]) for message in messages)
+
+
+def run_session(agent: MemoryAgent, turns: int = TURNS):
+    for turn in range(turns):
+        agent.process(f"Turn {turn}: we process about {turn * 10} invoices a week, can you automate that?")
+        if agent.summarize:
+            agent.wait_for_summary(5)
+
+
+def make_agent(**kwargs) -> MemoryAgent:
+    # A large budget so the token window never trims; only summarization bounds the prompt here
+    agent = MemoryAgent(context_budget=10_000_000, **kwargs)
+    agent.client = FakeLLM()
+    return agent
+
+
+def test_prompt_size_stays_bounded_over_long_session():
+    agent = make_agent(summarize=True, keep_turns=6, summarize_batch_turns=4)
+    run_session(agent)
+    
+    sizes = [prompt_chars(prompt) for prompt in agent.client.prompts]
+    steady = sizes[20:]
+    assert max(steady) < 1.5 * min(steady)
+    assert max(sizes[-20:]) <= max(sizes[20:40]) * 1.1
+    assert len(agent.conversation_history) <= (6 + 4) * 2
+    assert agent.summary
+    assert agent.summarized_messages + len(agent.conversation_history) == TURNS * 2
+
+
+def test_prompt_grows_without_summarization():
+    agent = make_agent(summarize=False)
+    run_session(agent, turns=60)
+    
+    sizes = [prompt_chars(prompt) for prompt in agent.client.prompts]
+    assert sizes[-1] > 2 * sizes[5]
+
+
+def test_summary_is_sent_after_static_prefix():
+    agent = make_agent(summarize=True, keep_turns=2, summarize_batch_turns=2)
+    run_session(agent, turns=10)
+    agent.process("One more question")
+    
+    prompt = agent.client.prompts[-1]
+    summaries = [i for i, message in enumerate(prompt) if message["content"].startswith("Summary of the earlier")]
+    assert len(summaries) == 1
+    assert prompt[0]["role"] == "system" and summaries[0] > 0
+    assert prompt[-1] == {"role": "user", "content": "One more question"}
+
+
+def test_summarization_runs_off_the_request_path():
+    gate = threading.Event()
+    agent = make_agent(summarize=True, keep_turns=1, summarize_batch_turns=1)
+    agent.client = FakeLLM(summary_gate=gate)
+    
+    # The summarizer is blocked, yet every turn still gets answered
+    for turn in range(5):
+        assert agent.process(f"Question {turn}")
+    assert agent.client.summaries == 0
+    
+    gate.set()
+    agent.wait_for_summary(5)
+    assert agent.client.summaries == 1
+    assert agent.summary
+
+
+def test_resume_restores_summary_without_full_transcript():
+    mongomock = pytest.importorskip("mongomock")
+    from database import DatabaseManager
+    
+    store = DatabaseManager()
+    database = mongomock.MongoClient().matic_test
+    store.conversations = database.conversations
+    store.analytics = database.analytics
+    store.write_behind = False
+    
+    agent = make_agent(summarize=True, keep_turns=3, summarize_batch_turns=2, session_id="resume-1", store=store)
+    run_session(agent, turns=25)
+    
+    resumed = make_agent(summarize=True, keep_turns=3, summarize_batch_turns=2, store=store)
+    assert resumed.resume("resume-1")
+    assert resumed.summary == agent.summary
+    assert resumed.conversation_history == agent.conversation_history
+    assert resumed.summarized_messages == agent.summarized_messages
+    
+    stored = store.conversations.find_one({"session_id": "resume-1"})
+    assert stored["message_count"] == 50
+    assert stored["summarized_messages"] == agent.summarized_messages
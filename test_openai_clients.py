@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared OpenAI client registry, run against a local stub HTTP server
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.agents.scheduling_agent import SchedulingAgent
+from src.core.openai_clients import OpenAIClientRegistry, openai_clients
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Hi there"}}]
+}
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """Answers POST /chat/completions with the server's scripted statuses, then 200s"""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers["Content-Length"]))
+        status = server.script.pop(0) if server.script else 200
+        
+        encoded = json.dumps(COMPLETION if status == 200 else {"error": {"message": "stub error"}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(encoded)
+    
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    server.script = []
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(stub) -> str:
+    return f"http://127.0.0.1:{stub.server_address[1]}"
+
+
+def complete(client) -> str:
+    response = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "Hi"}])
+    return response.choices[0].message.content
+
+
+def test_agents_share_one_client():
+    first = SchedulingAgent()
+    second = SchedulingAgent()
+    
+    assert first.client is second.client is openai_clients.client()
+
+
+def test_requests_reuse_pooled_connection_and_retries_are_counted(stub):
+    registry = OpenAIClientRegistry(max_retries=2)
+    client = registry.client("key", base_url=base_url(stub))
+    assert registry.client("key", base_url=base_url(stub)) is client
+    
+    assert complete(client) == "Hi there"
+    assert complete(client) == "Hi there"
+    
+    stats = registry.stats()["clients"][0]
+    assert stats["requests"] == 2 and stats["retries"] == 0
+    assert stats["pool"]["connections"] == 1 and stats["pool"]["idle"] == 1
+    assert stub.connections == 1
+    
+    stub.script = [503, 429]
+    assert complete(client) == "Hi there"
+    stats = registry.stats()["clients"][0]
+    assert stats["retries"] == 2
+    assert stats["status_counts"] == {"200": 3, "503": 1, "429": 1}
+
+
+def test_async_clients_are_kept_per_event_loop(stub):
+    registry = OpenAIClientRegistry()
+    
+    async def call():
+        client = registry.async_client("key", base_url=base_url(stub))
+        assert registry.async_client("key", base_url=base_url(stub)) is client
+        response = await client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "Hi"}])
+        return client, response.choices[0].message.content
+    
+    first, content = asyncio.run(call())
+    second, _ = asyncio.run(call())
+    
+    assert content == "Hi there"
+    assert first is not second
+    assert all(stats["type"] == "async" for stats in registry.stats()["clients"])
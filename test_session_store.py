@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded per-session conversation history
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.core import session_store
+from src.core.session_store import SessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(session_store, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def turn(n):
+    return [{"role": "user", "content": f"question {n}"}, {"role": "assistant", "content": f"answer {n}"}]
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    store = SessionStore(max_sessions=2)
+    store.save_history("a", turn(1))
+    store.save_history("b", turn(1))
+    
+    # Reading "a" makes "b" the least recently used
+    assert store.get_history("a") == turn(1)
+    store.save_history("c", turn(1))
+    
+    assert store.get_history("b") == []
+    assert store.get_history("a") == turn(1) and store.get_history("c") == turn(1)
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire_after_ttl(clock):
+    store = SessionStore(ttl_seconds=60)
+    store.save_history("idle", turn(1))
+    store.save_history("active", turn(1))
+    
+    clock.now += 45
+    store.get_history("active")
+    clock.now += 30
+    
+    assert store.get_history("idle") == []
+    assert store.get_history("active") == turn(1)
+    stats = store.stats()
+    assert (stats["sessions"], stats["expirations"]) == (1, 1)
+
+
+def test_history_is_trimmed_to_max_turns(clock):
+    store = SessionStore(max_turns=2)
+    for n in range(5):
+        store.append_turn("s1", f"question {n}", f"answer {n}")
+    
+    assert store.get_history("s1") == turn(3) + turn(4)
+
+
+def test_bytes_track_stored_messages(clock):
+    store = SessionStore(max_sessions=1)
+    store.save_history("a", turn(1))
+    size = store.stats()["bytes"]
+    assert size > 0
+    
+    store.save_history("a", turn(1) * 2)
+    assert store.stats()["bytes"] == 2 * size
+    
+    store.save_history("b", turn(1))
+    assert store.stats()["bytes"] == size
+    store.clear("b")
+    assert store.stats() == {"sessions": 0, "bytes": 0, "evictions": 1, "expirations": 0}
+
+
+def test_returned_history_is_a_copy(clock):
+    store = SessionStore()
+    store.save_history("s1", turn(1))
+    
+    store.get_history("s1").append({"role": "user", "content": "not saved"})
+    
+    assert store.get_history("s1") == turn(1)
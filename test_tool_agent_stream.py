@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Regression tests: ToolAgent.process_stream executes each tool call exactly once,
+failed calls are flagged and can run again, and agent traces report them as failures
+"""
+
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.agents.email_agent import EmailAgent
+from src.agents.scheduling_agent import SchedulingAgent
+from src.agents.tool_agent import ToolAgent
+from src.core.tool_executor import ToolExecutor, is_failure
+from src.core.tools import Tool
+
+
+def chunk(content=None, tool_call=None, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=[tool_call] if tool_call else None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None)
+
+
+def tool_call_chunks(index, call_id, name, arguments):
+    """A tool call streamed as the API does: id and name first, then argument fragments.
+    String arguments are streamed as-is, so tests can send malformed JSON"""
+    encoded = arguments if isinstance(arguments, str) else json.dumps(arguments)
+    yield chunk(tool_call=SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=None)))
+    for start in range(0, len(encoded), 5):
+        function = SimpleNamespace(name=None, arguments=encoded[start:start + 5])
+        yield chunk(tool_call=SimpleNamespace(index=index, id=None, function=function))
+
+
+class FakeStream(list):
+    def close(self):
+        pass
+
+
+class FakeStreamingLLM:
+    """Streams ``tool_calls`` on the first completion and a plain answer afterwards"""
+    
+    def __init__(self, tool_calls=(), answer="All done."):
+        self.chat = SimpleNamespace(completions=self)
+        self.tool_calls = tool_calls
+        self.answer = answer
+        self.requests = []
+    
+    def create(self, messages, **kwargs):
+        self.requests.append(list(messages))
+        if not kwargs.get("stream"):
+            message = SimpleNamespace(content=self.answer)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+        chunks = FakeStream()
+        if self.tool_calls and messages[-1]["role"] == "user":
+            for index, (call_id, name, arguments) in enumerate(self.tool_calls):
+                chunks.extend(tool_call_chunks(index, call_id, name, arguments))
+            chunks.append(chunk(finish_reason="tool_calls"))
+        else:
+            chunks.extend(chunk(content=self.answer[start:start + 4]) for start in range(0, len(self.answer), 4))
+            chunks.append(chunk(finish_reason="stop"))
+        return chunks
+
+
+class FakeAsyncStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+    
+    async def close(self):
+        pass
+
+
+class FakeAsyncStreamingLLM(FakeStreamingLLM):
+    async def create(self, messages, **kwargs):
+        return FakeAsyncStream(super().create(messages, **kwargs))
+
+
+class CountingTool(Tool):
+    def __init__(self, name="create_link"):
+        self.calls = []
+        super().__init__(
+            name=name,
+            description="Creates a single-use link",
+            function=self._create,
+            parameters={"type": "object", "properties": {"email": {"type": "string"}}}
+        )
+    
+    def _create(self, email: str) -> str:
+        self.calls.append(email)
+        return f"link-{len(self.calls)}-for-{email}"
+
+
+def make_agent(tool_calls, tools, agent_class=ToolAgent):
+    agent = agent_class(tools=tools)
+    agent.client = FakeStreamingLLM(tool_calls)
+    return agent
+
+
+def test_each_tool_call_executes_once():
+    tool = CountingTool()
+    agent = make_agent([("call_1", "create_link", {"email": "ana@acme.com"})], [tool])
+    
+    output = "".join(agent.process_stream("Book me a meeting"))
+    
+    assert tool.calls == ["ana@acme.com"]
+    # The result shown to the user is the one sent back to the model
+    assert "link-1-for-ana@acme.com" in output
+    tool_messages = [message for message in agent.client.requests[-1] if message["role"] == "tool"]
+    assert tool_messages == [{"role": "tool", "content": "link-1-for-ana@acme.com", "tool_call_id": "call_1"}]
+    assert output.endswith("All done.")
+
+
+def test_multiple_calls_keep_order_and_repeated_calls_share_one_run():
+    link, other = CountingTool(), CountingTool("lookup")
+    agent = make_agent([
+        ("call_1", "create_link", {"email": "ana@acme.com"}),
+        ("call_2", "lookup", {"email": "bo@acme.com"}),
+        ("call_3", "create_link", {"email": "ana@acme.com"})
+    ], [link, other])
+    
+    "".join(agent.process_stream("Book us both"))
+    
+    assert link.calls == ["ana@acme.com"]
+    assert other.calls == ["bo@acme.com"]
+    tool_messages = [message for message in agent.client.requests[-1] if message["role"] == "tool"]
+    assert [message["tool_call_id"] for message in tool_messages] == ["call_1", "call_2", "call_3"]
+    assert tool_messages[0]["content"] == tool_messages[2]["content"]
+
+
+def test_no_tool_answer_is_streamed_without_second_completion():
+    tool = CountingTool()
+    agent = make_agent([], [tool])
+    
+    chunks = list(agent.process_stream("Hello"))
+    
+    assert "".join(chunks) == "All done."
+    assert len(chunks) > 1
+    assert len(agent.client.requests) == 1
+    assert tool.calls == []
+
+
+def test_malformed_arguments_are_traced_raw_instead_of_raising():
+    tool = CountingTool()
+    
+    for run in (lambda agent: "".join(agent.process_stream("Book me")), lambda agent: agent.process("Book me")):
+        agent = make_agent([("call_1", "create_link", '{"email": ')], [tool])
+        output = run(agent)
+        
+        assert 'with args: {"email": ' in output
+        assert output.endswith("All done.")
+    assert tool.calls == []
+
+
+class FlakyTool(CountingTool):
+    """Raises on its first ``failures`` calls"""
+    
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+    
+    def _create(self, email: str) -> str:
+        self.calls.append(email)
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("Calendly unreachable")
+        return f"link-for-{email}"
+
+
+def call(call_id, email="ana@acme.com"):
+    return {"id": call_id, "type": "function", "function": {"name": "create_link", "arguments": json.dumps({"email": email})}}
+
+
+def test_exceptions_are_flagged_as_failures_and_retried():
+    tool = FlakyTool(failures=1)
+    executor = ToolExecutor({"create_link": tool}, retries=1)
+    
+    assert executor.result(call("call_1")) == "link-for-ana@acme.com"
+    assert is_failure(executor.attempts(call("call_1"))[0])
+    assert [timing["attempts"] for timing in executor.timings()] == [2]
+
+
+def test_a_failed_call_repeated_later_in_the_turn_runs_again():
+    tool = FlakyTool(failures=2)
+    executor = ToolExecutor({"create_link": tool}, retries=1)
+    
+    first = executor.result(call("call_1"))
+    second = executor.result(call("call_2"))
+    
+    assert is_failure(first) and first.startswith("Error executing create_link")
+    assert second == "link-for-ana@acme.com" and not is_failure(second)
+    assert executor.result(call("call_3")) is second
+    assert len(tool.calls) == 3
+
+
+def test_tool_timings_are_kept_per_request_not_per_agent():
+    agent = make_agent([("call_1", "create_link", {"email": "ana@acme.com"})], [CountingTool()])
+    seen = []
+    before = agent.last_tool_timings
+    
+    def request():
+        "".join(agent.process_stream("Book me a meeting"))
+        seen.append(agent.last_tool_timings)
+    
+    worker = threading.Thread(target=request)
+    worker.start()
+    worker.join()
+    
+    assert [timing["tool"] for timing in seen[0]] == ["create_link"]
+    # Another request's turn does not overwrite what this thread saw last
+    assert agent.last_tool_timings == before
+
+
+class BrokenTool(CountingTool):
+    def _create(self, email: str) -> str:
+        self.calls.append(email)
+        raise ConnectionError("Calendly unreachable")
+
+
+@pytest.mark.parametrize("agent_class, tool_name, failure_line", [
+    (SchedulingAgent, "schedule_consultation_meeting", "❌ **Could not schedule the meeting**"),
+    (EmailAgent, "compose_inquiry_email", "❌ **Could not compose the email**"),
+])
+def test_failed_tools_are_not_reported_as_successes(agent_class, tool_name, failure_line):
+    for run in (lambda agent: "".join(agent.process_stream("Book me")), lambda agent: agent.process("Book me")):
+        agent = make_agent([("call_1", tool_name, {"email": "ana@acme.com"})], [BrokenTool(tool_name)], agent_class)
+        agent.intent_router = None
+        output = run(agent)
+        
+        assert failure_line in output and "Calendly unreachable" in output
+        assert "successfully" not in output
+
+
+@pytest.mark.parametrize("agent_class, tool_name", [
+    (SchedulingAgent, "schedule_consultation_meeting"),
+    (EmailAgent, "compose_inquiry_email"),
+])
+def test_sync_and_async_turns_match(agent_class, tool_name):
+    tool = CountingTool(tool_name)
+    tool_calls = [("call_1", tool_name, {"email": "ana@acme.com"})]
+    agent = make_agent(tool_calls, [tool], agent_class)
+    agent.async_client = FakeAsyncStreamingLLM(tool_calls)
+    agent.intent_router = None
+    
+    sync_history, async_history = [], []
+    
+    async def run_async():
+        answer = await agent.aprocess("Book me", conversation_history=async_history)
+        streamed = [chunk async for chunk in agent.aprocess_stream("Book me", conversation_history=async_history)]
+        return [answer, "".join(streamed)]
+    
+    sync_outputs = [
+        agent.process("Book me", conversation_history=sync_history),
+        "".join(agent.process_stream("Book me", conversation_history=sync_history))
+    ]
+    
+    assert asyncio.run(run_async()) == sync_outputs
+    assert sync_outputs[0] == sync_outputs[1]
+    assert sync_outputs[0].startswith("📅") or sync_outputs[0].startswith("📧")
+    assert sync_outputs[0].endswith("All done.")
+    turn = [{"role": "user", "content": "Book me"}, {"role": "assistant", "content": "All done."}]
+    assert sync_history == async_history == turn * 2
+    assert len(tool.calls) == 4